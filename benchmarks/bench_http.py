@@ -0,0 +1,380 @@
+"""Latency and throughput of every route of the API and of the web views
+
+Serves the application on the generated data of datagen.py from an in-process
+threaded WSGI server (or targets a running server with --url), sends --requests
+requests to every route of restflask/rest/api_view.py and restflask/views/web_view.py
+from --concurrency keep-alive connections, and prints the p50 / p95 / p99 latency
+and the requests per second of each route.
+
+The routes which return whole tables (the streams) get FULL_TABLE_SHARE of
+--requests. Routes run in phases: reads,
+each warmed up by one request, then creates, updates and deletes. Creates add
+'bench...' users and 'Benchmark post ...' posts, the updates touch the first
+users and posts, and the deletes remove what the creates added. Responses with
+a status of 400 or more count as errors.
+
+    python benchmarks/bench_http.py --requests 200 --save-baseline benchmarks/baselines/http.json
+    python benchmarks/bench_http.py --requests 200 --baseline benchmarks/baselines/http.json
+    python benchmarks/bench_http.py --url http://127.0.0.1:8000 --routes '^api_get'
+"""
+import argparse
+import http.client
+import json
+import logging
+import queue
+import random
+import re
+import socket
+import sys
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlencode, urlsplit
+
+import benchlib
+import datagen
+
+# pylint: disable=wrong-import-position,wrong-import-order
+from werkzeug.serving import make_server
+
+SAMPLE_SIZE = 1000
+BULK_SIZE = 10
+# Share of --requests sent to the routes which return whole tables.
+FULL_TABLE_SHARE = 0.1
+BENCH_TITLE = 'Benchmark post '
+SEARCH_TERMS = ('planet', 'coffee history', 'python flask', 'lantern')
+AUTHOR_PREFIXES = ('Ol', 'Kov', 'Iryna', 'taras_')
+
+
+def free_port() -> int:
+    """Return a TCP port nobody listens on."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def serve(app) -> str:
+    """Serve `app` from a daemon thread and return its base URL."""
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    port = free_port()
+    server = make_server('127.0.0.1', port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{port}'
+
+
+def json_body(value) -> tuple:
+    """Return the body and the content type of a JSON request."""
+    return json.dumps(value), 'application/json'
+
+
+def form_body(value: dict) -> tuple:
+    """Return the body and the content type of a submitted HTML form."""
+    return urlencode(value), 'application/x-www-form-urlencoded'
+
+
+class Client:
+    """
+    A keep-alive HTTP connection to the server under test.
+
+    Attributes:
+        base_url (str): e.g. 'http://127.0.0.1:5000'.
+    """
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        parts = urlsplit(base_url)
+        self._host, self._port = parts.hostname, parts.port or 80
+        self._connection = None
+
+    def request(self, method: str, path: str, body: tuple = None) -> tuple:
+        """
+        Sends a request and reads the whole response.
+
+        :param method: The HTTP method.
+        :param path: The path and query string.
+        :param body: (body, content type), or None.
+
+        :return:
+            tuple: (status, response body)
+        """
+        if self._connection is None:
+            self._connection = http.client.HTTPConnection(self._host, self._port, timeout=60)
+        headers = {'Content-Type': body[1]} if body else {}
+        try:
+            self._connection.request(method, path, body[0] if body else None, headers)
+            response = self._connection.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            self.close()
+            raise
+
+    def get_json(self, path: str):
+        """GET `path` and decode its JSON body."""
+        status, data = self.request('GET', path)
+        if status != 200:
+            raise RuntimeError(f'GET {path}: {status}')
+        return json.loads(data)
+
+    def close(self):
+        """Close the connection, the next request opens a new one."""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def run_route(base_url: str, requests: list, concurrency: int, warm_up: bool = False) -> dict:
+    """
+    Sends `requests` from `concurrency` connections and summarizes them.
+
+    :param base_url: The server.
+    :param requests: (method, path, body) tuples.
+    :param concurrency: The number of connections sending at the same time.
+    :param warm_up: Send the first request once more beforehand, outside of the figures,
+        so that one-off costs (e.g. building the search index) are left out.
+
+    :return:
+        dict: The `benchlib.summarize` of the responses.
+    """
+    if warm_up:
+        client = Client(base_url)
+        client.request(*requests[0])
+        client.close()
+    pending = queue.SimpleQueue()
+    for item in requests:
+        pending.put(item)
+    latencies, errors = [], []
+
+    def worker():
+        client = Client(base_url)
+        while True:
+            try:
+                method, path, body = pending.get_nowait()
+            except queue.Empty:
+                break
+            start = time.perf_counter()
+            try:
+                status, _ = client.request(method, path, body)
+            except (OSError, http.client.HTTPException) as exc:
+                errors.append(type(exc).__name__)
+                continue
+            if status >= 400:
+                errors.append(status)
+            else:
+                latencies.append(time.perf_counter() - start)
+        client.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(min(concurrency, len(requests)))]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return benchlib.summarize(latencies, time.perf_counter() - start, len(errors))
+
+
+class Workload:
+    """
+    Builds the requests of every route from a sample of the data on the server.
+
+    Attributes:
+        token (str): Makes the names of the created records unique to the run.
+    """
+
+    def __init__(self, client: Client, count: int, seed: int):
+        self.count = count
+        self.rng = random.Random(seed)
+        self.token = f'{int(time.time()) % 100000}'
+        self._client = client
+        users = client.get_json(
+            f'/api/users/?sort=id&fields=id,username&summary=1&limit={SAMPLE_SIZE}')
+        posts = client.get_json(
+            f'/api/posts/?sort=id&fields=id,title,author_id&limit={SAMPLE_SIZE}')
+        # The sampled records, by id. The update routes answer with the username / title
+        # of the request.
+        self.usernames = {user['id']: user['username'] for user in users['items']}
+        self.titles = {post['id']: post['title'] for post in posts['items']}
+        authors = Counter(post['author_id'] for post in posts['items'] if post['author_id'])
+        self.top_author = authors.most_common(1)[0][0] if authors else next(iter(self.usernames))
+
+    def user_id(self) -> int:
+        """Return a random sampled user id."""
+        return self.rng.choice(list(self.usernames))
+
+    def post_id(self) -> int:
+        """Return a random sampled post id."""
+        return self.rng.choice(list(self.titles))
+
+    def repeat(self, method: str, path, body=None, share: float = 1.0) -> list:
+        """
+        Return `share` of `count` requests.
+
+        :param method: The HTTP method.
+        :param path: The path, or a callable returning it from the request number.
+        :param body: The body, or a callable returning it from the request number.
+        :param share: The share of `count` to send, at least one request.
+        """
+        return [(method, path(i) if callable(path) else path,
+                 body(i) if callable(body) else body)
+                for i in range(max(1, int(self.count * share)))]
+
+    def new_user(self, prefix: str, i: int) -> dict:
+        """Return the fields of a user to create."""
+        name = f'bench{prefix}{self.token}_{i}'
+        return {'username': name, 'email': f'{name}@bench.invalid', 'first_name': 'Bench',
+                'last_name': 'Mark', 'location': 'Kyiv'}
+
+    def new_post(self, prefix: str, i: int) -> dict:
+        """Return the fields of a post to create."""
+        return {'title': f'{BENCH_TITLE}{prefix}{self.token}_{i}',
+                'description': 'Benchmark text. ' * 20, 'author_id': self.user_id()}
+
+    def updated_user(self, location: str) -> dict:
+        """Return the new fields of a random sampled user, with its unchanged username."""
+        user_id = self.user_id()
+        return {'id': user_id, 'username': self.usernames[user_id], 'location': location}
+
+    def updated_post(self, description: str) -> dict:
+        """Return the new fields of a random sampled post, with its unchanged title."""
+        post_id = self.post_id()
+        return {'id': post_id, 'title': self.titles[post_id], 'description': description}
+
+    def reads(self) -> dict:
+        """Return the requests of the read routes."""
+        return {
+            'api_users': self.repeat('GET', '/api/users/?limit=50'),
+            'api_users_summary': self.repeat('GET', '/api/users/?summary=1&limit=50'),
+            'api_users_ndjson': self.repeat('GET', '/api/users/?format=ndjson&summary=1',
+                                             share=FULL_TABLE_SHARE),
+            'api_get_user': self.repeat('GET', lambda i: f'/api/get_user/?id={self.user_id()}'),
+            'api_posts': self.repeat('GET', '/api/posts/?limit=50'),
+            'api_posts_author': self.repeat('GET', f'/api/posts/?author_id={self.top_author}'),
+            'api_posts_ndjson': self.repeat('GET', '/api/posts/?format=ndjson',
+                                             share=FULL_TABLE_SHARE),
+            'api_search_posts': self.repeat('GET', lambda i: '/api/posts/search/?' + urlencode(
+                {'q': SEARCH_TERMS[i % len(SEARCH_TERMS)]})),
+            'api_get_post': self.repeat('GET', lambda i: f'/api/get_post/?id={self.post_id()}'),
+            'api_authors': self.repeat('GET', lambda i: '/api/authors/?' + urlencode(
+                {'q': AUTHOR_PREFIXES[i % len(AUTHOR_PREFIXES)]})),
+            'api_cache_stats': self.repeat('GET', '/api/internal/cache/'),
+            'api_pool_stats': self.repeat('GET', '/api/internal/pool/'),
+            'web_users': self.repeat('GET', '/users/'),
+            'web_user': self.repeat('GET', lambda i: f'/users/{self.user_id()}/'),
+            'web_new_user_form': self.repeat('GET', '/new_user/'),
+            'web_edit_user_form': self.repeat('GET', lambda i: f'/edit_user/{self.user_id()}/'),
+            'web_posts': self.repeat('GET', '/posts/'),
+            'web_posts_filter': self.repeat('POST', '/posts/', form_body(
+                {'author_id': self.top_author, 'date_from': '', 'date_to': ''})),
+            'web_post': self.repeat('GET', lambda i: f'/posts/{self.post_id()}/'),
+            'web_new_post_form': self.repeat('GET', '/new_post/'),
+            'web_edit_post_form': self.repeat('GET', lambda i: f'/edit_post/{self.post_id()}/'),
+        }
+
+    def creates(self) -> dict:
+        """Return the requests of the routes creating records."""
+        return {
+            'api_create_user': self.repeat('POST', '/api/create_user/',
+                                           lambda i: json_body(self.new_user('a', i))),
+            'api_users_bulk_create': self.repeat('POST', '/api/users/bulk/', lambda i: json_body(
+                [self.new_user(f'b{i}_', j) for j in range(BULK_SIZE)])),
+            'web_new_user': self.repeat('POST', '/new_user/',
+                                        lambda i: form_body(self.new_user('w', i))),
+            'api_create_post': self.repeat('POST', '/api/create_post/',
+                                           lambda i: json_body(self.new_post('a', i))),
+            'api_posts_bulk_create': self.repeat('POST', '/api/posts/bulk/', lambda i: json_body(
+                [self.new_post(f'b{i}_', j) for j in range(BULK_SIZE)])),
+            'web_new_post': self.repeat('POST', '/new_post/',
+                                        lambda i: form_body(self.new_post('w', i))),
+        }
+
+    def updates(self) -> dict:
+        """Return the requests of the routes updating records."""
+        location = lambda i: datagen.LOCATIONS[i % 2][0]  # pylint: disable=C3001
+        return {
+            'api_update_user': self.repeat('PUT', '/api/update_user/', lambda i: json_body(
+                self.updated_user(location(i)))),
+            'api_users_bulk_update': self.repeat('PUT', '/api/users/bulk/', lambda i: json_body(
+                [{'id': self.user_id(), 'location': location(i)} for _ in range(BULK_SIZE)])),
+            'web_edit_user': self.repeat('POST', lambda i: f'/edit_user/{self.user_id()}/',
+                                         lambda i: form_body({'location': location(i)})),
+            'api_update_post': self.repeat('PUT', '/api/update_post/', lambda i: json_body(
+                self.updated_post(f'Updated {i} times.'))),
+            'api_posts_bulk_update': self.repeat('PUT', '/api/posts/bulk/', lambda i: json_body(
+                [{'id': self.post_id(), 'description': f'Updated {i} times.'}
+                 for _ in range(BULK_SIZE)])),
+            'web_edit_post': self.repeat('POST', lambda i: f'/edit_post/{self.post_id()}/',
+                                         lambda i: form_body({'description': f'Updated {i}.'})),
+        }
+
+    def _created(self, collection: str, key: str, pattern: str) -> dict:
+        """Return {prefix: [ids]} of the records of this run, from the newest ids down."""
+        created = {}
+        regex = re.compile(pattern.format(token=self.token))
+        cursor = ''
+        while True:
+            page = self._client.get_json(f'/api/{collection}/?sort=-id&fields=id,{key}'
+                                         f'&limit=1000{cursor}')
+            matched = [(regex.fullmatch(item[key]), item['id']) for item in page['items']]
+            for match, item_id in matched:
+                if match:
+                    created.setdefault(match.group(1), []).append(item_id)
+            if not page['next'] or not any(match for match, _ in matched):
+                return created
+            cursor = f"&cursor={page['next']}"
+
+    def deletes(self) -> dict:
+        """Return the requests of the routes deleting what `creates` added."""
+        users = self._created('users', 'username', r'bench(a|b|w)\d*_?{token}_\d+')
+        posts = self._created('posts', 'title', BENCH_TITLE + r'(a|b|w)\d*_?{token}_\d+')
+
+        def chunks(ids):
+            return [ids[i:i + BULK_SIZE] for i in range(0, len(ids), BULK_SIZE)]
+
+        return {
+            'api_delete_post': [('DELETE', f'/api/delete_post/?id={post_id}', None)
+                                for post_id in posts.get('a', [])],
+            'api_posts_bulk_delete': [('DELETE', '/api/posts/bulk/', json_body(ids))
+                                      for ids in chunks(posts.get('b', []))],
+            'web_delete_post': [('GET', f'/delete_post/{post_id}/', None)
+                                for post_id in posts.get('w', [])],
+            'api_delete_user': [('DELETE', f'/api/delete_user/?id={user_id}', None)
+                                for user_id in users.get('a', [])],
+            'api_users_bulk_delete': [('DELETE', '/api/users/bulk/', json_body(ids))
+                                      for ids in chunks(users.get('b', []))],
+            'web_delete_user': [('GET', f'/delete_user/{user_id}/', None)
+                                for user_id in users.get('w', [])],
+        }
+
+
+def main() -> int:
+    """Parse the arguments, load every route and check the results against the baseline."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    datagen.add_arguments(parser)
+    benchlib.add_arguments(parser)
+    parser.add_argument('--url', help='a running server, instead of serving --database')
+    parser.add_argument('--requests', type=int, default=200, help='requests per route')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--cache', default='memory', help="CACHE_BACKEND, (default='memory')")
+    parser.add_argument('--routes', metavar='REGEX', help='load the matching routes only')
+    args = parser.parse_args()
+
+    if args.url:
+        base_url, dataset = args.url.rstrip('/'), {'url': args.url}
+    else:
+        app, dataset = datagen.prepare(args, {'CACHE_BACKEND': args.cache})
+        base_url = serve(app)
+    workload = Workload(Client(base_url), args.requests, args.seed)
+    selected = re.compile(args.routes or '')
+    results = {}
+    for phase in (workload.reads, workload.creates, workload.updates, workload.deletes):
+        for name, requests in phase().items():
+            if selected.search(name) and requests:
+                results[name] = run_route(base_url, requests, args.concurrency,
+                                          warm_up=phase == workload.reads)
+                print(f'{name}: {results[name]["rps"]:.1f} req/s', file=sys.stderr)
+    meta = {'dataset': dataset, 'requests': args.requests, 'concurrency': args.concurrency,
+            'cache': args.cache}
+    return benchlib.finish(args, results, meta)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""CPU cost of serializing listings
+
+Compares the marshmallow path (ORM objects, `users_schema.dump` / `posts_schema.dump`
+and `jsonify` through Flask's default provider) with the column-tuple path of
+service/serializers.py and the orjson provider.
+Every figure is the best of --runs, in microseconds of process CPU time per
+serialized row (a user with its posts counts as one row):
+
+- dump: rows to dicts, the rows already fetched;
+- encode: dicts to the JSON response;
+- total: query, dump and encode, as the listing endpoints run them.
+
+    python benchmarks/bench_serialization.py --limit 1000 --runs 20
+
+The database settings (DB_*, DATABASE_URL) are taken from the environment.
+--seed USERS fills an empty database with USERS users of 3 posts each.
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# pylint: disable=wrong-import-position
+from flask.json.provider import DefaultJSONProvider
+
+from restflask.config import create_app
+from restflask.extensions import db
+from restflask.models.model import User, Post, PostSchema, UserSchema, posts_schema, users_schema
+from restflask.service.serializers import USER_COLUMNS, POST_COLUMNS, POST_NAMES
+from restflask.service.serializers import dump_rows, field_names
+from restflask.service.serializers import post_rows_query, user_rows_query
+from restflask.service.services import get_posts_page, get_users_page, posts_query, users_query
+
+
+def best_time(func, runs: int) -> float:
+    """Return the lowest CPU time of `runs` calls of `func`, in seconds."""
+    times = []
+    for _ in range(runs):
+        db.session.remove()
+        start = time.process_time()
+        func()
+        times.append(time.process_time() - start)
+    return min(times)
+
+
+def seed(users: int):
+    """Create the tables and insert `users` users with 3 posts each, if there are none."""
+    db.create_all()
+    if db.session.query(User.id).first() is not None:
+        return
+    db.session.execute(User.__table__.insert(), [
+        {'username': f'user{i}', 'email': f'user{i}@example.com', 'first_name': 'First',
+         'last_name': 'Last', 'location': 'Kyiv'} for i in range(users)])
+    ids = [user_id for user_id, in db.session.query(User.id).all()]
+    db.session.execute(Post.__table__.insert(), [
+        {'title': f'Post {user_id}-{i}', 'description': 'Lorem ipsum dolor sit amet. ' * 8,
+         'author_id': user_id} for user_id in ids for i in range(3)])
+    db.session.commit()
+
+
+def user_cases(app, limit: int) -> dict:
+    """Return the (old, new) callables of every stage for the users listing."""
+    default_json, orjson = DefaultJSONProvider(app), app.json
+    names = field_names(UserSchema, None, USER_COLUMNS)
+
+    def old_query():
+        return users_query().order_by(User.registered_at, User.id).limit(limit).all()
+
+    def new_query():
+        rows = user_rows_query(names).order_by(User.registered_at, User.id).limit(limit).all()
+        post_rows = post_rows_query(POST_NAMES, Post.id) \
+            .filter(Post.author_id.in_([row.id for row in rows])).order_by(Post.id).all()
+        return rows, post_rows
+
+    def old_dump(users):
+        return users_schema.dump(users)
+
+    def new_dump(result):
+        rows, post_rows = result
+        posts = {row.id: [] for row in rows}
+        for row in post_rows:
+            posts[row.author_id].append(dict(zip(POST_NAMES, row)))
+        items = dump_rows(names, rows)
+        for user, row in zip(items, rows):
+            user['posts'] = posts[row.id]
+        return items
+
+    def old_total():
+        return default_json.response(items=old_dump(old_query()), next=None)
+
+    def new_total():
+        items, next_cursor, _ = get_users_page(limit)
+        return orjson.response(items=items, next=next_cursor)
+
+    return {'old': (old_query, old_dump, default_json, old_total),
+            'new': (new_query, new_dump, orjson, new_total)}
+
+
+def post_cases(app, limit: int) -> dict:
+    """Return the (old, new) callables of every stage for the posts listing."""
+    default_json, orjson = DefaultJSONProvider(app), app.json
+    names = field_names(PostSchema, None, POST_COLUMNS)
+
+    def old_query():
+        return posts_query().order_by(Post.created_at, Post.id).limit(limit).all()
+
+    def new_query():
+        return post_rows_query(names).order_by(Post.created_at, Post.id).limit(limit).all()
+
+    def old_dump(posts):
+        return posts_schema.dump(posts)
+
+    def new_dump(rows):
+        return dump_rows(names, rows)
+
+    def old_total():
+        return default_json.response(items=old_dump(old_query()), next=None)
+
+    def new_total():
+        items, next_cursor, _ = get_posts_page(limit)
+        return orjson.response(items=items, next=next_cursor)
+
+    return {'old': (old_query, old_dump, default_json, old_total),
+            'new': (new_query, new_dump, orjson, new_total)}
+
+
+def measure(cases: dict, runs: int) -> dict:
+    """Return the dump, encode and total CPU times of both paths, and the row count."""
+    results = {}
+    for path, (query, dump, provider, total) in cases.items():
+        rows = query()
+        items = dump(rows)
+        results['rows'] = len(items)
+        results[path] = {
+            'dump': best_time(lambda dump=dump, rows=rows: dump(rows), runs),
+            'encode': best_time(lambda provider=provider, items=items:
+                                provider.response(items=items, next=None), runs),
+            'total': best_time(total, runs),
+        }
+    return results
+
+
+def main():
+    """Parse the arguments and print the CPU time per row of both paths."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--limit', type=int, default=1000)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0, metavar='USERS')
+    args = parser.parse_args()
+
+    app = create_app({'LOGGING': None, 'METRICS': False, 'SERVER_TIMING': False})
+    with app.test_request_context():
+        if args.seed:
+            seed(args.seed)
+        for name, cases in (('users', user_cases(app, args.limit)),
+                            ('posts', post_cases(app, args.limit))):
+            results = measure(cases, args.runs)
+            rows = max(results['rows'], 1)
+            print(f"{name}, {results['rows']} rows, us/row   {'old':>8} {'new':>8} {'speedup':>8}")
+            for stage in ('dump', 'encode', 'total'):
+                old, new = results['old'][stage], results['new'][stage]
+                print(f'  {stage:<22} {old / rows * 1e6:>8.1f} {new / rows * 1e6:>8.1f} '
+                      f'{old / new if new else float("inf"):>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
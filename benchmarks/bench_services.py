@@ -0,0 +1,246 @@
+"""Micro-benchmarks of the service functions and of the schema dumps
+
+Calls every function of restflask/service/services.py --runs times, in a fresh
+session each time as a request would, on the generated data of datagen.py, and
+prints the p50 / p95 / p99 latency and the calls per second of each, from the
+best of --rounds rounds. The schema
+cases time `dump` alone, on ORM objects loaded beforehand. Reads are warmed up
+by one call which is not counted. Writes create, update and then delete their
+own 'bench_<n>' users and 'Benchmark post <n>' posts, so the data is left as it was.
+
+    python benchmarks/bench_services.py --runs 20 --save-baseline benchmarks/baselines/services.json
+    python benchmarks/bench_services.py --runs 20 --baseline benchmarks/baselines/services.json
+
+The record cache is off (--cache null), so the database path is measured.
+"""
+import argparse
+import collections
+import re
+import sys
+import time
+
+import benchlib
+import datagen
+
+# pylint: disable=wrong-import-position,wrong-import-order
+from sqlalchemy import delete, func
+
+from restflask.extensions import db
+from restflask.models.model import User, Post
+from restflask.models.model import user_schema, users_schema, users_summary_schema
+from restflask.models.model import post_schema, posts_schema
+from restflask.service import services
+
+PAGE_SIZE = 50
+SAMPLE_SIZE = 100
+BENCH_EMAIL = '@bench.invalid'
+BENCH_TITLE = 'Benchmark post '
+SEARCH_TERMS = ('planet', 'coffee history', 'python flask', 'lantern')
+
+
+def sample_data() -> dict:
+    """Pick the records the cases read and update, the same ones on every run."""
+    # pylint: disable=not-callable
+    users = db.session.query(User.id, User.email).order_by(User.id).limit(SAMPLE_SIZE).all()
+    posts = db.session.query(Post.id, Post.title).order_by(Post.id).limit(SAMPLE_SIZE).all()
+    author_id = db.session.query(Post.author_id).filter(Post.author_id.isnot(None)) \
+        .group_by(Post.author_id).order_by(func.count(Post.id).desc(), Post.author_id) \
+        .limit(1).scalar()
+    return {'user_ids': [str(user.id) for user in users], 'emails': [user.email for user in users],
+            'post_ids': [str(post.id) for post in posts], 'titles': [post.title for post in posts],
+            'author_id': author_id}
+
+
+def remove_bench_records():
+    """Delete what an interrupted run of the write cases left behind."""
+    db.session.execute(delete(Post).where(Post.title.like(BENCH_TITLE + '%')))
+    db.session.execute(delete(Post).where(Post.author_id.in_(
+        db.session.query(User.id).filter(User.email.like('%' + BENCH_EMAIL)))))
+    db.session.execute(delete(User).where(User.email.like('%' + BENCH_EMAIL)))
+    db.session.commit()
+
+
+def consume(iterator) -> None:
+    """Run a streaming service function to its end."""
+    collections.deque(iterator, maxlen=0)
+
+
+def read_cases(sample: dict) -> dict:
+    """Return the callables of the read functions, called with the call number."""
+
+    def pick(key):
+        values = sample[key]
+        return lambda i: values[i % len(values)]
+
+    user_id, email, post_id, title = (pick(key) for key in
+                                      ('user_ids', 'emails', 'post_ids', 'titles'))
+    return {
+        'get_users': lambda i: services.get_users(),
+        'get_users_summary': lambda i: services.get_users_summary(),
+        'get_users_page': lambda i: services.get_users_page(PAGE_SIZE),
+        'get_users_page(summary)': lambda i: services.get_users_page(PAGE_SIZE, summary=True),
+        'iter_users': lambda i: consume(services.iter_users()),
+        'get_user': lambda i: services.get_user(user_id(i)),
+        'get_user(email)': lambda i: services.get_user(email(i)),
+        'get_posts': lambda i: services.get_posts(),
+        'get_posts(author_id)': lambda i: services.get_posts(author_id=sample['author_id']),
+        'get_posts_page': lambda i: services.get_posts_page(PAGE_SIZE),
+        'iter_posts': lambda i: consume(services.iter_posts()),
+        'search_posts': lambda i: services.search_posts(SEARCH_TERMS[i % len(SEARCH_TERMS)],
+                                                        PAGE_SIZE),
+        'get_post': lambda i: services.get_post(post_id(i)),
+        'get_post(title)': lambda i: services.get_post(title(i)),
+        'users_etag': lambda i: services.users_etag(),
+        'posts_etag': lambda i: services.posts_etag(),
+        'user_version': lambda i: services.user_version(user_id(i)),
+        'post_version': lambda i: services.post_version(post_id(i)),
+    }
+
+
+def dump_cases() -> dict:
+    """
+    Return the (setup, callable) dumping ORM objects with the schemas. The setup loads
+    the objects in a new session, which the calls keep.
+    """
+    loaded = {}
+
+    def load():
+        db.session.remove()
+        loaded['users'] = services.users_query().order_by(User.id).limit(PAGE_SIZE).all()
+        loaded['summaries'] = services.build_users_query(summary=True) \
+            .order_by(User.id).limit(PAGE_SIZE).all()
+        loaded['posts'] = services.posts_query().order_by(Post.id).limit(PAGE_SIZE).all()
+
+    def one(key, i):
+        return loaded[key][i % len(loaded[key])]
+
+    return {
+        'user_schema.dump': (load, lambda i: user_schema.dump(one('users', i))),
+        'users_schema.dump': (load, lambda i: users_schema.dump(loaded['users'])),
+        'users_summary_schema.dump': (load, lambda i: users_summary_schema.dump(
+            loaded['summaries'])),
+        'post_schema.dump': (load, lambda i: post_schema.dump(one('posts', i))),
+        'posts_schema.dump': (load, lambda i: posts_schema.dump(loaded['posts'])),
+    }
+
+
+def write_cases(sample: dict) -> dict:
+    """
+    Return the (setup, callable) of the write functions, in the order they must run:
+    every delete case removes what the create case before it added.
+    """
+    created = {'users': [], 'posts': []}
+    user_ids, post_ids = sample['user_ids'], sample['post_ids']
+
+    def find_users():
+        created['users'] = [user_id for user_id, in db.session.query(User.id)
+                            .filter(User.email.like('%' + BENCH_EMAIL)).order_by(User.id)]
+
+    def find_posts():
+        created['posts'] = [post_id for post_id, in db.session.query(Post.id)
+                            .filter(Post.title.like(BENCH_TITLE + '%')).order_by(Post.id)]
+
+    def nth(key, i):
+        # A missing record (its create case did not run) is a failed call.
+        return created[key][i] if i < len(created[key]) else '0'
+
+    return {
+        'create_user': (None, lambda i: services.create_user({
+            'username': f'bench_{i}', 'email': f'bench_{i}{BENCH_EMAIL}',
+            'first_name': 'Bench', 'last_name': 'Mark', 'location': 'Kyiv'})),
+        'update_user': (None, lambda i: services.update_user({
+            'id': user_ids[i % len(user_ids)], 'location': datagen.LOCATIONS[i % 2][0]})),
+        'delete_user': (find_users, lambda i: services.delete_user(nth('users', i))),
+        'create_post': (None, lambda i: services.create_post({
+            'title': f'{BENCH_TITLE}{i}', 'description': 'Benchmark text. ' * 20,
+            'author_id': user_ids[i % len(user_ids)]})),
+        'update_post': (None, lambda i: services.update_post({
+            'id': post_ids[i % len(post_ids)], 'description': f'Updated {i} times.'})),
+        'delete_post': (find_posts, lambda i: services.delete_post(nth('posts', i))),
+    }
+
+
+def measure(call, runs: int, kind: str, rounds: int = 1) -> dict:
+    """
+    Time `rounds` rounds of `runs` calls of `call` and summarize the round with the
+    lowest p50, which filters out the slowdowns of the machine.
+
+    :param call: Called with the call number, unique across the rounds.
+    :param runs: The number of timed calls per round.
+    :param kind: 'read' cases get one extra warm-up call, 'write' cases count the
+        results other than 'Success' as errors, 'dump' cases keep the session.
+    :param rounds: The number of rounds.
+    """
+    if kind == 'read':
+        call(runs)
+    summaries = []
+    for first in range(0, rounds * runs, runs):
+        latencies, errors = [], 0
+        for i in range(first, first + runs):
+            if kind != 'dump':
+                db.session.remove()
+            start = time.perf_counter()
+            result = call(i)
+            latency = time.perf_counter() - start
+            if kind == 'write' and result != 'Success':
+                errors += 1
+            else:
+                latencies.append(latency)
+        summaries.append(benchlib.summarize(latencies, sum(latencies), errors))
+    return min(summaries, key=lambda summary: summary['p50_ms'])
+
+
+def parse_args(argv: list = None):
+    """Parse the command line options, `argv` or those of the process."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    datagen.add_arguments(parser)
+    benchlib.add_arguments(parser)
+    parser.add_argument('--runs', type=int, default=20, help='calls per round')
+    parser.add_argument('--rounds', type=int, default=3, help='the best round is reported')
+    parser.add_argument('--cache', default='null', help="CACHE_BACKEND, (default='null')")
+    parser.add_argument('--only', metavar='REGEX', help='run the matching cases only')
+    return parser.parse_args(argv)
+
+
+def run(args) -> tuple:
+    """
+    Runs the selected cases.
+
+    :param args: The options of `parse_args`.
+
+    :return:
+        tuple: (results, meta), the summaries by case and what they depend on.
+    """
+    app, dataset = datagen.prepare(args, {'CACHE_BACKEND': args.cache, 'METRICS': False,
+                                          'SERVER_TIMING': False})
+    selected = re.compile(args.only or '')
+    results = {}
+    with app.test_request_context():
+        remove_bench_records()
+        sample = sample_data()
+        cases = [(name, 'read', None, call) for name, call in read_cases(sample).items()]
+        cases += [(name, 'dump', setup, call) for name, (setup, call) in dump_cases().items()]
+        cases += [(name, 'write', setup, call)
+                  for name, (setup, call) in write_cases(sample).items()]
+        for name, kind, setup, call in cases:
+            if not selected.search(name):
+                continue
+            if setup is not None:
+                setup()
+            results[name] = measure(call, args.runs, kind, args.rounds)
+            print(f'{name}: {results[name]["p50_ms"]:.3f} ms', file=sys.stderr)
+        remove_bench_records()
+    return results, {'dataset': dataset, 'runs': args.runs, 'rounds': args.rounds,
+                     'cache': args.cache}
+
+
+def main() -> int:
+    """Parse the arguments, run the cases and check them against the baseline."""
+    args = parse_args()
+    results, meta = run(args)
+    # Calls per second of sequential calls are only the inverse of the mean latency.
+    return benchlib.finish(args, results, meta, throughput=False)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
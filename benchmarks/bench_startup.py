@@ -0,0 +1,55 @@
+"""Cold-start time of the application
+
+Every run starts a fresh interpreter, as a new gunicorn worker does, and measures
+the time to import restflask.app (which creates the application) and the latency
+of the first request.
+
+    python benchmarks/bench_startup.py --runs 10 --path /api/users/?limit=1
+
+The database settings (DB_*, DATABASE_URL) are taken from the environment.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+from restflask.app import app
+imported = time.perf_counter()
+response = app.test_client().get(sys.argv[1])
+served = time.perf_counter()
+print(json.dumps({"import": imported - start, "first_request": served - imported,
+                  "status": response.status_code, "modules": len(sys.modules)}))
+'''
+
+
+def measure(path: str) -> dict:
+    """Run the probe in a new interpreter and return its figures."""
+    output = subprocess.run([sys.executable, '-c', PROBE, path], cwd=ROOT, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    """Parse the arguments and print the median and worst figures of all runs."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--path', default='/api/users/?limit=1')
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [measure(args.path) for _ in range(args.runs)]
+    print(f"{'':<15} {'median ms':>10} {'max ms':>10}")
+    for key in ('import', 'first_request'):
+        values = [run[key] * 1000 for run in runs]
+        print(f'{key:<15} {statistics.median(values):>10.1f} {max(values):>10.1f}')
+    print(f"status {runs[-1]['status']}, {runs[-1]['modules']} modules loaded")
+
+
+if __name__ == '__main__':
+    main()
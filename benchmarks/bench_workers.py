@@ -0,0 +1,130 @@
+"""Requests/sec of sync versus gevent gunicorn workers
+
+Starts gunicorn once per worker class with restflask/gunicorn_conf.py, keeps
+CONCURRENCY keep-alive clients busy against an I/O-bound endpoint for DURATION
+seconds and prints the throughput and latency of each mode.
+
+    python benchmarks/bench_workers.py --path '/api/users/?limit=50' --concurrency 64
+
+The database settings (DB_*, DATABASE_URL) are taken from the environment.
+--query-delay serves delayed_app.py instead, which waits that many seconds
+before every statement, to stand in for MySQL on a database without I/O waits
+such as SQLite.
+"""
+import argparse
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    """Return a TCP port nobody listens on."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(port: int, path: str, deadline: float = 30.0):
+    """Block until the server answers `path`."""
+    stop = time.monotonic() + deadline
+    while time.monotonic() < stop:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', path)
+            connection.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('gunicorn did not start')
+
+
+def client(port: int, path: str, stop_at: float, latencies: list, errors: list):
+    """Send requests over one keep-alive connection until `stop_at`."""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    while time.monotonic() < stop_at:
+        start = time.perf_counter()
+        try:
+            connection.request('GET', path)
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+                continue
+        except (OSError, http.client.HTTPException) as exc:
+            errors.append(type(exc).__name__)
+            connection.close()
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+
+
+def run(worker_class: str, args) -> dict:
+    """Benchmark one worker class and return its figures."""
+    port = free_port()
+    env = dict(os.environ, GUNICORN_WORKER_CLASS=worker_class,
+               GUNICORN_WORKERS=str(args.workers), GUNICORN_BIND=f'127.0.0.1:{port}')
+    application = ['restflask.app:app']
+    if args.query_delay:
+        env['QUERY_DELAY'] = str(args.query_delay)
+        application = ['--pythonpath', 'benchmarks', 'delayed_app:app']
+    server = subprocess.Popen(  # pylint: disable=consider-using-with
+        [sys.executable, '-m', 'gunicorn', '-c', 'python:restflask.gunicorn_conf',
+         *application], cwd=ROOT, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(port, args.path)
+        latencies, errors = [], []
+        stop_at = time.monotonic() + args.duration
+        threads = [threading.Thread(target=client,
+                                    args=(port, args.path, stop_at, latencies, errors))
+                   for _ in range(args.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.terminate()
+        server.wait()
+    latencies.sort()
+    return {
+        'worker_class': worker_class,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': len(latencies) / args.duration,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else None,
+        'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000 if latencies else None,
+    }
+
+
+def main():
+    """Parse the arguments and print one line per worker class."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--path', default='/api/users/?limit=50')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--modes', default='sync,gevent')
+    parser.add_argument('--query-delay', type=float, default=0.0, metavar='SECONDS',
+                        help='wait before every statement, see delayed_app.py')
+    args = parser.parse_args()
+
+    results = [run(mode, args) for mode in args.modes.split(',')]
+    print(f"{'worker':<8} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for result in results:
+        print(f"{result['worker_class']:<8} {result['requests']:>9} {result['errors']:>7} "
+              f"{result['rps']:>9.1f} {result['p50_ms'] or 0:>8.1f} {result['p99_ms'] or 0:>8.1f}")
+    if len(results) > 1 and results[0]['rps']:
+        print(f"{results[-1]['worker_class']} / {results[0]['worker_class']}: "
+              f"{results[-1]['rps'] / results[0]['rps']:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
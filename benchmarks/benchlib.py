@@ -0,0 +1,143 @@
+"""Latency statistics and baselines of the benchmark suite
+
+Each benchmark produces one summary per case: the number of calls and of errors,
+the p50 / p95 / p99 latencies in milliseconds and the throughput ('rps', calls
+per second). --save-baseline stores the summaries, with the dataset and the
+options of the run, in a JSON file. --baseline compares a run with such a file
+and exits with status 1 if any case regressed:
+
+- its p50 latency grew by more than --tolerance (0.25 = 25 %), or its p95 latency,
+  which is noisier, by more than twice as much, and by more than MIN_DELTA_MS,
+  which keeps sub-millisecond noise out;
+- or, for the load tests, its throughput dropped by more than --tolerance;
+- or it failed more often than in the baseline.
+
+A run on other data or with other options than the baseline is refused (status 2).
+"""
+import json
+import math
+import os
+import platform
+
+MIN_DELTA_MS = 0.05
+# Latency metrics compared with a baseline, and the multiple of --tolerance they allow.
+LATENCY_METRICS = (('p50_ms', 1), ('p95_ms', 2))
+
+
+def percentile(ordered: list, fraction: float) -> float:
+    """Return the nearest-rank percentile of the sorted values, 0 if there are none."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+def summarize(latencies: list, elapsed: float, errors: int = 0) -> dict:
+    """
+    Summarizes the calls of one case.
+
+    :param latencies: The duration of every successful call, in seconds.
+    :param elapsed: The wall-clock time of all the calls, in seconds.
+    :param errors: The number of failed calls.
+
+    :return:
+        dict: 'requests', 'errors', 'rps', 'p50_ms', 'p95_ms' and 'p99_ms'.
+    """
+    ordered = sorted(latencies)
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'rps': round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 4),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 4),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 4),
+    }
+
+
+def format_table(results: dict) -> str:
+    """Return the summaries of `results` as an aligned table, one case per line."""
+    width = max([len(name) for name in results] + [4])
+    lines = [f"{'case':<{width}} {'calls':>7} {'errors':>6} {'req/s':>10} "
+             f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"]
+    for name, result in results.items():
+        lines.append(f"{name:<{width}} {result['requests']:>7} {result['errors']:>6} "
+                     f"{result['rps']:>10.1f} {result['p50_ms']:>9.3f} "
+                     f"{result['p95_ms']:>9.3f} {result['p99_ms']:>9.3f}")
+    return '\n'.join(lines)
+
+
+def compare(results: dict, baseline: dict, tolerance: float, throughput: bool = True) -> list:
+    """
+    Compares the summaries of a run with those of a baseline.
+
+    :param results: The summaries of the run, by case.
+    :param baseline: The summaries of the baseline, by case.
+    :param tolerance: The relative slowdown allowed, e.g. 0.25.
+    :param throughput: Compare the 'rps' too.
+
+    :return:
+        list of str: One message per regression, empty if there is none.
+    """
+    regressions = []
+    for name, old in baseline.items():
+        new = results.get(name)
+        if new is None:
+            continue
+        for metric, factor in LATENCY_METRICS:
+            if (new[metric] > old[metric] * (1 + tolerance * factor)
+                    and new[metric] - old[metric] > MIN_DELTA_MS):
+                regressions.append(f'{name}: {metric} {old[metric]:.3f} -> {new[metric]:.3f}')
+        if throughput and new['rps'] < old['rps'] / (1 + tolerance):
+            regressions.append(f"{name}: rps {old['rps']:.1f} -> {new['rps']:.1f}")
+        if new['errors'] > old['errors']:
+            regressions.append(f"{name}: errors {old['errors']} -> {new['errors']}")
+    return regressions
+
+
+def add_arguments(parser):
+    """Add the baseline options to an argparse parser."""
+    parser.add_argument('--baseline', metavar='PATH',
+                        help='fail if the run is slower than this saved run')
+    parser.add_argument('--save-baseline', metavar='PATH', help='save the run to this file')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='relative slowdown allowed by --baseline, (default=0.25)')
+
+
+def finish(args, results: dict, meta: dict, throughput: bool = True) -> int:
+    """
+    Prints the results, then saves and/or checks them against a baseline as asked by `args`.
+
+    :param args: The parsed options of `add_arguments`.
+    :param results: The summaries of the run, by case.
+    :param meta: What the run depends on (dataset, options), which a baseline must match.
+    :param throughput: Compare the throughput of the cases too.
+
+    :return:
+        int: The exit status, 0 if no regression was found.
+    """
+    print(format_table(results))
+    meta = {**meta, 'python': platform.python_version()}
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, 'w', encoding='utf-8') as file:
+            json.dump({'meta': meta, 'results': results}, file, indent=2, sort_keys=True)
+        print(f'Baseline saved to {args.save_baseline}')
+    if not args.baseline:
+        return 0
+    with open(args.baseline, encoding='utf-8') as file:
+        baseline = json.load(file)
+    mismatched = {key: (value, meta.get(key)) for key, value in baseline['meta'].items()
+                  if meta.get(key) != value}
+    if mismatched:
+        print(f'Not comparable with {args.baseline}, (baseline, run): {mismatched}')
+        return 2
+    missing = sorted(set(baseline['results']) - set(results))
+    if missing:
+        print(f"Cases of the baseline which did not run: {', '.join(missing)}")
+    regressions = compare(results, baseline['results'], args.tolerance, throughput)
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+    if regressions:
+        print(f'{len(regressions)} regression(s) against {args.baseline}')
+        return 1
+    print(f'No regression against {args.baseline}')
+    return 0
@@ -0,0 +1,258 @@
+"""Seeded synthetic data for the benchmarks
+
+Bulk-loads users and posts shaped like a real blog rather than a uniform grid,
+so that the benchmarks hit the same hot spots as production:
+
+- the number of posts per author follows a Zipf law (--skew): a few authors
+  wrote most of the posts and many wrote none. Authors are shuffled, so the
+  most prolific ones are not the lowest ids;
+- a share of the posts (--orphans) has no author;
+- words of titles and descriptions are Zipf-distributed too, and description
+  lengths are log-normal (median 60 words), which matters for the search;
+- sign-ups accelerate over the HISTORY_DAYS days before EPOCH, and posts are
+  written after the registration of their author, mostly recently.
+
+The same --seed always produces the same rows. Ids are assigned after the largest
+existing id, so data can be appended to a database which is not empty.
+
+    python benchmarks/datagen.py --users 1000 --posts 10000 --seed 1
+
+The database is --database, else DATABASE_URL, else the SQLite file
+benchmarks/bench.db. On MySQL, create the schema with `flask db upgrade` first:
+`db.create_all()` does not create the FULLTEXT index of the search.
+"""
+import argparse
+import math
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from itertools import islice
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# pylint: disable=wrong-import-position
+from sqlalchemy import func
+
+from restflask.config import create_app
+from restflask.extensions import db
+from restflask.models.model import User, Post
+
+DEFAULT_DATABASE = 'sqlite:///' + os.path.join(ROOT, 'benchmarks', 'bench.db')
+# Fixed "now" of the generated dates, which must not depend on the day of the run.
+EPOCH = datetime(2023, 3, 1)
+HISTORY_DAYS = 3 * 365
+CHUNK_SIZE = 5000
+
+FIRST_NAMES = ('Olena', 'Andrii', 'Iryna', 'Taras', 'Oksana', 'Dmytro', 'Kateryna', 'Yurii',
+               'Sofiia', 'Mykola', 'Anna', 'Serhii', 'Maria', 'Oleh', 'Daria', 'Ivan')
+LAST_NAMES = ('Shevchenko', 'Kovalenko', 'Bondarenko', 'Tkachenko', 'Kravchenko', 'Melnyk',
+              'Boiko', 'Koval', 'Oliinyk', 'Lysenko', 'Marchenko', 'Rudenko', 'Savchenko')
+# Locations of the users and their relative weights.
+LOCATIONS = (('Kyiv', 40), ('Lviv', 15), ('Kharkiv', 12), ('Odesa', 10), ('Dnipro', 8),
+             ('Warsaw', 6), ('Berlin', 5), ('London', 4))
+# Ordered by decreasing frequency.
+WORDS = tuple('''
+    the of and to in is for on with that this it as at by from are be or was an
+    python flask data planet travel code music city night review guide life coffee
+    river mountain history design story garden winter summer book release server
+    database query cache people market football science photo recipe bread weekend
+    festival language engine lesson memory forest island train bridge ocean storm
+    kitchen museum harbor concert galaxy pixel thread kernel vector lantern meadow
+'''.split())
+
+
+def zipf_weights(count: int, exponent: float) -> list:
+    """Return the weights of ranks 1..count under a Zipf law."""
+    return [1 / rank ** exponent for rank in range(1, count + 1)]
+
+
+def _words(rng: random.Random, weights: list, count: int) -> str:
+    """Return `count` words drawn by frequency."""
+    return ' '.join(rng.choices(WORDS, weights, k=count))
+
+
+def generate_users(rng: random.Random, count: int, first_id: int):
+    """
+    Yields the rows of `count` users with the ids following `first_id`.
+
+    :param rng: The seeded random generator.
+    :param count: The number of users.
+    :param first_id: The id of the first user.
+    """
+    cities, city_weights = zip(*LOCATIONS)
+    for user_id in range(first_id, first_id + count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        # The square root favours recent sign-ups.
+        days_ago = HISTORY_DAYS * (1 - math.sqrt(rng.random()))
+        yield {
+            'id': user_id,
+            'username': f'{first[:8]}_{last[:10]}_{user_id}'.lower(),
+            'email': f'{first}.{last}.{user_id}@example.com'.lower(),
+            'first_name': first,
+            'last_name': last,
+            'location': rng.choices(cities, city_weights)[0],
+            # Whole seconds, as the DATETIME columns of MySQL store them.
+            'registered_at': EPOCH - timedelta(days=round(days_ago * 86400) / 86400),
+        }
+
+
+def _shuffled_weights(rng: random.Random, count: int, skew: float) -> list:
+    """Return the Zipf weights of `count` ranks in a random order."""
+    ranks = list(range(count))
+    rng.shuffle(ranks)
+    rank_weights = zipf_weights(count, skew)
+    return [rank_weights[rank] for rank in ranks]
+
+
+def generate_posts(rng: random.Random, authors: list, count: int,  # pylint: disable=R0913
+                   first_id: int, skew: float = 1.1, orphans: float = 0.01):
+    """
+    Yields the rows of `count` posts with the ids following `first_id`.
+
+    :param rng: The seeded random generator.
+    :param authors: (id, registered_at) of the users who may write posts.
+    :param count: The number of posts.
+    :param first_id: The id of the first post.
+    :param skew: The Zipf exponent of the number of posts per author.
+    :param orphans: The share of posts without author.
+    """
+    word_weights = zipf_weights(len(WORDS), 1.0)
+    if not authors:
+        orphans = 1
+    else:
+        author_weights = _shuffled_weights(rng, len(authors), skew)
+    oldest = EPOCH - timedelta(days=HISTORY_DAYS)
+    for post_id in range(first_id, first_id + count):
+        if rng.random() < orphans:
+            author_id, registered_at = None, oldest
+        else:
+            author_id, registered_at = rng.choices(authors, author_weights)[0]
+        length = min(400, max(5, int(rng.lognormvariate(math.log(60), 0.6))))
+        # The cube root favours recent posts.
+        age = max(EPOCH - registered_at, timedelta(0)) * (1 - rng.random() ** (1 / 3))
+        yield {
+            'id': post_id,
+            'title': _words(rng, word_weights, rng.randint(3, 8)).capitalize(),
+            'description': _words(rng, word_weights, length).capitalize() + '.',
+            'created_at': EPOCH - timedelta(seconds=round(age.total_seconds())),
+            'author_id': author_id,
+        }
+
+
+def _insert(model, rows) -> int:
+    """Insert `rows` in chunks of CHUNK_SIZE, committing each of them. Return the row count."""
+    total = 0
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, CHUNK_SIZE))
+        if not chunk:
+            return total
+        db.session.execute(model.__table__.insert(), chunk)
+        db.session.commit()
+        total += len(chunk)
+
+
+def load(users: int, posts: int, seed: int = 1, skew: float = 1.1,  # pylint: disable=R0913
+         orphans: float = 0.01) -> dict:
+    """
+    Inserts generated users, then posts written by all the users of the database.
+    Must run in an application context.
+
+    :param users: The number of users to add.
+    :param posts: The number of posts to add.
+    :param seed: The seed of the random generator.
+    :param skew: The Zipf exponent of the number of posts per author.
+    :param orphans: The share of posts without author.
+
+    :return:
+        dict: The `describe()` of the database.
+    """
+    rng = random.Random(seed)
+    first_id = (db.session.query(func.max(User.id)).scalar() or 0) + 1  # pylint: disable=E1102
+    _insert(User, generate_users(rng, users, first_id))
+    authors = [tuple(row) for row in
+               db.session.query(User.id, User.registered_at).order_by(User.id)]
+    first_id = (db.session.query(func.max(Post.id)).scalar() or 0) + 1  # pylint: disable=E1102
+    _insert(Post, generate_posts(rng, authors, posts, first_id, skew, orphans))
+    return describe()
+
+
+def describe() -> dict:
+    """
+    Returns the size and the skew of the data, the dataset a benchmark ran on.
+
+    :return:
+        dict: The backend, the 'users' and 'posts' counts, the posts of the most
+        prolific author, and the share of posts written by the top 1% of the authors.
+    """
+    # pylint: disable=not-callable
+    per_author = [count for count, in db.session.query(func.count(Post.id))
+                  .filter(Post.author_id.isnot(None)).group_by(Post.author_id)
+                  .order_by(func.count(Post.id).desc())]
+    posts = db.session.query(func.count(Post.id)).scalar()
+    top = per_author[:max(1, len(per_author) // 100)]
+    return {
+        'backend': db.engine.url.get_backend_name(),
+        'users': db.session.query(func.count(User.id)).scalar(),
+        'posts': posts,
+        'max_posts_per_author': per_author[0] if per_author else 0,
+        'top_1pct_share': round(sum(top) / posts, 3) if posts else 0,
+    }
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Add the options selecting and filling the benchmark database."""
+    parser.add_argument('--database', default=os.environ.get('DATABASE_URL', DEFAULT_DATABASE),
+                        help='SQLAlchemy URL, DATABASE_URL or benchmarks/bench.db by default')
+    parser.add_argument('--users', type=int, default=1000, help='users to generate')
+    parser.add_argument('--posts', type=int, default=10000, help='posts to generate')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent of posts per author')
+    parser.add_argument('--orphans', type=float, default=0.01, help='share of posts without author')
+    parser.add_argument('--reset', action='store_true',
+                        help='drop and recreate the tables first (SQLite only)')
+
+
+def create_schema(reset: bool = False):
+    """Create the missing tables, after dropping all of them if `reset` is set."""
+    if reset:
+        if db.engine.url.get_backend_name() != 'sqlite':
+            raise SystemExit('--reset only drops SQLite databases')
+        db.drop_all()
+    db.create_all()
+
+
+def prepare(args, config: dict = None):
+    """
+    Creates the application on --database and generates the data if the tables are empty.
+
+    :param args: The parsed options of `add_arguments`.
+    :param config: Configuration overriding the benchmark defaults.
+
+    :return:
+        tuple: (app, dataset), where dataset is the `describe()` of the database.
+    """
+    app = create_app({'SQLALCHEMY_DATABASE_URI': args.database, 'LOGGING': None,
+                      **(config or {})})
+    with app.app_context():
+        create_schema(args.reset)
+        if db.session.query(User.id).first() is None:
+            return app, load(args.users, args.posts, args.seed, args.skew, args.orphans)
+        return app, describe()
+
+
+def main():
+    """Parse the arguments, append the generated data and print its description."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    args = parser.parse_args()
+    app = create_app({'SQLALCHEMY_DATABASE_URI': args.database, 'LOGGING': None})
+    with app.app_context():
+        create_schema(args.reset)
+        print(load(args.users, args.posts, args.seed, args.skew, args.orphans))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+"""The application of restflask/app.py, waiting QUERY_DELAY seconds before every statement
+
+Stands in for the network round trip and the server time of a MySQL query when
+bench_workers.py runs against SQLite, whose queries never wait on I/O. The wait
+is time.sleep, which gunicorn monkey-patches in gevent workers: it yields to the
+other greenlets as PyMySQL does while it reads from its socket, and blocks a sync
+worker as any driver does.
+
+    QUERY_DELAY=0.01 gunicorn --pythonpath benchmarks delayed_app:app
+"""
+import os
+import time
+
+from sqlalchemy import event
+
+from restflask.app import app
+from restflask.extensions import db
+
+QUERY_DELAY = float(os.environ.get('QUERY_DELAY', 0.01))
+
+
+def wait(*args):  # pylint: disable=unused-argument
+    """Sleep QUERY_DELAY seconds."""
+    time.sleep(QUERY_DELAY)
+
+
+with app.app_context():
+    event.listen(db.engine, 'before_cursor_execute', wait)
@@ -1,7 +1,7 @@
 """"APPLICATION"""
-from .views import web_view # pylint: disable=unused-import
-from .rest import api_view # pylint: disable=unused-import
-from .config import app
+from .config import create_app
+
+app = create_app()
 
 
 if __name__ == '__main__':
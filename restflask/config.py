@@ -1,17 +1,24 @@
-"""Project configuration"""
+"""Project configuration and application factory"""
 import os
 
-import logging
-from logging.config import dictConfig
+import click
 from flask import Flask
-from flask_migrate import Migrate
-from flask_sqlalchemy import SQLAlchemy
-from flask_marshmallow import Marshmallow
 
+from .extensions import db, ma, cache
+from .rest.json_provider import OrjsonProvider
+from .service.fragments import init_fragments
+from .service.logs import configure_logging, log_level
+from .service.metrics import init_metrics
+from .service.pool import engine_options, enforce_foreign_keys
+from .service.profiling import init_profiling
+from .service.replicas import init_replicas, replica_binds
+from .service.tracing import init_tracing
 
-logger = logging.getLogger(__name__)
-dictConfig({
+
+LOGGING = {
     "version": 1,
+    # create_app runs after the libraries created their loggers, keep them enabled.
+    "disable_existing_loggers": False,
     "formatters": {
         "default":{
             "format":
@@ -25,6 +32,8 @@ dictConfig({
             "maxBytes": 1000000,
             "backupCount": 5,
             "formatter": "default",
+            # The file is opened by the first record, not when logging is configured.
+            "delay": True,
         },
         "console": {
             "class": "logging.StreamHandler",
@@ -35,26 +44,173 @@ dictConfig({
             "class": "logging.FileHandler",
             "filename": "restflask.log",
             "formatter": "default",
+            "delay": True,
         }
     },
     "root": {"level": "DEBUG", "handlers": ["console", "size-rotate"]}
-})
+}
 
 
-DB_ADDR = '127.0.0.1'
-DB_PORT = 3306
-DB_USER = 'root'
-DB_PASS = '' #root
-DB_NAME = 'epamproj'
+DB_ADDR = os.environ.get('DB_ADDR', '127.0.0.1')
+DB_PORT = int(os.environ.get('DB_PORT', 3306))
+DB_USER = os.environ.get('DB_USER', 'root')
+DB_PASS = os.environ.get('DB_PASS', '') #root
+DB_NAME = os.environ.get('DB_NAME', 'epamproj')
+# 'mysqldb' (mysqlclient) or 'pymysql', which cooperates with gevent workers.
+DB_DRIVER = os.environ.get('DB_DRIVER', 'mysqldb')
 
-app = Flask(__name__)
-ma = Marshmallow(app)
+MIGRATION_DIR = os.path.join('restflask', 'migrations')
 
-app.config['SECRET_KEY'] = 'youllneverdecodeit'
 
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SQLALCHEMY_DATABASE_URI'] = f'mysql://{DB_USER}:{DB_PASS}@{DB_ADDR}/{DB_NAME}'
-db = SQLAlchemy(app)
+class Config:  # pylint: disable=too-few-public-methods
+    """Default settings, each of them can be overridden through `create_app`."""
+    SECRET_KEY = 'youllneverdecodeit'
 
-MIGRATION_DIR = os.path.join('restflask', 'migrations')
-migrate = Migrate(app, db, directory=MIGRATION_DIR)
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_DATABASE_URI = os.environ.get(
+        'DATABASE_URL', f'mysql+{DB_DRIVER}://{DB_USER}:{DB_PASS}@{DB_ADDR}:{DB_PORT}/{DB_NAME}')
+    # SQLALCHEMY_ENGINE_OPTIONS default to the pool sizing of DB_POOL_PRESET
+    # ('production' or 'development') and the DB_POOL_SIZE / DB_MAX_OVERFLOW /
+    # DB_POOL_RECYCLE / DB_POOL_TIMEOUT / DB_POOL_PRE_PING environment variables,
+    # see service/pool.py.
+    # Read replicas, see service/replicas.py. DATABASE_REPLICA_URLS is comma-separated.
+    SQLALCHEMY_REPLICA_URIS = [uri.strip() for uri in
+                               os.environ.get('DATABASE_REPLICA_URLS', '').split(',')
+                               if uri.strip()]
+    # Seconds a replica health check is trusted.
+    REPLICA_CHECK_INTERVAL = float(os.environ.get('REPLICA_CHECK_INTERVAL', 5))
+    # Seconds the clients of a write read from the primary, above the replication lag.
+    REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+    REPLICA_STICKY_COOKIE = 'rf_primary'
+
+    # The 'memory' backend is private to a process, gunicorn_conf.py replaces it when
+    # several workers run.
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+    CACHE_TTL = 300
+    CACHE_MAX_ENTRIES = 10000
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://127.0.0.1:6379/0')
+    # Rows per page of the web lists, whose rendered tables are cached,
+    # see service/fragments.py. The `limit` query parameter goes up to WEB_MAX_PAGE_SIZE.
+    WEB_PAGE_SIZE = 50
+    WEB_MAX_PAGE_SIZE = 200
+    # Above this many users, the author field of the post forms is a typeahead
+    # served by /api/authors/ instead of a list of every user.
+    AUTHOR_SELECT_LIMIT = 200
+    # Users with more posts than this are deleted by a background purge, see service/purge.py.
+    # 0 disables the purge: every user is then deleted by one DELETE, after reading the cache
+    # keys of all its posts. The purge deletes USER_PURGE_CHUNK_SIZE posts per transaction.
+    USER_PURGE_THRESHOLD = int(os.environ.get('USER_PURGE_THRESHOLD', 1000))
+    USER_PURGE_CHUNK_SIZE = 1000
+
+    # 'development', 'testing' or 'production', selects the default log level.
+    APP_ENV = os.environ.get('APP_ENV', 'development')
+    # Overrides the level of APP_ENV, e.g. 'INFO'.
+    LOG_LEVEL = os.environ.get('LOG_LEVEL')
+    # Write the log records from a background thread, see service/logs.py.
+    LOG_QUEUE = os.environ.get('LOG_QUEUE', '1') != '0'
+    # dictConfig applied by `create_app`, None leaves logging alone.
+    LOGGING = LOGGING
+    # Trace every request, see service/tracing.py.
+    TRACING = os.environ.get('TRACING', '0') == '1'
+    # Trace the requests sent with the `X-Trace: 1` header. Off by default: any client could
+    # make the server trace its requests and learn their trace ids.
+    TRACING_HEADER = os.environ.get('TRACING_HEADER', '0') == '1'
+    # Log SQL statements slower than this many seconds, None disables the log.
+    SLOW_QUERY_THRESHOLD = float(os.environ.get('SLOW_QUERY_THRESHOLD', 0.5))
+    # Add the Server-Timing header to every response, see service/profiling.py. Off by default:
+    # it tells every client the query count and the SQL time of the requests.
+    SERVER_TIMING = os.environ.get('SERVER_TIMING', '0') == '1'
+    # Profile the requests sent with the `X-Profile: 1` header into PROFILE_DIR.
+    PROFILING = os.environ.get('PROFILING', '0') == '1'
+    # 'cprofile' or 'pyinstrument' (requires `pip install pyinstrument`).
+    PROFILER = os.environ.get('PROFILER', 'cprofile')
+    PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+    # Cache-Control of the read endpoints, which answer conditional requests with 304,
+    # see rest/conditional.py. 'no-cache' lets clients store responses but revalidate them.
+    HTTP_CACHE_CONTROL = os.environ.get('HTTP_CACHE_CONTROL', 'no-cache')
+    # Expose Prometheus metrics at METRICS_PATH, see service/metrics.py.
+    METRICS = True
+    METRICS_PATH = '/metrics'
+    # Set up Flask-Migrate even outside of the `flask db` commands.
+    MIGRATE = False
+
+
+class MigrateCommands(click.Group):
+    """
+    The `flask db` command group, which sets up Flask-Migrate on first use.
+
+    Flask-Migrate imports Alembic, which costs more import time than the rest of the
+    application, so worker processes and tests which never migrate skip it.
+    """
+
+    def __init__(self, app: Flask):
+        super().__init__('db', help='Perform database migrations.')
+        self.app = app
+
+    def commands_group(self) -> click.Group:
+        """Set up Flask-Migrate and return its command group."""
+        init_migrate(self.app)
+        from flask_migrate.cli import db as commands  # pylint: disable=import-outside-toplevel
+        return commands
+
+    def list_commands(self, ctx):
+        return self.commands_group().list_commands(ctx)
+
+    def get_command(self, ctx, cmd_name):
+        return self.commands_group().get_command(ctx, cmd_name)
+
+
+def init_migrate(app: Flask):
+    """Set up Flask-Migrate for `app`, unless it already is."""
+    if 'migrate' not in app.extensions:
+        from flask_migrate import Migrate  # pylint: disable=import-outside-toplevel
+        Migrate(app, db, directory=MIGRATION_DIR)
+
+
+def create_app(config=None) -> Flask:
+    """
+    Creates and configures the application.
+
+    :param config: A dict or an object whose upper-case attributes override `Config`.
+
+    :return:
+        Flask: The application with the web and API blueprints registered.
+    """
+    app = Flask(__name__)
+    app.json = OrjsonProvider(app)
+    app.config.from_object(Config)
+    if isinstance(config, dict):
+        app.config.from_mapping(config)
+    elif config is not None:
+        app.config.from_object(config)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS',
+                          engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+    app.config['SQLALCHEMY_BINDS'] = {**app.config.get('SQLALCHEMY_BINDS', {}),
+                                      **replica_binds(app.config['SQLALCHEMY_REPLICA_URIS'])}
+    if app.config['LOGGING']:
+        configure_logging(app.config['LOGGING'],
+                          log_level(app.config['APP_ENV'], app.config['LOG_LEVEL']),
+                          app.config['LOG_QUEUE'])
+
+    db.init_app(app)
+    init_replicas(app, db)
+    with app.app_context():
+        for engine in db.engines.values():
+            enforce_foreign_keys(engine)
+    ma.init_app(app)
+    cache.init_app(app)
+    init_fragments()
+    init_tracing(app)
+    init_profiling(app)
+    init_metrics(app)
+    if app.config['MIGRATE']:
+        init_migrate(app)
+    else:
+        app.cli.add_command(MigrateCommands(app))
+
+    # The views import the models and the service layer, which need the extensions above.
+    from .views.web_view import web  # pylint: disable=import-outside-toplevel
+    from .rest.api_view import api  # pylint: disable=import-outside-toplevel
+    app.register_blueprint(web)
+    app.register_blueprint(api)
+    return app
@@ -0,0 +1,10 @@
+"""Flask extensions, bound to the application by `config.create_app`"""
+from flask_sqlalchemy import SQLAlchemy
+from flask_marshmallow import Marshmallow
+
+from .service.cache import Cache
+from .service.replicas import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+ma = Marshmallow()
+cache = Cache()
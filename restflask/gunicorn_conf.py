@@ -0,0 +1,92 @@
+"""Gunicorn configuration
+
+    gunicorn -c python:restflask.gunicorn_conf restflask.app:app
+
+GUNICORN_WORKER_CLASS selects the deployment mode:
+
+- 'gevent' (default): every worker serves up to GUNICORN_WORKER_CONNECTIONS
+  requests concurrently on greenlets. Gunicorn monkey-patches the standard
+  library in each worker, so the pure-Python PyMySQL driver yields to other
+  greenlets while it waits for MySQL; the C driver mysqlclient would block the
+  whole worker. DB_DRIVER therefore defaults to 'pymysql' in this mode, and a
+  MySQL DATABASE_URL or DATABASE_REPLICA_URLS entry naming another driver (or
+  none, 'mysql://' is mysqlclient) is refused.
+- 'sync': one request at a time per worker, with the mysqlclient driver.
+
+Each worker writes its Prometheus samples to PROMETHEUS_MULTIPROC_DIR, which
+is emptied when gunicorn starts, so /metrics reports the sum over all workers.
+
+Each worker owns its own connection pool. The pool is sized so that
+workers * pool_size stays within DB_MAX_CONNECTIONS, and never exceeds the
+number of requests a worker can serve at once.
+
+The workers must share their cache: a write invalidates the records, the
+fragment data version and the author choices in the cache of its own worker
+only, so with the per-process 'memory' backend the other workers would keep
+serving the previous data, under a current ETag. With several workers
+CACHE_BACKEND defaults to 'redis' if CACHE_REDIS_URL is set, else to 'null',
+and 'memory' is refused.
+"""
+# pylint: disable=invalid-name
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+bind = os.environ.get('GUNICORN_BIND', '127.0.0.1:8000')
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+keepalive = 5
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')
+
+# INFO logging unless LOG_LEVEL says otherwise.
+os.environ.setdefault('APP_ENV', 'production')
+
+# Connections of the MySQL server available to this deployment.
+db_max_connections = int(os.environ.get('DB_MAX_CONNECTIONS', 150))
+
+if worker_class == 'gevent':
+    os.environ.setdefault('DB_DRIVER', 'pymysql')
+    database_urls = [os.environ.get('DATABASE_URL', f"mysql+{os.environ['DB_DRIVER']}://"),
+                     *os.environ.get('DATABASE_REPLICA_URLS', '').split(',')]
+    for url in database_urls:
+        dialect, _, driver = url.strip().partition('://')[0].partition('+')
+        if dialect in ('mysql', 'mariadb') and driver != 'pymysql':
+            raise ValueError(f"The '{driver or 'default'}' MySQL driver blocks the gevent "
+                             "workers, use mysql+pymysql:// URLs or "
+                             "GUNICORN_WORKER_CLASS=sync")
+    concurrency = worker_connections
+else:
+    concurrency = int(os.environ.get('GUNICORN_THREADS', 1))
+    threads = concurrency
+
+# The workers inherit the environment of the master, where this module runs.
+# Explicit DB_POOL_* settings take precedence.
+pool_size = max(1, min(concurrency, db_max_connections // workers))
+os.environ.setdefault('DB_POOL_SIZE', str(pool_size))
+os.environ.setdefault('DB_MAX_OVERFLOW', '0')
+
+if workers > 1:
+    os.environ.setdefault('CACHE_BACKEND', 'redis' if os.environ.get('CACHE_REDIS_URL') else 'null')
+    if os.environ['CACHE_BACKEND'] == 'memory':
+        raise ValueError("CACHE_BACKEND 'memory' is not shared by the gunicorn workers, "
+                         "use 'redis' or 'null', or GUNICORN_WORKERS=1")
+
+# Shared directory of the memory-mapped metric files of the workers.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR',
+                      os.path.join(tempfile.gettempdir(), 'restflask-metrics'))
+
+
+def on_starting(server):  # pylint: disable=unused-argument
+    """Drop the metric files of a previous run."""
+    directory = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+
+
+def child_exit(server, worker):  # pylint: disable=unused-argument
+    """Remove the live gauges of a worker which exited."""
+    from prometheus_client import multiprocess  # pylint: disable=import-outside-toplevel
+    multiprocess.mark_process_dead(worker.pid)
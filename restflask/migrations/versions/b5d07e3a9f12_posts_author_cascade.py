@@ -0,0 +1,32 @@
+"""posts.author_id ON DELETE CASCADE
+
+Revision ID: b5d07e3a9f12
+Revises: e41b7a9c2d58
+Create Date: 2026-10-18 16:24:09.530417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d07e3a9f12'
+down_revision = 'e41b7a9c2d58'
+branch_labels = None
+depends_on = None
+
+FOREIGN_KEY = 'fk_posts_author_id_users'
+
+
+def upgrade():
+    # The first migration left the foreign key unnamed, MySQL named it itself.
+    for foreign_key in sa.inspect(op.get_bind()).get_foreign_keys('posts'):
+        if foreign_key['constrained_columns'] == ['author_id']:
+            op.drop_constraint(foreign_key['name'], 'posts', type_='foreignkey')
+    op.create_foreign_key(FOREIGN_KEY, 'posts', 'users', ['author_id'], ['id'],
+                          ondelete='CASCADE')
+
+
+def downgrade():
+    op.drop_constraint(FOREIGN_KEY, 'posts', type_='foreignkey')
+    op.create_foreign_key('posts_ibfk_1', 'posts', 'users', ['author_id'], ['id'])
@@ -0,0 +1,39 @@
+"""updated_at columns
+
+Revision ID: e41b7a9c2d58
+Revises: c7e2b19f4d83
+Create Date: 2026-10-18 13:02:41.118306
+
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e41b7a9c2d58'
+down_revision = 'c7e2b19f4d83'
+branch_labels = None
+depends_on = None
+
+PRECISE_DATETIME = sa.DateTime(timezone=True).with_variant(
+    mysql.DATETIME(timezone=True, fsp=6), 'mysql')
+
+
+def upgrade():
+    # Existing rows get the UTC time of the migration, the application sets the column
+    # on every insert and update from then on.
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    for table in ('users', 'posts'):
+        op.add_column(table, sa.Column('updated_at', PRECISE_DATETIME, nullable=True))
+        op.execute(sa.table(table, sa.column('updated_at')).update().values(updated_at=now))
+        op.alter_column(table, 'updated_at', existing_type=PRECISE_DATETIME, nullable=False)
+        op.create_index(f'ix_{table}_updated_at', table, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in ('posts', 'users'):
+        op.drop_index(f'ix_{table}_updated_at', table_name=table)
+        op.drop_column(table, 'updated_at')
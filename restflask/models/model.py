@@ -1,10 +1,22 @@
 """Project Models"""
+from datetime import datetime, timezone
+
 from marshmallow import fields
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, func
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Index, func, select
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm import column_property, relationship
 # from sqlalchemy.sql import func
 
-from ..config import db, ma
+from ..extensions import db, ma
+
+# Microsecond precision, so that two changes within one second get different versions.
+PRECISE_DATETIME = DateTime(timezone=True).with_variant(
+    mysql.DATETIME(timezone=True, fsp=6), 'mysql')
+
+
+def utcnow() -> datetime:
+    """Return the current UTC time as a naive datetime, the value of the `updated_at` columns."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
 
 
 class User(db.Model):
@@ -19,17 +31,27 @@ class User(db.Model):
             last_name (str): The user's last name, at most 35 characters.
             location (str): The user's location, at most 45 characters.
             registered_at (datetime): The date and time when this user was registered.
+            updated_at (datetime): The UTC time of the last change, the version of the row.
             posts (list of Post): The posts created by this user.
+            num_post (int): The number of posts, deferred (see below the `Post` model).
         """
     __tablename__ = 'users'
+    __table_args__ = (
+        Index('ix_users_registered_at', 'registered_at'),
+        Index('ix_users_updated_at', 'updated_at'),
+    )
     id              = Column(Integer, primary_key=True)
-    username        = Column(String(30), nullable=False)  # unique
+    username        = Column(String(30), unique=True, nullable=False)
     email           = Column(String(255), unique=True, nullable=False)
     first_name      = Column(String(35), nullable=False)
     last_name       = Column(String(35), nullable=False)
     location        = Column(String(45), nullable=False)
     registered_at   = Column(DateTime(timezone=True), server_default=func.now())  # pylint: disable=E1102
-    posts            = relationship('Post', back_populates='user', cascade='all, delete')
+    updated_at      = Column(PRECISE_DATETIME, nullable=False, default=utcnow, onupdate=utcnow)
+    # The posts are deleted by the ON DELETE CASCADE of posts.author_id, the ORM does
+    # not load them to delete them one by one.
+    posts            = relationship('Post', back_populates='user', cascade='all, delete',
+                                    passive_deletes=True)
 
     def __repr__(self):
         """Return a string representation of the user object."""
@@ -57,21 +79,44 @@ class Post(db.Model):
            title (str): The title of the post, at most 255 characters.
            description (str): The description of the post, in the form of text.
            created_at (datetime): The date and time when this post was created.
+           updated_at (datetime): The UTC time of the last change, the version of the row.
            author_id (int): The unique identifier of the user who created this post.
            user (User): The user who created this post.
+           author_username (str): The username of the author, '' for orphaned posts.
+           author_name (str): The first and last name of the author, '' for orphaned posts.
        """
     __tablename__ = 'posts'
+    __table_args__ = (
+        Index('ix_posts_author_id_created_at', 'author_id', 'created_at'),
+        Index('ix_posts_created_at', 'created_at'),
+        Index('ix_posts_title', 'title'),
+        Index('ix_posts_updated_at', 'updated_at'),
+        Index('ix_posts_fulltext', 'title', 'description', mysql_prefix='FULLTEXT')
+        .ddl_if(dialect='mysql'),
+    )
     id              = Column(Integer, primary_key=True)
     title           = Column(String(255), nullable=False)
     description     = Column(Text, nullable=False)
     created_at      = Column(DateTime(timezone=True), server_default=func.now())  # pylint: disable=E1102
-    author_id       = Column(Integer, ForeignKey('users.id'))
+    updated_at      = Column(PRECISE_DATETIME, nullable=False, default=utcnow, onupdate=utcnow)
+    author_id       = Column(Integer, ForeignKey('users.id', name='fk_posts_author_id_users',
+                                                 ondelete='CASCADE'))
     user            = relationship('User', back_populates='posts')
 
     def __repr__(self):
         """Return a string representation of the user object."""
         return f"<Post {self.id}: {self.title}>"
 
+    @property
+    def author_username(self) -> str:
+        """Return the username of the author, '' for orphaned posts."""
+        return self.user.username if self.user else ''
+
+    @property
+    def author_name(self) -> str:
+        """Return the first and last name of the author, '' for orphaned posts."""
+        return f'{self.user.first_name} {self.user.last_name}' if self.user else ''
+
     def to_dict(self):
         """Returns a dictionary representation of this post."""
         return {
@@ -83,12 +128,27 @@ class Post(db.Model):
         }
 
 
+# Number of posts of a user, computed by an index-backed correlated COUNT(*) subquery.
+# Deferred: it is only selected by queries which ask for it with `undefer(User.num_post)`.
+User.num_post = column_property(
+    select(func.count(Post.id)).where(Post.author_id == User.id)  # pylint: disable=E1102
+    .correlate_except(Post).scalar_subquery(),
+    deferred=True,
+)
+
+
 class PostSchema(ma.Schema):
-    """ Schema for serializing and deserializing `Post` objects. """
+    """
+    Schema for serializing and deserializing `Post` objects.
+    The author is dumped as plain strings, load it with the post (`joinedload(Post.user)`).
+    """
+    author_username = fields.String()
+    author_name = fields.String()
 
     # pylint: disable=missing-class-docstring,too-few-public-methods
     class Meta:
-        fields = ('id', 'title', 'description', 'created_at', 'author_id', 'user')
+        fields = ('id', 'title', 'description', 'created_at', 'author_id',
+                  'author_username', 'author_name')
 
 
 class UserSchema(ma.Schema):
@@ -101,8 +161,18 @@ class UserSchema(ma.Schema):
                   'registered_at', 'posts')
 
 
+class UserSummarySchema(ma.Schema):
+    """ Schema for serializing `User` objects with their post count instead of their posts. """
+
+    # pylint: disable=missing-class-docstring,too-few-public-methods
+    class Meta:
+        fields = ('id', 'username', 'email', 'first_name', 'last_name', 'location',
+                  'registered_at', 'num_post')
+
+
 user_schema = UserSchema()
 users_schema = UserSchema(many=True)
+users_summary_schema = UserSummarySchema(many=True)
 
 post_schema = PostSchema()
 posts_schema = PostSchema(many=True)
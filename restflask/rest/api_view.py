@@ -1,33 +1,117 @@
 """RESTfull service"""
-from flask import jsonify, request
-
-from ..service.services import get_user, get_users, get_post, get_posts
+from flask import Blueprint, current_app, jsonify, request
+
+from ..models.model import UserSchema, UserSummarySchema, PostSchema
+from ..service.pagination import parse_limit
+from ..service.pool import pool_stats
+from ..service.tracing import span
+from ..service.validate import parse_datetime, parse_fields
+from ..service.services import get_user, get_users_page, get_post, get_posts_page
+from ..service.services import iter_users, iter_posts, search_posts, search_authors
+from ..service.services import users_etag, posts_etag, user_version, post_version
 from ..service.services import create_user, create_post
 from ..service.services import update_user, update_post
 from ..service.services import delete_user, delete_post
+from ..service.bulk import bulk_create_users, bulk_update_users, bulk_delete_users
+from ..service.bulk import bulk_create_posts, bulk_update_posts, bulk_delete_posts
 
-from ..config import app
+from ..extensions import cache, db
 
+from .conditional import conditional_collection, conditional_response
+from .streaming import stream_response
 
-# ==================== Users ====================
-@app.route('/api/')
-@app.route('/api/users/')
-def api_users():
+api = Blueprint('api', __name__)
+
+STREAM_FORMATS = ('ndjson', 'stream')
+BULK_MAX_ITEMS = 10000
+BULK_ERROR = f'Error. Expected a JSON array of at most {BULK_MAX_ITEMS} items'
+AUTHORS_LIMIT = 20
+AUTHORS_MAX_LIMIT = 100
+
+
+def _post_to_json(post: dict) -> dict:
+    """Blank the author id of orphaned posts, as their author fields are."""
+    if post.get('author_id', '') is None:
+        post['author_id'] = ''
+    return post
+
+
+def _collection_args(schema_class) -> dict:
     """
-    Endpoint for retrieving a list of users in the application.
+    Parses the filter, sort and projection query parameters of a collection endpoint.
+
+    :raise ValueError: If a parameter is invalid.
+
     :return:
-        list of dict: A list of dictionaries, where each dictionary represents a user.
-                      The keys in each dictionary correspond to the fields of a User object.
+        dict: Keyword arguments for the `get_*_page` / `iter_*` service functions.
+    """
+    args = {
+        'sort': request.args.get('sort'),
+        'fields': parse_fields(request.args.get('fields'), schema_class.Meta.fields),
+        'created_from': parse_datetime(request.args.get('created_from')),
+        'created_to': parse_datetime(request.args.get('created_to')),
+    }
+    if schema_class is PostSchema and request.args.get('author_id'):
+        try:
+            args['author_id'] = int(request.args['author_id'])
+        except ValueError:
+            raise ValueError('Invalid author_id') from None
+    if schema_class is UserSummarySchema:
+        args['summary'] = True
+    return args
+
+
+# ==================== Users ====================
+@api.route('/api/')
+@api.route('/api/users/')
+def api_users():
     """
-    app.logger.debug("API. GET. list of users")
-    users_list = get_users()
-    for user in users_list:
-        for post in user['posts']:
-            post['user'] = post['user'].username
-    return jsonify(users_list)
+    Endpoint for retrieving a page of users in the application.
+
+    Query parameters:
+        limit (int): The page size, 50 by default and 1000 at most.
+        cursor (str): The `next` value of the previous page.
+        format (str): 'ndjson' or 'stream' to stream every user as newline delimited JSON
+                      or as a JSON array instead of returning a page.
+        created_from, created_to (str): ISO dates limiting the registration date.
+        sort (str): 'registered_at' (default), 'id' or 'username', '-' prefix for descending.
+        fields (str): A comma separated subset of the user fields to return.
+        summary (int): 1 to return the number of posts of each user ('num_post')
+                       instead of the posts.
 
+    Answers 304 if the If-None-Match header holds the ETag of the current data.
 
-@app.route('/api/create_user/', methods=['POST'])
+    :return:
+        JSON object: 'items' - a list of dictionaries, where each dictionary represents a user,
+                     'next' - the cursor of the next page, or null on the last page.
+    """
+    current_app.logger.debug("API. GET. list of users")
+    fmt = request.args.get('format')
+    try:
+        summary = request.args.get('summary') in ('1', 'true')
+        args = _collection_args(UserSummarySchema if summary else UserSchema)
+        limit = parse_limit(request.args.get('limit'))
+    except ValueError as exc:
+        return jsonify(message=f'Error. {exc}'), 400
+
+    def probe():
+        return users_etag(args['created_from'], args['created_to'])
+
+    def build():
+        try:
+            if fmt in STREAM_FORMATS:
+                return stream_response(iter_users(**args), fmt), probe()
+            users_list, next_cursor, etag = get_users_page(limit, request.args.get('cursor'),
+                                                           versioned=True, **args)
+        except ValueError as exc:
+            return (jsonify(message=f'Error. {exc}'), 400), None
+        with span('json'):
+            return jsonify(items=users_list, next=next_cursor), etag
+
+    return conditional_collection(build, probe)
+
+
+@api.route('/api/create_user/', methods=['POST'])
 def api_create_user():
     """
     Endpoint for creating a new user in the application.
@@ -45,13 +129,13 @@ def api_create_user():
     """
     data = request.json
     feedback = create_user(data)
-    app.logger.debug(f'API. POST. Email = {data.get("email")}. {feedback}')
+    current_app.logger.debug('API. POST. Email = %s. %s', data.get('email'), feedback)
     if feedback == 'Success':
         return jsonify(message='User ' + data['username'] + ' has been created'), 201
     return jsonify(message=feedback), 409
 
 
-@app.route('/api/get_user/', methods=['GET'])
+@api.route('/api/get_user/', methods=['GET'])
 def api_get_user():
     """
     Endpoint for retrieving a single user by ID.
@@ -62,22 +146,28 @@ def api_get_user():
 
     Raises:
         HTTPException: If the user ID provided is invalid.
+
+    Answers 304 if the If-None-Match header matches the current user.
+
     :return:
         JSON object: A dictionary representing the user, or a 'message' key
         with a 'Not Found' value if the user
                      does not exist.
     """
     user_id = request.args.get('id')
-    feedback = get_user(user_id)
-    app.logger.debug(f"API. GET. GET USER. id = {user_id}. {feedback}")
-    if feedback:
-        for post in feedback['posts']:
-            post['user'] = post['user'].username
-        return jsonify(feedback), 200
-    return jsonify(message="Not Found"), 204
 
+    def build():
+        feedback = get_user(user_id)
+        current_app.logger.debug('API. GET. GET USER. id = %s. %s', user_id, feedback)
+        if feedback:
+            with span('json'):
+                return jsonify(feedback), 200
+        return jsonify(message="Not Found"), 204
+
+    return conditional_response(build, *(user_version(user_id) or ()))
 
-@app.route('/api/update_user/', methods=['PUT'])
+
+@api.route('/api/update_user/', methods=['PUT'])
 def api_update_user():
     """
     Endpoint for updating a single user by ID.
@@ -98,13 +188,13 @@ def api_update_user():
     """
     data = request.json
     feedback = update_user(data)
-    app.logger.debug(f"API. UPDATE USER. {feedback}")
+    current_app.logger.debug('API. UPDATE USER. %s', feedback)
     if feedback == "Success":
         return jsonify(message='User ' + data['username'] + ' has been updated'), 201
     return jsonify(message=feedback), 409  # check status code
 
 
-@app.route('/api/delete_user/', methods=['DELETE'])
+@api.route('/api/delete_user/', methods=['DELETE'])
 def api_delete_user():
     """
     Endpoint for deleting a single user by ID.
@@ -120,45 +210,145 @@ def api_delete_user():
         JSON object: A 'message' key with a 'Success' value if the deletion was successful,
         or a 'message' key with
                      the error message if the deletion was unsuccessful.
+        Users with more than USER_PURGE_THRESHOLD posts are deleted in the background,
+        which is answered with 202.
     """
     user_id = request.args.get('id')
     feedback = delete_user(user_id)
-    app.logger.debug(f"API. DELETE USER. id = {request.args.get('id')}. {feedback}")
+    current_app.logger.debug('API. DELETE USER. id = %s. %s', request.args.get('id'), feedback)
     if feedback == 'Success':
         return jsonify(message='User id: ' + user_id + ' has been deleted'), 200
+    if feedback == 'Scheduled':
+        return jsonify(message='User id: ' + user_id + ' is being deleted'), 202
     return jsonify(message=feedback), 409
 
 
+@api.route('/api/users/bulk/', methods=['POST', 'PUT', 'DELETE'])
+def api_users_bulk():
+    """
+    Endpoint for creating (POST), updating (PUT) or deleting (DELETE) many users
+    in one request and one transaction.
+
+    Request body:
+        JSON array: For POST and PUT, dictionaries with the same keys as for
+        /api/create_user/ and /api/update_user/. For DELETE, user ids.
+
+    :return:
+        JSON object: 'results' - a list with one dictionary per input record,
+        with the keys 'index', 'status' and 'message'.
+    """
+    data = request.json
+    if not isinstance(data, list) or len(data) > BULK_MAX_ITEMS:
+        return jsonify(message=BULK_ERROR), 400
+    handler = {'POST': bulk_create_users, 'PUT': bulk_update_users,
+               'DELETE': bulk_delete_users}[request.method]
+    results = handler(data)
+    current_app.logger.debug('API. BULK %s USERS. %d records', request.method, len(results))
+    return jsonify(results=results), 200
+
+
+@api.route('/api/authors/')
+def api_authors():
+    """
+    Typeahead endpoint of the author field of the post forms.
+
+    Query parameters:
+        q (str): The beginning of a first name, last name or username, or a user id.
+        limit (int): The number of suggestions, 20 by default and 100 at most.
+
+    :return:
+        JSON object: 'items' - the matching users, with the keys 'id', 'first_name'
+        and 'last_name'.
+    """
+    prefix = request.args.get('q', '').strip()
+    current_app.logger.debug('API. AUTHORS. q = %s', prefix)
+    if not prefix:
+        return jsonify(message='Error. Missing search query'), 400
+    try:
+        limit = parse_limit(request.args.get('limit'), AUTHORS_LIMIT, AUTHORS_MAX_LIMIT)
+    except ValueError as exc:
+        return jsonify(message=f'Error. {exc}'), 400
+    return jsonify(items=search_authors(prefix, limit)), 200
+
+
 # ==================== Posts ====================
-@app.route('/api/posts/')
+@api.route('/api/posts/')
 def api_posts():
     """
-    Endpoint for retrieving a list of all posts.
+    Endpoint for retrieving a page of posts.
 
-    Raises:
-        HTTPException: If there is an error retrieving the list of posts.
+    Query parameters:
+        limit (int): The page size, 50 by default and 1000 at most.
+        cursor (str): The `next` value of the previous page.
+        format (str): 'ndjson' or 'stream' to stream every post as newline delimited JSON
+                      or as a JSON array instead of returning a page.
+        author_id (int): Only posts of this user.
+        created_from, created_to (str): ISO dates limiting the creation date.
+        sort (str): 'created_at' (default), 'id' or 'title', '-' prefix for descending.
+        fields (str): A comma separated subset of the post fields to return.
+
+    Answers 304 if the If-None-Match header holds the ETag of the current data.
 
     :return:
-        JSON object: A list of dictionaries, where each dictionary represents
-        a single post
+        JSON object: 'items' - a list of dictionaries, where each dictionary represents
+        a single post, 'next' - the cursor of the next page, or null on the last page.
     """
-    app.logger.debug("API. LISTS OF POSTS.")
-    posts = get_posts()
-    print(posts)
-    for post in posts:
-        print(post)
-        if post['user'] and post['author_id']:
-            post['user'] = post['user'].username
-            print(post['user'])
-            print('here1')
-        else:
-            post['user'] = ''
-            post['author_id'] = ''
-            print('here2')
-    return jsonify(posts), 200
+    current_app.logger.debug("API. LISTS OF POSTS.")
+    fmt = request.args.get('format')
+    try:
+        args = _collection_args(PostSchema)
+        limit = parse_limit(request.args.get('limit'))
+    except ValueError as exc:
+        return jsonify(message=f'Error. {exc}'), 400
+
+    def probe():
+        return posts_etag(args.get('author_id'), args['created_from'], args['created_to'])
+
+    def build():
+        try:
+            if fmt in STREAM_FORMATS:
+                return stream_response(map(_post_to_json, iter_posts(**args)), fmt), probe()
+            posts, next_cursor, etag = get_posts_page(limit, request.args.get('cursor'),
+                                                      versioned=True, **args)
+        except ValueError as exc:
+            return (jsonify(message=f'Error. {exc}'), 400), None
+        for post in posts:
+            _post_to_json(post)
+        with span('json'):
+            return (jsonify(items=posts, next=next_cursor), 200), etag
+
+    return conditional_collection(build, probe)
+
+
+@api.route('/api/posts/search/')
+def api_search_posts():
+    """
+    Endpoint for full-text search over the titles and descriptions of the posts.
 
+    Query parameters:
+        q (str): The words to search for.
+        limit (int): The page size, 50 by default and 1000 at most.
+        page (int): The 1-based page number.
 
-@app.route('/api/create_post/', methods=['POST'])
+    :return:
+        JSON object: 'items' - the matching posts, best match first, each with its
+        relevance 'score', 'next' - the next page number, or null on the last page.
+    """
+    query = request.args.get('q', '').strip()
+    current_app.logger.debug('API. SEARCH POSTS. q = %s', query)
+    if not query:
+        return jsonify(message='Error. Missing search query'), 400
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        page = max(1, int(request.args.get('page') or 1))
+    except ValueError as exc:
+        return jsonify(message=f'Error. {exc}'), 400
+    posts, next_page = search_posts(query, limit, page)
+    with span('json'):
+        return jsonify(items=[_post_to_json(post) for post in posts], next=next_page), 200
+
+
+@api.route('/api/create_post/', methods=['POST'])
 def api_create_post():
     """
      Creates a new post by receiving the post data in JSON format in the request body.
@@ -169,37 +359,38 @@ def api_create_post():
     """
     data = request.json
     feedback = create_post(data)
-    app.logger.debug(f"API. CREATE POST. id = {request.json.get('id')}. {feedback}")
+    current_app.logger.debug('API. CREATE POST. id = %s. %s', data.get('id'), feedback)
     if feedback == 'Success':
         return jsonify(message='Post ' + data['title'] + ' has been created'), 201
     return jsonify(message=feedback), 409
 
 
-@app.route('/api/get_post/', methods=['GET'])
+@api.route('/api/get_post/', methods=['GET'])
 def api_get_post():
     """
     Endpoint for retrieving a single post by ID.
 
+    Answers 304 if the If-None-Match or If-Modified-Since header matches the current post.
+
     :return:
         JSON object: A dictionary representing the post, or a 'message' key with a
         'Not Found' value if the user
                      does not exist.
     """
     post_id = request.args.get('id')
-    feedback = get_post(post_id)
-    app.logger.debug(f"API. GET POST. id = {request.args.get('id')}. {feedback}")
-    if feedback:
-        if feedback['user'] and feedback['author_id']:  # pylint: disable=R1705
-            feedback['user'] = feedback['user'].username
-            return jsonify(feedback), 200
-        else:
-            feedback['user'] = ''
-            feedback['author_id'] = ''
-            return jsonify(feedback), 200
-    return jsonify(message="Not Found"), 204
-
-
-@app.route('/api/update_post/', methods=['PUT'])
+
+    def build():
+        feedback = get_post(post_id)
+        current_app.logger.debug('API. GET POST. id = %s. %s', post_id, feedback)
+        if feedback:
+            with span('json'):
+                return jsonify(_post_to_json(feedback)), 200
+        return jsonify(message="Not Found"), 204
+
+    return conditional_response(build, *(post_version(post_id) or ()))
+
+
+@api.route('/api/update_post/', methods=['PUT'])
 def api_update_post():
     """
     Updates an existing post in the database.
@@ -221,12 +412,12 @@ def api_update_post():
     """
     data = request.json
     feedback = update_post(data)
-    app.logger.debug(f"API. UPDATE POST. {feedback}")
+    current_app.logger.debug('API. UPDATE POST. %s', feedback)
     if feedback == "Success":
         return jsonify(message='Post ' + data['title'] + ' has been updated'), 201
     return jsonify(message=feedback), 409  # check status code
 
-@app.route('/api/delete_post/', methods=['DELETE'])
+@api.route('/api/delete_post/', methods=['DELETE'])
 def api_delete_post():
     """
     Deletes a post from the database.
@@ -237,7 +428,62 @@ def api_delete_post():
     """
     post_id = request.args.get('id')
     feedback = delete_post(post_id)
-    app.logger.debug(f"API. DELETE POST. {feedback}")
+    current_app.logger.debug('API. DELETE POST. %s', feedback)
     if feedback == 'Success':
         return jsonify(message='Post id: ' + post_id + ' has been deleted'), 200
     return jsonify(message=feedback), 409
+
+
+@api.route('/api/posts/bulk/', methods=['POST', 'PUT', 'DELETE'])
+def api_posts_bulk():
+    """
+    Endpoint for creating (POST), updating (PUT) or deleting (DELETE) many posts
+    in one request and one transaction.
+
+    Request body:
+        JSON array: For POST and PUT, dictionaries with the same keys as for
+        /api/create_post/ and /api/update_post/. For DELETE, post ids.
+
+    :return:
+        JSON object: 'results' - a list with one dictionary per input record,
+        with the keys 'index', 'status' and 'message'.
+    """
+    data = request.json
+    if not isinstance(data, list) or len(data) > BULK_MAX_ITEMS:
+        return jsonify(message=BULK_ERROR), 400
+    handler = {'POST': bulk_create_posts, 'PUT': bulk_update_posts,
+               'DELETE': bulk_delete_posts}[request.method]
+    results = handler(data)
+    current_app.logger.debug('API. BULK %s POSTS. %d records', request.method, len(results))
+    return jsonify(results=results), 200
+
+
+# ==================== Internal ====================
+@api.route('/api/internal/cache/')
+def api_cache_stats():
+    """
+    Endpoint exposing the hit/miss counters of the record cache of this worker.
+
+    :return:
+        JSON object: The cache statistics.
+    """
+    return jsonify(cache.stats()), 200
+
+
+@api.route('/api/internal/pool/')
+def api_pool_stats():
+    """
+    Endpoint exposing the database connection pool of this worker: its size, the
+    connections checked out and in overflow, and the checkout wait times.
+    With read replicas, the 'replicas' key holds the pool and the last health check
+    of each of them.
+
+    :return:
+        JSON object: The pool statistics.
+    """
+    stats = pool_stats(db.engine)
+    replicas = current_app.extensions.get('replicas')
+    if replicas is not None:
+        stats['replicas'] = {key: {'healthy': healthy, **pool_stats(replicas.engines[key])}
+                             for key, healthy in replicas.stats().items()}
+    return jsonify(stats), 200
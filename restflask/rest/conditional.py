@@ -0,0 +1,82 @@
+"""HTTP conditional requests
+
+The read endpoints compute the version of what they would return with a cheap
+probe query (see the `*_version` / `*_etag` service functions) and answer
+`304 Not Modified` when it matches the `If-None-Match` (or, failing that, the
+`If-Modified-Since`) header of the request, without loading or serializing
+any row. Full responses carry the ETag, the Last-Modified date if the resource
+has one, and the HTTP_CACHE_CONTROL header, which makes clients revalidate.
+
+The collections probe only requests carrying `If-None-Match`: the page query of
+the others selects the version along with the rows, so that a listing still
+costs a single query.
+"""
+from datetime import datetime, timezone
+
+from flask import current_app, make_response, request
+
+
+def _not_modified(etag: str, last_modified: datetime = None) -> bool:
+    """Return True if the validators of the request match the current version."""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        # HTTP dates have a resolution of one second.
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def conditional_response(build, etag: str = None, last_modified: datetime = None):
+    """
+    Answers a GET request with 304 if the client has the current version, else with `build()`.
+
+    :param build: A callable returning the full response, called only if needed.
+    :param etag: The version of the resource, or None if it does not exist.
+    :param last_modified: The UTC time of its last change, or None if it is unknown.
+
+    :return:
+        Response: The 304 or the built response, with the validators if it succeeded.
+    """
+    if etag is None:
+        return make_response(build())
+    if last_modified is not None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    if _not_modified(etag, last_modified):
+        response = current_app.response_class(status=304)
+    else:
+        response = make_response(build())
+        if response.status_code != 200:
+            return response
+    return _validated(response, etag, last_modified)
+
+
+def conditional_collection(build, probe):
+    """
+    Answers a GET request for a collection, which has an ETag and no Last-Modified date.
+
+    :param build: A callable returning (full response, its ETag), called only if needed.
+    :param probe: A callable returning the current ETag, called only if the request
+        has an `If-None-Match` header.
+
+    :return:
+        Response: The 304 or the built response, with the validators if it succeeded.
+    """
+    etag = None
+    if request.if_none_match:
+        etag = probe()
+        if request.if_none_match.contains_weak(etag):
+            return _validated(current_app.response_class(status=304), etag)
+    body, version = build()
+    response = make_response(body)
+    if response.status_code != 200:
+        return response
+    return _validated(response, version or etag)
+
+
+def _validated(response, etag: str, last_modified: datetime = None):
+    """Set the validators and the Cache-Control header of a 200 or 304 response."""
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = current_app.config['HTTP_CACHE_CONTROL']
+    return response
@@ -0,0 +1,56 @@
+"""Streaming JSON responses"""
+from flask import Response, current_app, stream_with_context
+
+# Encoded rows are buffered up to this size before being handed to the WSGI server,
+# so a stream of small rows is not sent as thousands of tiny writes.
+CHUNK_SIZE = 64 * 1024
+
+
+def _buffered(parts):
+    """Join small string parts into chunks of roughly CHUNK_SIZE characters."""
+    buffer, size = [], 0
+    for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if size >= CHUNK_SIZE:
+            yield ''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _json_array(items, dumps):
+    """Encode an iterable of dicts as the parts of a single JSON array."""
+    yield '['
+    separator = ''
+    for item in items:
+        yield separator + dumps(item)
+        separator = ','
+    yield ']'
+
+
+def _ndjson(items, dumps):
+    """Encode an iterable of dicts as newline delimited JSON."""
+    for item in items:
+        yield dumps(item) + '\n'
+
+
+def stream_response(items, fmt: str) -> Response:
+    """
+    Builds a streaming response which encodes `items` one by one while they are produced.
+
+    The request context is kept alive for the whole stream, so `items` may be a generator
+    reading from the database session.
+
+    :param items: An iterable of JSON serializable dicts.
+    :param fmt: 'ndjson' for newline delimited JSON, anything else for a JSON array.
+
+    :return:
+        Response: A chunked response with `application/x-ndjson` or `application/json` body.
+    """
+    dumps = current_app.json.dumps
+    if fmt == 'ndjson':
+        parts, mimetype = _ndjson(items, dumps), 'application/x-ndjson'
+    else:
+        parts, mimetype = _json_array(items, dumps), 'application/json'
+    return Response(stream_with_context(_buffered(parts)), mimetype=mimetype)
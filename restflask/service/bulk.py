@@ -0,0 +1,388 @@
+"""Batch CRUD functions
+
+Every function takes a list of records, checks them against the database with
+set-based queries and applies all valid records with executemany statements
+inside a single transaction. Each returns one result dict per input record:
+{'index': <position in the input>,
+ 'status': 'created' | 'updated' | 'deleted' | 'scheduled' | 'error',
+ 'message': <'Success', 'Scheduled' or the error message>}.
+"""
+from flask import current_app
+from sqlalchemy import delete, func, insert, or_, update
+from sqlalchemy.exc import IntegrityError
+
+from ..extensions import db, cache
+
+from ..models.model import User, Post
+
+from .services import USER_FIELDS
+from .services import user_cache_keys, post_cache_keys
+from .services import authored_post_keys, invalidate_authors, invalidate_authored_posts
+from .services import purge_user
+from .purge import purge_queue
+from .search import post_index
+
+POST_FIELDS = ('title', 'description')
+INVALID_TYPES = 'Error. Fields must be strings'
+INVALID_AUTHOR = 'Error. Invalid author_id'
+NO_SUCH_USER = 'Error. No such user record in the db'
+
+# Upper bound for the number of values in one IN (...) list.
+IN_CHUNK_SIZE = 1000
+
+
+def _chunks(values: list, size: int = IN_CHUNK_SIZE):
+    """Split `values` into lists of at most `size` items."""
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _result(index: int, status: str, message: str = 'Success') -> dict:
+    """Build the result of one record."""
+    return {'index': index, 'status': status, 'message': message}
+
+
+def _to_int(value):
+    """Return `value` as an integer, or None if it is neither an int nor a string of digits."""
+    # int() would also take floats and booleans: 1.7 and true would both be the id 1.
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.isascii() and value.isdigit():
+        return int(value)
+    return None
+
+
+def _records(items: list, fields: tuple) -> tuple:
+    """
+    Checks the types of the input records before any of their values is looked up.
+
+    :param items: The input list.
+    :param fields: The fields which, when present and not null, must be strings.
+
+    :return:
+        tuple: (records, invalid), the items with {} in place of the non-dicts and of the
+        records with a field of another type, and the indexes of the latter.
+    """
+    records, invalid = [], set()
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            item = {}
+        elif any(item.get(field) is not None and not isinstance(item[field], str)
+                 for field in fields):
+            item = {}
+            invalid.add(index)
+        records.append(item)
+    return records, invalid
+
+
+def _parse_id(item):
+    """Return the integer id of a record given either as an id or as a dict with 'id'."""
+    return _to_int(item.get('id') if isinstance(item, dict) else item)
+
+
+# ==================== Users ====================
+def _unique_value_owners(records: list) -> dict:
+    """
+    Looks up which users already own the emails and usernames present in `records`.
+
+    :return:
+        dict: {('email' | 'username', value): user_id}
+    """
+    owners = {}
+    for field, column in (('email', User.email), ('username', User.username)):
+        values = list({item.get(field) for item in records if item.get(field)})
+        for chunk in _chunks(values):
+            owners.update(((field, value), user_id) for user_id, value in
+                          db.session.query(User.id, column).filter(column.in_(chunk)))
+    return owners
+
+
+def bulk_create_users(items: list) -> list:
+    """
+    Creates users from a list of dictionaries with the same keys as `create_user`.
+
+    Emails and usernames are checked against the database with one query per
+    IN_CHUNK_SIZE records, and against the other records of the batch. If a concurrent
+    request inserts a conflicting user in the meantime, the unique constraints reject
+    the whole batch and every record is reported as an error.
+
+    :param items: A list of dictionaries containing user information.
+
+    :return:
+        list of dict: One result per input record.
+    """
+    records, invalid = _records(items, USER_FIELDS)
+    taken_emails, taken_usernames = set(), set()
+    for chunk in _chunks(records):
+        query = db.session.query(User.email, User.username).filter(or_(
+            User.email.in_({item.get('email') for item in chunk if item.get('email')}),
+            User.username.in_({item.get('username') for item in chunk if item.get('username')})))
+        for email, username in query:
+            taken_emails.add(email)
+            taken_usernames.add(username)
+
+    results, rows = [], []
+    for index, item in enumerate(records):
+        row = {field: item.get(field) for field in USER_FIELDS}
+        if index in invalid:
+            results.append(_result(index, 'error', INVALID_TYPES))
+        elif not all(row.values()):
+            results.append(_result(index, 'error', 'Error. Missing required fields'))
+        elif row['email'] in taken_emails or row['username'] in taken_usernames:
+            results.append(_result(index, 'error', 'Error. Username or email is already exist'))
+        else:
+            taken_emails.add(row['email'])
+            taken_usernames.add(row['username'])
+            rows.append(row)
+            results.append(_result(index, 'created'))
+
+    if rows:
+        try:
+            db.session.execute(insert(User), rows)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return [_result(index, 'error', 'Error. Username or email is already exist')
+                    if result['status'] == 'created' else result
+                    for index, result in enumerate(results)]
+    return results
+
+
+def bulk_update_users(items: list) -> list:
+    """
+    Updates users from a list of dictionaries with the same keys as `update_user`.
+    Every record must contain the 'id' of the user; empty fields keep their value.
+
+    :param items: A list of dictionaries containing the user information to update.
+
+    :return:
+        list of dict: One result per input record.
+    """
+    records, invalid = _records(items, USER_FIELDS)
+    ids = list({_parse_id(item) for item in records} - {None})
+    old_emails = {}
+    for id_chunk in _chunks(ids):
+        old_emails.update(db.session.query(User.id, User.email).filter(User.id.in_(id_chunk)))
+    owners = _unique_value_owners(records)
+
+    results, rows = [], []
+    for index, item in enumerate(records):
+        user_id = _parse_id(item)
+        row = {field: item[field] for field in USER_FIELDS if item.get(field)}
+        conflict = any(owners.get((field, row[field]), user_id) != user_id
+                       for field in ('email', 'username') if field in row)
+        if user_id not in old_emails:
+            # The invalid records are empty, hence without id.
+            results.append(_result(index, 'error', INVALID_TYPES if index in invalid
+                                   else NO_SUCH_USER))
+        elif conflict:
+            results.append(_result(index, 'error', 'Error. Username or email is already exist'))
+        else:
+            for field in ('email', 'username'):
+                if field in row:
+                    owners[(field, row[field])] = user_id
+            if row:
+                rows.append({'id': user_id, **row})
+            results.append(_result(index, 'updated'))
+
+    if rows:
+        try:
+            db.session.execute(update(User), rows)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return [_result(index, 'error', 'Error. Username or email is already exist')
+                    if result['status'] == 'updated' else result
+                    for index, result in enumerate(results)]
+        for row in rows:
+            cache.delete_many(*user_cache_keys(row['id'], old_emails[row['id']]),
+                              user_cache_keys(email=row.get('email'))[1])
+        for id_chunk in _chunks([row['id'] for row in rows]):
+            invalidate_authored_posts(id_chunk)
+    return results
+
+
+def _prolific_authors(user_ids: list) -> set:
+    """Return the ids among `user_ids` with more than USER_PURGE_THRESHOLD posts."""
+    # pylint: disable=not-callable
+    threshold = current_app.config['USER_PURGE_THRESHOLD']
+    if not threshold:
+        return set()
+    prolific = set()
+    for id_chunk in _chunks(user_ids):
+        prolific.update(user_id for user_id, in db.session.query(Post.author_id)
+                        .filter(Post.author_id.in_(id_chunk)).group_by(Post.author_id)
+                        .having(func.count(Post.id) > threshold))
+    return prolific
+
+
+def bulk_delete_users(items: list) -> list:
+    """
+    Deletes users together with their posts. Like `delete_user`, the users with more than
+    USER_PURGE_THRESHOLD posts are submitted to the background purge and reported as
+    'scheduled', so that the request does not cascade their posts in one transaction.
+
+    :param items: A list of user ids, or of dictionaries with an 'id' key.
+
+    :return:
+        list of dict: One result per input record.
+    """
+    ids = [_parse_id(item) for item in items]
+    emails = {}
+    for id_chunk in _chunks(list(set(ids) - {None})):
+        emails.update(db.session.query(User.id, User.email).filter(User.id.in_(id_chunk)))
+
+    prolific = _prolific_authors(list(emails))
+    results, deleted, scheduled = [], set(), set()
+    for index, user_id in enumerate(ids):
+        if user_id not in emails or user_id in deleted or user_id in scheduled:
+            results.append(_result(index, 'error', 'No such user record in the db'))
+        elif user_id in prolific:
+            scheduled.add(user_id)
+            results.append(_result(index, 'scheduled', 'Scheduled'))
+        else:
+            deleted.add(user_id)
+            results.append(_result(index, 'deleted'))
+
+    if deleted:
+        post_keys = []
+        for id_chunk in _chunks(list(deleted)):
+            post_keys += authored_post_keys(id_chunk)
+            # The posts are deleted by the ON DELETE CASCADE of posts.author_id.
+            db.session.execute(delete(User).where(User.id.in_(id_chunk)))
+        db.session.commit()
+        cache.delete_many(*post_keys)
+        for user_id in deleted:
+            cache.delete_many(*user_cache_keys(user_id, emails[user_id]))
+        post_index.invalidate()
+    for user_id in scheduled:
+        purge_queue.submit(('user', user_id), purge_user, user_id,
+                           current_app.config['USER_PURGE_CHUNK_SIZE'])
+    return results
+
+
+# ==================== Posts ====================
+def bulk_create_posts(items: list) -> list:
+    """
+    Creates posts from a list of dictionaries with the same keys as `create_post`.
+
+    :param items: A list of dictionaries with 'title', 'description' and optionally 'author_id'.
+
+    :return:
+        list of dict: One result per input record.
+    """
+    records, invalid = _records(items, POST_FIELDS)
+    author_ids = list({_to_int(item.get('author_id')) for item in records} - {None})
+    known_authors = set()
+    for id_chunk in _chunks(author_ids):
+        known_authors.update(user_id for user_id, in
+                             db.session.query(User.id).filter(User.id.in_(id_chunk)))
+
+    results, rows = [], []
+    for index, item in enumerate(records):
+        row = {field: item.get(field) for field in POST_FIELDS}
+        author_id = _to_int(item.get('author_id'))
+        has_author = item.get('author_id') not in (None, '')
+        if index in invalid:
+            results.append(_result(index, 'error', INVALID_TYPES))
+        elif not all(row.values()):
+            results.append(_result(index, 'error', 'Error. Missing required fields'))
+        elif has_author and author_id is None:
+            results.append(_result(index, 'error', INVALID_AUTHOR))
+        elif has_author and author_id not in known_authors:
+            results.append(_result(index, 'error', NO_SUCH_USER))
+        else:
+            rows.append({**row, 'author_id': author_id})
+            results.append(_result(index, 'created'))
+
+    if rows:
+        try:
+            db.session.execute(insert(Post), rows)
+            db.session.commit()
+        except IntegrityError:
+            # An author was deleted since it was looked up.
+            db.session.rollback()
+            return [_result(index, 'error', NO_SUCH_USER)
+                    if result['status'] == 'created' else result
+                    for index, result in enumerate(results)]
+        invalidate_authors({row['author_id'] for row in rows})
+        post_index.invalidate()
+    return results
+
+
+def bulk_update_posts(items: list) -> list:
+    """
+    Updates posts from a list of dictionaries with the same keys as `update_post`.
+    Every record must contain the 'id' of the post; empty fields keep their value.
+
+    :param items: A list of dictionaries with 'id' and optionally 'title' and 'description'.
+
+    :return:
+        list of dict: One result per input record.
+    """
+    records, invalid = _records(items, POST_FIELDS)
+    ids = list({_parse_id(item) for item in records} - {None})
+    existing = {}
+    for id_chunk in _chunks(ids):
+        existing.update((post_id, (title, author_id)) for post_id, title, author_id in
+                        db.session.query(Post.id, Post.title, Post.author_id)
+                        .filter(Post.id.in_(id_chunk)))
+
+    results, rows = [], []
+    for index, item in enumerate(records):
+        post_id = _parse_id(item)
+        row = {field: item[field] for field in POST_FIELDS if item.get(field)}
+        if index in invalid:
+            results.append(_result(index, 'error', INVALID_TYPES))
+            continue
+        if post_id not in existing:
+            results.append(_result(index, 'error', 'Error. No such post record in the db'))
+            continue
+        if row:
+            rows.append({'id': post_id, **row})
+        results.append(_result(index, 'updated'))
+
+    if rows:
+        db.session.execute(update(Post), rows)
+        db.session.commit()
+        for row in rows:
+            cache.delete_many(*post_cache_keys(row['id'], existing[row['id']][0]),
+                              post_cache_keys(title=row.get('title'))[1])
+        invalidate_authors({existing[row['id']][1] for row in rows})
+        post_index.invalidate()
+    return results
+
+
+def bulk_delete_posts(items: list) -> list:
+    """
+    Deletes posts.
+
+    :param items: A list of post ids, or of dictionaries with an 'id' key.
+
+    :return:
+        list of dict: One result per input record.
+    """
+    ids = [_parse_id(item) for item in items]
+    existing = {}
+    for id_chunk in _chunks(list(set(ids) - {None})):
+        existing.update((post_id, (title, author_id)) for post_id, title, author_id in
+                        db.session.query(Post.id, Post.title, Post.author_id)
+                        .filter(Post.id.in_(id_chunk)))
+
+    results, deleted = [], set()
+    for index, post_id in enumerate(ids):
+        if post_id in existing and post_id not in deleted:
+            deleted.add(post_id)
+            results.append(_result(index, 'deleted'))
+        else:
+            results.append(_result(index, 'error', 'Error. No such post record in the db'))
+
+    if deleted:
+        for id_chunk in _chunks(list(deleted)):
+            db.session.execute(delete(Post).where(Post.id.in_(id_chunk)))
+        db.session.commit()
+        for post_id in deleted:
+            cache.delete_many(*post_cache_keys(post_id, existing[post_id][0]))
+        invalidate_authors({existing[post_id][1] for post_id in deleted})
+        post_index.invalidate()
+    return results
@@ -0,0 +1,204 @@
+"""Read-through cache for serialized records"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryBackend:
+    """
+    In-process LRU cache with a per-entry time to live.
+
+    Values are stored pickled, so callers can freely mutate what `get` returns.
+
+    Attributes:
+        ttl (int): Seconds an entry stays valid.
+        max_entries (int): The number of entries kept before the least recently used is evicted.
+        evictions (int): The number of entries evicted because the cache was full.
+    """
+
+    def __init__(self, ttl: int, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """Return the pickled value stored under `key`, or None if missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set_many(self, mapping: dict):
+        """Store pickled values, evicting the least recently used entries when full."""
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in mapping.items():
+                self._data[key] = (expires_at, value)
+                self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete_many(self, keys):
+        """Remove `keys` from the cache."""
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            self._data.clear()
+
+    def info(self) -> dict:
+        """Return backend specific statistics."""
+        return {'size': len(self._data), 'max_entries': self.max_entries,
+                'evictions': self.evictions}
+
+
+class RedisBackend:
+    """
+    Cache stored in a Redis compatible server, shared by every worker process.
+
+    Entries expire after `ttl` seconds. LRU eviction is done by the server, which should be
+    started with `maxmemory-policy allkeys-lru`.
+
+    Attributes:
+        ttl (int): Seconds an entry stays valid.
+        prefix (str): Prepended to every key, so several apps can share one server.
+    """
+
+    def __init__(self, url: str, ttl: int, prefix: str = 'restflask:'):
+        import redis  # pylint: disable=import-outside-toplevel,import-error
+        self.ttl = ttl
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str):
+        """Return the pickled value stored under `key`, or None."""
+        return self._client.get(self.prefix + key)
+
+    def set_many(self, mapping: dict):
+        """Store pickled values with the configured time to live."""
+        with self._client.pipeline() as pipe:
+            for key, value in mapping.items():
+                pipe.set(self.prefix + key, value, ex=self.ttl)
+            pipe.execute()
+
+    def delete_many(self, keys):
+        """Remove `keys` from the cache."""
+        keys = [self.prefix + key for key in keys]
+        if keys:
+            self._client.delete(*keys)
+
+    def clear(self):
+        """Remove every entry with this cache's prefix."""
+        for key in self._client.scan_iter(match=self.prefix + '*'):
+            self._client.delete(key)
+
+    def info(self) -> dict:
+        """Return backend specific statistics."""
+        return {'ttl': self.ttl}
+
+
+class NullBackend:
+    """Backend that stores nothing, used when caching is disabled."""
+
+    def get(self, key):  # pylint: disable=unused-argument
+        """Always miss."""
+        return None
+
+    def set_many(self, mapping):
+        """Do nothing."""
+
+    def delete_many(self, keys):
+        """Do nothing."""
+
+    def clear(self):
+        """Do nothing."""
+
+    def info(self) -> dict:
+        """Return backend specific statistics."""
+        return {}
+
+
+class Cache:
+    """
+    Flask extension holding the configured cache backend and its hit/miss counters.
+
+    Configuration keys:
+        CACHE_BACKEND: 'memory' (default), 'redis' or 'null'.
+        CACHE_TTL: Seconds an entry stays valid, 300 by default.
+        CACHE_MAX_ENTRIES: Size of the in-process LRU, 10000 by default.
+        CACHE_REDIS_URL: The server used by the 'redis' backend.
+    """
+
+    def __init__(self, app=None):
+        self.backend = NullBackend()
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Create the backend selected by the application config."""
+        name = app.config.setdefault('CACHE_BACKEND', 'memory')
+        ttl = app.config.setdefault('CACHE_TTL', 300)
+        if name == 'memory':
+            self.backend = MemoryBackend(ttl, app.config.setdefault('CACHE_MAX_ENTRIES', 10000))
+        elif name == 'redis':
+            self.backend = RedisBackend(
+                app.config.setdefault('CACHE_REDIS_URL', 'redis://127.0.0.1:6379/0'), ttl)
+        elif name == 'null':
+            self.backend = NullBackend()
+        else:
+            raise ValueError(f'Unknown CACHE_BACKEND: {name}')
+        app.extensions['cache'] = self
+
+    def get(self, key: str):
+        """Return a copy of the value stored under `key`, or None on a miss."""
+        value = self.backend.get(key)  # pylint: disable=assignment-from-none
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pickle.loads(value)
+
+    def set_many(self, mapping: dict):
+        """Store every value of `mapping` under its key."""
+        self.backend.set_many({key: pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+                               for key, value in mapping.items()})
+
+    def delete_many(self, *keys):
+        """Invalidate `keys`. Falsy keys are ignored."""
+        self.backend.delete_many([key for key in keys if key])
+
+    @property
+    def enabled(self) -> bool:
+        """Return False if nothing is ever cached, so that nothing needs invalidating."""
+        return not isinstance(self.backend, NullBackend)
+
+    def clear(self):
+        """Invalidate everything and reset the counters."""
+        self.backend.clear()
+        self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        """Return the hit/miss counters of this process together with the backend statistics."""
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            **self.backend.info(),
+        }
@@ -0,0 +1,103 @@
+"""Cache of the rendered HTML fragments of the web lists
+
+The table of a list page, with its pagination links, is rendered once per page
+and data version, then served from the record cache (service/cache.py).
+
+The data version is a random token stored in the cache under VERSION_KEY. Every
+commit of a session which wrote to the database replaces it, so the fragments of
+the previous version are never read again and age out of the cache. The user list
+shows post counts and the post list shows author names, so any write invalidates
+the fragments of both lists.
+"""
+import secrets
+from urllib.parse import urlencode
+
+from sqlalchemy import event
+
+from ..extensions import cache
+from .replicas import RoutingSession
+from .tracing import span
+
+VERSION_KEY = 'fragment:version'
+# session.info flag of the sessions which wrote since their last commit.
+STALE = 'fragments_stale'
+
+
+def new_version() -> str:
+    """Replace the data version, which invalidates every cached fragment. Return it."""
+    version = secrets.token_hex(8)
+    cache.set_many({VERSION_KEY: version})
+    return version
+
+
+def data_version() -> str:
+    """Return the current data version, starting a new one if the cache has none."""
+    version = cache.get(VERSION_KEY)
+    return version if version is not None else new_version()
+
+
+def fragment_key(name: str, params: dict) -> str:
+    """
+    Returns the cache key of a fragment in the current data version.
+
+    :param name: The name of the list, e.g. 'users'.
+    :param params: What the fragment depends on besides the data: page size, cursor,
+        filters. Empty values are left out.
+
+    :return:
+        str: The cache key.
+    """
+    query = urlencode(sorted((key, str(value)) for key, value in params.items()
+                             if value not in (None, '')))
+    return f'fragment:{name}:{data_version()}:{query}'
+
+
+def cached_fragment(name: str, params: dict, render) -> str:
+    """
+    Returns a rendered fragment from the cache, rendering and storing it on a miss.
+
+    :param name: The name of the list, e.g. 'users'.
+    :param params: What the fragment depends on besides the data, see `fragment_key`.
+    :param render: Called without arguments on a miss, returns the HTML.
+
+    :return:
+        str: The HTML of the fragment.
+    """
+    with span('cache'):
+        key = fragment_key(name, params)
+        html = cache.get(key)
+    if html is None:
+        html = render()
+        cache.set_many({key: html})
+    return html
+
+
+def _mark_stale(session, *args):  # pylint: disable=unused-argument
+    """Remember that the session wrote, its commit changes the data version."""
+    session.info[STALE] = True
+
+
+def _orm_execute(orm_execute_state):
+    """Mark the session on INSERT / UPDATE / DELETE statements, which do not flush."""
+    if not orm_execute_state.is_select:
+        _mark_stale(orm_execute_state.session)
+
+
+def _after_commit(session):
+    """Start a new data version if the committed transaction wrote."""
+    if session.info.pop(STALE, False):
+        new_version()
+
+
+def _after_rollback(session):
+    """Forget the writes of a rolled back transaction."""
+    session.info.pop(STALE, None)
+
+
+def init_fragments():
+    """Register the session events which invalidate the fragments on writes."""
+    if not event.contains(RoutingSession, 'after_commit', _after_commit):
+        event.listen(RoutingSession, 'after_flush', _mark_stale)
+        event.listen(RoutingSession, 'do_orm_execute', _orm_execute)
+        event.listen(RoutingSession, 'after_commit', _after_commit)
+        event.listen(RoutingSession, 'after_rollback', _after_rollback)
@@ -0,0 +1,112 @@
+"""SQL instrumentation helpers"""
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+
+class QueryCounter:
+    """
+    Collects the SQL statements sent to the database while it is active.
+
+    Attributes:
+        statements (list of str): The executed statements, in order.
+    """
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self) -> int:
+        """Return the number of executed statements."""
+        return len(self.statements)
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):  # pylint: disable=R0913
+        """`before_cursor_execute` listener."""
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine):
+    """
+    Counts the statements executed on `engine` inside the `with` block.
+
+    :param engine: The SQLAlchemy engine to observe (e.g. `db.engine`).
+
+    :return:
+        QueryCounter: The counter, filled in as the block runs.
+    """
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter)
+
+
+@contextmanager
+def assert_max_queries(engine, limit: int):
+    """
+    Fails with AssertionError if the `with` block executes more than `limit` statements.
+
+    :param engine: The SQLAlchemy engine to observe (e.g. `db.engine`).
+    :param limit: The maximum number of statements allowed.
+
+    :return:
+        QueryCounter: The counter, filled in as the block runs.
+    """
+    with count_queries(engine) as counter:
+        yield counter
+    assert counter.count <= limit, \
+        f'Expected at most {limit} queries, got {counter.count}:\n' + '\n'.join(counter.statements)
+
+
+def _full_scans(connection, statement: str, parameters) -> list:
+    """
+    Runs EXPLAIN for `statement` and returns the names of the tables it reads with a full scan.
+
+    MySQL reports a full table scan as access type 'ALL', SQLite as a 'SCAN <table>' step
+    which does not use an index.
+    """
+    if connection.dialect.name == 'sqlite':
+        plan = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)
+        return [row.detail for row in plan
+                if row.detail.startswith('SCAN') and 'INDEX' not in row.detail]
+    plan = connection.exec_driver_sql('EXPLAIN ' + statement, parameters).mappings()
+    return [row['table'] for row in plan if row['type'] == 'ALL']
+
+
+@contextmanager
+def assert_no_full_scans(engine, allow=()):
+    """
+    Fails with AssertionError if a SELECT executed inside the `with` block
+    plans a full table scan. The plans are checked when the block exits.
+
+    :param engine: The SQLAlchemy engine to observe (e.g. `db.engine`).
+    :param allow: Substrings of statements which are allowed to scan, e.g. small lookup tables.
+
+    :return:
+        QueryCounter: The collected statements.
+    """
+    selects = []
+
+    def collect(conn, cursor, statement, parameters, context, executemany):  # pylint: disable=R0913,W0613
+        if not executemany and statement.lstrip().upper().startswith('SELECT') \
+                and not any(pattern in statement for pattern in allow):
+            selects.append((statement, parameters))
+
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter)
+    event.listen(engine, 'before_cursor_execute', collect)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', collect)
+        event.remove(engine, 'before_cursor_execute', counter)
+
+    offenders = []
+    with engine.connect() as connection:
+        for statement, parameters in selects:
+            scans = _full_scans(connection, statement, parameters)
+            if scans:
+                offenders.append(f'{", ".join(scans)}: {statement}')
+    assert not offenders, 'Full table scans planned:\n' + '\n'.join(offenders)
@@ -0,0 +1,73 @@
+"""Logging setup
+
+In queue mode the root logger only puts records on an in-memory queue. A
+background thread owned by a `QueueListener` formats them and writes them to
+the console and the rotating log file, so disk I/O and rotation locking stay
+off the request threads.
+"""
+import atexit
+import copy
+import logging
+from logging.config import dictConfig
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+
+# Root log level per APP_ENV, LOG_LEVEL overrides it.
+LOG_LEVELS = {
+    'development': 'DEBUG',
+    'testing': 'WARNING',
+    'production': 'INFO',
+}
+
+# The listener of the last `configure_logging` call.
+_state = {'listener': None}
+
+
+def log_level(environment: str, level: str = None) -> str:
+    """
+    Return the root log level of `environment`, or `level` if it is set.
+
+    :raise ValueError: If the environment is unknown.
+    """
+    if level:
+        return level.upper()
+    if environment not in LOG_LEVELS:
+        raise ValueError(f'Unknown APP_ENV: {environment}')
+    return LOG_LEVELS[environment]
+
+
+def stop_logging():
+    """Flush the queued records and stop the listener thread, if one is running."""
+    listener, _state['listener'] = _state['listener'], None
+    if listener is not None:
+        listener.stop()
+
+
+def configure_logging(config: dict, level: str, use_queue: bool = True):
+    """
+    Applies a `dictConfig` configuration with the given root level.
+
+    :param config: The dictConfig configuration.
+    :param level: The level of the root logger, e.g. 'INFO'.
+    :param use_queue: Move the root handlers behind a QueueHandler and a
+        QueueListener thread instead of calling them from the logging thread.
+    """
+    stop_logging()
+    config = copy.deepcopy(config)
+    config.setdefault('root', {})['level'] = level
+    dictConfig(config)
+    if not use_queue:
+        return
+
+    root = logging.getLogger()
+    handlers = root.handlers[:]
+    for handler in handlers:
+        root.removeHandler(handler)
+    queue = SimpleQueue()
+    root.addHandler(QueueHandler(queue))
+    listener = QueueListener(queue, *handlers, respect_handler_level=True)
+    listener.start()
+    _state['listener'] = listener
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,102 @@
+"""Prometheus metrics
+
+Request counts, latencies and in-flight requests are recorded per route by
+request hooks, the connection pool state after every request. They are exposed
+in the Prometheus text format at METRICS_PATH ('/metrics').
+
+Under gunicorn, every worker writes its samples to memory-mapped files in
+PROMETHEUS_MULTIPROC_DIR (set up by restflask/gunicorn_conf.py) and the metrics
+endpoint aggregates the files of all workers, so any worker can answer a scrape.
+The variable has to be set before prometheus_client is first imported.
+"""
+import os
+import time
+
+from flask import Response, current_app, g, request
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry
+from prometheus_client import Counter, Gauge, Histogram, generate_latest, multiprocess
+from sqlalchemy.pool import QueuePool
+
+from ..extensions import db
+
+REQUESTS = Counter(
+    'restflask_http_requests_total', 'HTTP requests by route and status code.',
+    ('method', 'endpoint', 'status'))
+LATENCY = Histogram(
+    'restflask_http_request_duration_seconds', 'Time spent handling HTTP requests.',
+    ('method', 'endpoint'))
+IN_PROGRESS = Gauge(
+    'restflask_http_requests_in_progress', 'HTTP requests being handled.',
+    ('method', 'endpoint'), multiprocess_mode='livesum')
+POOL_SIZE = Gauge(
+    'restflask_db_pool_size', 'Connections kept open by the pools.',
+    multiprocess_mode='livesum')
+POOL_CHECKED_OUT = Gauge(
+    'restflask_db_pool_checked_out', 'Connections in use, including the reporting request.',
+    multiprocess_mode='livesum')
+POOL_OVERFLOW = Gauge(
+    'restflask_db_pool_overflow', 'Connections open beyond the pool size.',
+    multiprocess_mode='livesum')
+
+
+def _endpoint() -> str:
+    """Return the endpoint label of the current request, bounded to the known routes."""
+    return request.endpoint or 'unknown'
+
+
+def _start_request():
+    """`before_request` hook starting the clock and counting the request as in flight."""
+    if request.path == current_app.config['METRICS_PATH']:
+        return
+    g.metrics_start = time.perf_counter()
+    IN_PROGRESS.labels(request.method, _endpoint()).inc()
+
+
+def _finish_request(response):
+    """`after_request` hook recording the latency, the status code and the pool state."""
+    start = g.pop('metrics_start', None)
+    if start is not None:
+        endpoint = _endpoint()
+        LATENCY.labels(request.method, endpoint).observe(time.perf_counter() - start)
+        REQUESTS.labels(request.method, endpoint, response.status_code).inc()
+        IN_PROGRESS.labels(request.method, endpoint).dec()
+        pool = db.engine.pool
+        if isinstance(pool, QueuePool):
+            POOL_SIZE.set(pool.size())
+            POOL_CHECKED_OUT.set(pool.checkedout())
+            POOL_OVERFLOW.set(max(pool.overflow(), 0))
+    return response
+
+
+def _teardown_request(exc):  # pylint: disable=unused-argument
+    """`teardown_request` hook counting requests which failed with an unhandled exception."""
+    if g.pop('metrics_start', None) is not None:
+        endpoint = _endpoint()
+        REQUESTS.labels(request.method, endpoint, 500).inc()
+        IN_PROGRESS.labels(request.method, endpoint).dec()
+
+
+def registry():
+    """Return the registry to collect from, merging the files of all workers if needed."""
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    collector_registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(collector_registry)
+    return collector_registry
+
+
+def metrics_view():
+    """Return the metrics in the Prometheus text format."""
+    return Response(generate_latest(registry()), content_type=CONTENT_TYPE_LATEST)
+
+
+def init_metrics(app):
+    """Register the request hooks and the metrics endpoint on `app`."""
+    app.config.setdefault('METRICS', True)
+    app.config.setdefault('METRICS_PATH', '/metrics')
+    if not app.config['METRICS']:
+        return
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule(app.config['METRICS_PATH'], 'metrics', metrics_view)
@@ -0,0 +1,179 @@
+"""Keyset (cursor) pagination helpers"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+
+
+def sort_key(sort_column, descending: bool = False) -> str:
+    """Return the name of a sort order, e.g. '-created_at', which the cursors of its pages carry."""
+    return f"{'-' if descending else ''}{sort_column.key}"
+
+
+def encode_cursor(key: str, sort_value, row_id: int) -> str:
+    """
+    Packs the sort key of the last row of a page into an opaque, URL-safe cursor.
+
+    :param key: The `sort_key` of the sort order of the page.
+    :param sort_value: The value of the sort column of the last returned row.
+    :param row_id: The primary key of the last returned row.
+
+    :return:
+        str: A base64 encoded cursor string.
+    """
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([key, sort_value, row_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    Unpacks a cursor produced by `encode_cursor`.
+
+    :param cursor: The cursor string received from the client.
+
+    :raise ValueError: If the cursor is malformed.
+
+    :return:
+        tuple: (key, sort_value, row_id). Datetime sort values are returned as ISO strings.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        key, sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as exc:
+        raise ValueError('Invalid cursor') from exc
+    if not isinstance(key, str) or not isinstance(row_id, int) or isinstance(row_id, bool):
+        raise ValueError('Invalid cursor')
+    return key, sort_value, row_id
+
+
+def cursor_value(sort_column, sort_value):
+    """
+    Converts the sort value of a cursor to the Python type of `sort_column`.
+    None is kept if the column is nullable.
+
+    :raise ValueError: If the value does not have that type, e.g. a forged cursor.
+    """
+    if sort_value is None and sort_column.nullable:
+        return None
+    python_type = sort_column.type.python_type
+    if python_type is datetime and isinstance(sort_value, str):
+        try:
+            sort_value = datetime.fromisoformat(sort_value)
+        except ValueError as exc:
+            raise ValueError('Invalid cursor') from exc
+    if not isinstance(sort_value, python_type) or isinstance(sort_value, bool):
+        raise ValueError('Invalid cursor')
+    return sort_value
+
+
+def parse_limit(limit, default: int = DEFAULT_LIMIT, maximum: int = MAX_LIMIT) -> int:
+    """
+    Converts the `limit` query parameter into a page size within [1, maximum].
+
+    :param limit: The raw query parameter, or None.
+    :param default: The page size when `limit` is missing.
+    :param maximum: The largest page size.
+
+    :raise ValueError: If the value is not an integer.
+
+    :return:
+        int: The page size.
+    """
+    if limit in (None, ''):
+        return default
+    return max(1, min(int(limit), maximum))
+
+
+def order_by(sort_column, id_column, descending: bool = False) -> tuple:
+    """Return the ORDER BY clauses of a keyset walk over (sort_column, id_column)."""
+    if descending:
+        return sort_column.desc(), id_column.desc()
+    return sort_column, id_column
+
+
+def after(sort_column, id_column, sort_value, row_id: int, descending: bool = False):
+    """
+    Return the WHERE condition selecting the rows past (sort_value, row_id).
+
+    NULL sort values come first in ascending order and last in descending order, as
+    MySQL and SQLite sort them. The IS NULL terms are only added for nullable columns.
+    """
+    if sort_value is None:
+        nulls = and_(sort_column.is_(None),
+                     id_column < row_id if descending else id_column > row_id)
+        return nulls if descending else or_(nulls, sort_column.isnot(None))
+    if descending:
+        past = or_(sort_column < sort_value,
+                   and_(sort_column == sort_value, id_column < row_id))
+        return or_(past, sort_column.is_(None)) if sort_column.nullable else past
+    return or_(sort_column > sort_value,
+               and_(sort_column == sort_value, id_column > row_id))
+
+
+def keyset_page(query, sort_column, id_column, limit: int,  # pylint: disable=R0913
+                cursor: str = None, descending: bool = False) -> tuple:
+    """
+    Returns one page of `query` ordered by (sort_column, id_column).
+
+    The position is expressed as a WHERE condition on the sort key instead of an
+    OFFSET, so the database seeks directly into the index and every page costs
+    the same no matter how deep the client is.
+
+    :param query: A SQLAlchemy ORM query.
+    :param sort_column: The primary sort column (e.g. `Post.created_at`).
+    :param id_column: The primary key column used as a tie breaker.
+    :param limit: The page size.
+    :param cursor: The cursor returned with the previous page, or None for the first page.
+    :param descending: Walk the sort key from the highest to the lowest value.
+
+    :raise ValueError: If the cursor is malformed or comes from another sort order.
+
+    :return:
+        tuple: (rows, next_cursor). next_cursor is None on the last page.
+    """
+    key = sort_key(sort_column, descending)
+    if cursor:
+        cursor_key, sort_value, row_id = decode_cursor(cursor)
+        if cursor_key != key:
+            raise ValueError('Invalid cursor')
+        sort_value = cursor_value(sort_column, sort_value)
+        query = query.filter(after(sort_column, id_column, sort_value, row_id, descending))
+    rows = query.order_by(*order_by(sort_column, id_column, descending)).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(key, getattr(last, sort_column.key),
+                                    getattr(last, id_column.key))
+    return rows, next_cursor
+
+
+def iter_keyset(query, sort_column, id_column, batch_size: int,  # pylint: disable=R0913
+                descending: bool = False):
+    """
+    Yields every row of `query` ordered by (sort_column, id_column), running one keyset
+    query per batch of `batch_size` rows.
+
+    Unlike `yield_per`, no server-side cursor stays open between the batches, so other
+    statements can run on the same connection while the rows are consumed.
+
+    :param query: A SQLAlchemy ORM query whose rows carry the sort and id columns.
+    """
+    ordered = query.order_by(*order_by(sort_column, id_column, descending))
+    rows = ordered.limit(batch_size).all()
+    while rows:
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        last = rows[-1]
+        rows = ordered.filter(after(sort_column, id_column, getattr(last, sort_column.key),
+                                    getattr(last, id_column.key), descending)) \
+            .limit(batch_size).all()
@@ -0,0 +1,187 @@
+"""Database connection pool configuration and statistics"""
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+# Engine options per deployment. A worker holds at most pool_size + max_overflow
+# connections, so workers * (pool_size + max_overflow) must stay below the
+# max_connections of the MySQL server (151 by default).
+POOL_PRESETS = {
+    'development': {
+        'pool_size': 2,
+        'max_overflow': 2,
+        'pool_recycle': 3600,
+        'pool_pre_ping': False,
+        'pool_timeout': 30,
+    },
+    'production': {
+        'pool_size': 5,
+        'max_overflow': 5,
+        # Below the idle timeouts of MySQL and of the proxies in front of it.
+        'pool_recycle': 1800,
+        # Replaces connections the server closed while idle instead of failing a request.
+        'pool_pre_ping': True,
+        'pool_timeout': 10,
+    },
+}
+DEFAULT_PRESET = 'production'
+
+# Environment variable overriding each engine option.
+POOL_ENV = {
+    'pool_size': 'DB_POOL_SIZE',
+    'max_overflow': 'DB_MAX_OVERFLOW',
+    'pool_recycle': 'DB_POOL_RECYCLE',
+    'pool_pre_ping': 'DB_POOL_PRE_PING',
+    'pool_timeout': 'DB_POOL_TIMEOUT',
+}
+
+# Upper bounds, in seconds, of the checkout latency histogram buckets.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _env_value(value: str, default):
+    """Convert an environment variable to the type of the preset value."""
+    if isinstance(default, bool):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return type(default)(value)
+
+
+def engine_options(database_uri: str, environ=None) -> dict:
+    """
+    Builds SQLALCHEMY_ENGINE_OPTIONS from the DB_POOL_PRESET preset and the DB_POOL_*
+    environment variables.
+
+    SQLite databases keep the pool chosen by Flask-SQLAlchemy, so no options are returned.
+
+    :param database_uri: The SQLALCHEMY_DATABASE_URI of the application.
+    :param environ: The environment to read, `os.environ` by default.
+
+    :raise ValueError: If the preset is unknown or a variable has the wrong type.
+
+    :return:
+        dict: The engine options.
+    """
+    environ = os.environ if environ is None else environ
+    if make_url(database_uri).get_backend_name() == 'sqlite':
+        return {}
+    preset = environ.get('DB_POOL_PRESET', DEFAULT_PRESET)
+    if preset not in POOL_PRESETS:
+        raise ValueError(f'Unknown DB_POOL_PRESET: {preset}')
+    options = dict(POOL_PRESETS[preset])
+    for option, variable in POOL_ENV.items():
+        if environ.get(variable):
+            options[option] = _env_value(environ[variable], options[option])
+    options['poolclass'] = InstrumentedQueuePool
+    return options
+
+
+class PoolMetrics:
+    """
+    Checkout counters of one pool.
+
+    Attributes:
+        checkouts (int): The number of successful checkouts.
+        timeouts (int): The number of checkouts which gave up after pool_timeout.
+        wait_time (float): Seconds spent in checkouts in total.
+        max_wait (float): The slowest checkout, in seconds.
+        buckets (list of int): Checkouts per LATENCY_BUCKETS bound, the last one is unbounded.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def observe(self, seconds: float, timed_out: bool = False):
+        """Record one checkout which took `seconds`."""
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_time += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            self.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def histogram(self) -> list:
+        """Return the cumulative histogram as a list of {'le': bound, 'count': checkouts}."""
+        histogram, total = [], 0
+        for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), self.buckets):
+            total += count
+            histogram.append({'le': bound, 'count': total})
+        return histogram
+
+
+class InstrumentedQueuePool(QueuePool):
+    """`QueuePool` which measures how long every connection checkout takes."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def connect(self):
+        """Check out a connection, recording the time spent waiting for it."""
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            self.metrics.observe(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.observe(time.perf_counter() - start)
+        return connection
+
+
+def pool_stats(engine) -> dict:
+    """
+    Returns the state of the connection pool of `engine`.
+
+    :param engine: The SQLAlchemy engine (e.g. `db.engine`).
+
+    :return:
+        dict: The pool class, its configuration, the connections in use and, for
+        an `InstrumentedQueuePool`, the checkout statistics of this process.
+    """
+    pool = engine.pool
+    stats = {'pool': type(pool).__name__, 'status': pool.status()}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'max_overflow': pool._max_overflow,  # pylint: disable=protected-access
+            'timeout': pool.timeout(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+        })
+    metrics = getattr(pool, 'metrics', None)
+    if metrics is not None:
+        stats.update({
+            'checkouts': metrics.checkouts,
+            'timeouts': metrics.timeouts,
+            'wait_time': round(metrics.wait_time, 6),
+            'max_wait': round(metrics.max_wait, 6),
+            'latency_histogram': metrics.histogram(),
+        })
+    return stats
+
+
+def _sqlite_foreign_keys(dbapi_connection, connection_record):  # pylint: disable=unused-argument
+    """Enforce the foreign keys, ON DELETE CASCADE included, on a new SQLite connection."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA foreign_keys=ON')
+    cursor.close()
+
+
+def enforce_foreign_keys(engine):
+    """Turn on the foreign keys of a SQLite `engine`, which ignores them by default."""
+    if engine.dialect.name == 'sqlite' and not event.contains(engine, 'connect',
+                                                              _sqlite_foreign_keys):
+        event.listen(engine, 'connect', _sqlite_foreign_keys)
@@ -0,0 +1,152 @@
+"""Per-request query statistics, slow-query log, profiler and Server-Timing header
+
+Every request counts the SQL statements it executes and the time they take.
+Statements slower than SLOW_QUERY_THRESHOLD seconds are logged with their
+parameters to the 'restflask.sql' logger. With SERVER_TIMING set, responses
+carry a `Server-Timing` header with the database time, the spans of a traced
+request (see tracing.py) and the total time spent in the view.
+
+With PROFILING set, a request sent with the `X-Profile: 1` header runs under
+cProfile (or pyinstrument, if PROFILER is 'pyinstrument' and it is installed)
+and the profile is written to PROFILE_DIR.
+"""
+import cProfile
+import logging
+import os
+import re
+import time
+import uuid
+from collections import defaultdict
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+from ..extensions import db
+from .tracing import current_trace
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_FILE_HEADER = 'X-Profile-File'
+# Longest logged repr of the parameters of a slow statement.
+MAX_PARAMETERS_LENGTH = 1000
+
+logger = logging.getLogger('restflask.sql')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):  # pylint: disable=R0913,W0613
+    """Remember when the statement started."""
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _handle_error(exception_context):
+    """Forget the start time of a statement which failed."""
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('query_start'):
+        connection.info['query_start'].pop()
+
+
+def _slow_query_listener(threshold: float):
+    """Return an `after_cursor_execute` listener which logs statements slower than `threshold`."""
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):  # pylint: disable=R0913,W0613
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        if has_request_context():
+            g.sql_queries = g.get('sql_queries', 0) + 1
+            g.sql_time = g.get('sql_time', 0.0) + elapsed
+        if threshold is not None and elapsed >= threshold:
+            if executemany:
+                parameters = f'{len(parameters)} parameter sets'
+            logger.warning('Slow query, %.1f ms: %s; parameters: %.*r', elapsed * 1000,
+                           statement, MAX_PARAMETERS_LENGTH, parameters)
+
+    return after_cursor_execute
+
+
+def _profile_path(directory: str, extension: str) -> str:
+    """
+    Return a new file name for the profile of the current request. The trace id of a traced
+    request, else a random one, keeps the profiles of the same second apart.
+    """
+    name = re.sub(r'[^\w]+', '_', request.path).strip('_') or 'index'
+    trace = current_trace()
+    unique = trace.trace_id if trace is not None else uuid.uuid4().hex
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory,
+                        f'{time.strftime("%Y%m%d-%H%M%S")}-{name}-{unique}.{extension}')
+
+
+def _start_request():
+    """`before_request` hook starting the clock, and the profiler if asked for."""
+    g.request_start = time.perf_counter()
+    if current_app.config['PROFILING'] and request.headers.get(PROFILE_HEADER) in ('1', 'true'):
+        if current_app.config['PROFILER'] == 'pyinstrument':
+            from pyinstrument import Profiler  # pylint: disable=import-outside-toplevel,import-error
+            g.profiler = Profiler()
+            g.profiler.start()
+        else:
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+
+def _stop_profiler(profiler) -> str:
+    """Stop `profiler` and write its results, return the file name."""
+    directory = current_app.config['PROFILE_DIR']
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        path = _profile_path(directory, 'prof')
+        profiler.dump_stats(path)
+    else:
+        profiler.stop()
+        path = _profile_path(directory, 'html')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(profiler.output_html())
+    return path
+
+
+def server_timing() -> str:
+    """
+    Builds the Server-Timing header value of the current request.
+
+    :return:
+        str: e.g. 'db;dur=3.2;desc="4 queries", serialize;dur=1.1, app;dur=5.0'
+    """
+    sql_time, sql_queries = g.get('sql_time', 0.0), g.get('sql_queries', 0)
+    metrics = [f'db;dur={sql_time * 1000:.3f};desc="{sql_queries} queries"']
+    trace = current_trace()
+    if trace is not None:
+        spans = defaultdict(float)
+        for name, _, duration in trace.spans:
+            if name != 'db':
+                spans[name] += duration
+        metrics.extend(f'{name};dur={duration * 1000:.3f}' for name, duration in spans.items())
+    metrics.append(f'app;dur={(time.perf_counter() - g.request_start) * 1000:.3f}')
+    return ', '.join(metrics)
+
+
+def _finish_request(response):
+    """`after_request` hook adding the Server-Timing header and writing the profile."""
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        path = _stop_profiler(profiler)
+        logger.info('Profile of %s written to %s', request.path, path)
+        response.headers[PROFILE_FILE_HEADER] = os.path.basename(path)
+    if current_app.config['SERVER_TIMING'] and 'request_start' in g:
+        response.headers['Server-Timing'] = server_timing()
+    return response
+
+
+def init_profiling(app):
+    """Register the query listeners on the engines of `app` and the request hooks."""
+    app.config.setdefault('SLOW_QUERY_THRESHOLD', 0.5)
+    app.config.setdefault('SERVER_TIMING', False)
+    app.config.setdefault('PROFILING', False)
+    app.config.setdefault('PROFILER', 'cprofile')
+    app.config.setdefault('PROFILE_DIR', 'profiles')
+
+    after_cursor_execute = _slow_query_listener(app.config['SLOW_QUERY_THRESHOLD'])
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+            event.listen(engine, 'handle_error', _handle_error)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
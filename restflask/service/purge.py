@@ -0,0 +1,79 @@
+"""Background purge of the posts of prolific users
+
+Deleting a user deletes its posts through the ON DELETE CASCADE of posts.author_id,
+within the DELETE of the user. For a user with more than USER_PURGE_THRESHOLD
+posts, that one statement would lock thousands of rows for as long as it runs, so
+`delete_user` submits the user to `purge_queue` instead and returns at once. A
+daemon thread deletes the posts USER_PURGE_CHUNK_SIZE at a time, each chunk in
+its own transaction, then the user.
+
+The user and its remaining posts stay readable until the purge reaches them. A
+purge interrupted by a restart leaves the user in place, deleting it again
+resumes it.
+"""
+import logging
+import queue
+import threading
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+
+class PurgeQueue:
+    """
+    Runs submitted purges one at a time in a daemon thread, each in an application context.
+
+    Attributes:
+        pending (set): The keys of the purges submitted and not finished yet.
+    """
+
+    def __init__(self):
+        self.pending = set()
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, key, function, *args) -> bool:
+        """
+        Schedules `function(*args)` in the application context of the current application.
+
+        :param key: Identifies the purge, e.g. ('user', 1).
+        :param function: The purge, called in the background thread.
+
+        :return:
+            bool: False if a purge with the same key is already pending.
+        """
+        app = current_app._get_current_object()  # pylint: disable=protected-access
+        with self._lock:
+            if key in self.pending:
+                return False
+            self.pending.add(key)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='restflask-purge',
+                                                daemon=True)
+                self._thread.start()
+        self._queue.put((app, key, function, args))
+        return True
+
+    def join(self):
+        """Wait until every submitted purge finished."""
+        self._queue.join()
+
+    def _run(self):
+        """Run the purges of the queue forever."""
+        while True:
+            app, key, function, args = self._queue.get()
+            try:
+                with app.app_context():
+                    function(*args)
+                logger.info('Purge of %s finished', key)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception('Purge of %s failed', key)
+            finally:
+                with self._lock:
+                    self.pending.discard(key)
+                self._queue.task_done()
+
+
+purge_queue = PurgeQueue()
@@ -0,0 +1,245 @@
+"""Read replicas
+
+Every URI of SQLALCHEMY_REPLICA_URIS becomes a Flask-SQLAlchemy bind named
+'replica_<n>'. The read functions of the service layer run inside
+`replica_reads()`, which makes `RoutingSession` send their SELECT statements to
+a replica, picked round-robin once per request so that the ETag probe and the
+response of a request come from the same server. Writes, flushes and any code
+outside of `replica_reads()` use the primary.
+
+A replica is used only if it answered a `SELECT 1` within the last
+REPLICA_CHECK_INTERVAL seconds. A replica whose connection fails is skipped
+until its next check, and when no replica is healthy the reads go to the primary.
+
+Read-your-writes: once a session wrote, the rest of its reads go to the primary.
+A request which wrote also sets the REPLICA_STICKY_COOKIE cookie, and the
+requests carrying it read from the primary for REPLICA_STICKY_SECONDS, which
+should exceed the replication lag.
+"""
+import functools
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+import sqlalchemy
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+
+from .pool import engine_options
+
+BIND_PREFIX = 'replica_'
+# session.info keys: the depth of nested `replica_reads()` blocks, the replica chosen
+# for them outside of requests, and whether the session wrote.
+READING = 'replica_reads'
+READ_ENGINE = 'replica_engine'
+WROTE = 'wrote'
+
+logger = logging.getLogger(__name__)
+
+
+def replica_binds(uris) -> dict:
+    """
+    Builds the SQLALCHEMY_BINDS entries of the replicas.
+
+    :param uris: The database URIs of the replicas.
+
+    :return:
+        dict: {'replica_<n>': {'url': uri, **engine options}}, with the pool sizing of the primary.
+    """
+    return {f'{BIND_PREFIX}{index}': {'url': uri, **engine_options(uri)}
+            for index, uri in enumerate(uris)}
+
+
+class ReplicaPool:
+    """
+    Round-robin selection among the healthy replicas.
+
+    Attributes:
+        engines (dict): The engines of the replicas, by bind key.
+        check_interval (float): Seconds a health check result is trusted.
+    """
+
+    def __init__(self, engines: dict, check_interval: float):
+        self.engines = engines
+        self.check_interval = check_interval
+        self._keys = sorted(engines)
+        self._next = itertools.count()
+        # bind key -> (healthy, time of the check)
+        self._health = {}
+        self._lock = threading.Lock()
+
+    def _ping(self, key: str) -> bool:
+        """Run `SELECT 1` on the replica and return whether it answered."""
+        try:
+            with self.engines[key].connect() as connection:
+                connection.execute(text('SELECT 1'))
+        except sqlalchemy.exc.SQLAlchemyError as error:
+            logger.warning('Replica %s is unavailable: %s', key, error)
+            return False
+        return True
+
+    def healthy(self, key: str) -> bool:
+        """Return whether the replica is healthy, checking it again if its result expired."""
+        now = time.monotonic()
+        with self._lock:
+            state = self._health.get(key)
+        if state is not None and now - state[1] < self.check_interval:
+            return state[0]
+        healthy = self._ping(key)
+        with self._lock:
+            self._health[key] = (healthy, now)
+        return healthy
+
+    def mark_down(self, key: str):
+        """Skip the replica until its next health check."""
+        with self._lock:
+            self._health[key] = (False, time.monotonic())
+
+    def choose(self):
+        """Return the engine of the next healthy replica, or None if there is none."""
+        for _ in self._keys:
+            key = self._keys[next(self._next) % len(self._keys)]
+            if self.healthy(key):
+                return self.engines[key]
+        return None
+
+    def stats(self) -> dict:
+        """Return the last health check result of every replica, None if never checked."""
+        with self._lock:
+            return {key: self._health[key][0] if key in self._health else None
+                    for key in self._keys}
+
+
+def _read_engine(session):
+    """Return the replica the reads of `session` go to, or None for the primary."""
+    pool = current_app.extensions.get('replicas')
+    if pool is None or session.info.get(WROTE):
+        return None
+    if has_request_context():
+        if g.get('db_primary'):
+            return None
+        if 'db_replica' not in g:
+            g.db_replica = pool.choose()
+        return g.db_replica
+    if READ_ENGINE not in session.info:
+        session.info[READ_ENGINE] = pool.choose()
+    return session.info[READ_ENGINE]
+
+
+class RoutingSession(Session):  # pylint: disable=too-few-public-methods
+    """
+    The session of `db`, which sends the SELECT statements of `replica_reads()` blocks
+    to a replica. The replica is chosen by the first of them, so reads answered from
+    the cache never touch the pool.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (self.info.get(READING) and bind is None and not self._flushing
+                and isinstance(clause, sqlalchemy.Select)):
+            engine = _read_engine(self)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def replica_reads():
+    """Send the queries of the block to a replica, unless the reads must see the primary."""
+    session = current_app.extensions['sqlalchemy'].session()
+    session.info[READING] = session.info.get(READING, 0) + 1
+    try:
+        yield
+    finally:
+        session.info[READING] -= 1
+        if not session.info[READING]:
+            session.info.pop(READ_ENGINE, None)
+
+
+def reads_from_replica(func):
+    """Decorator running the service function inside `replica_reads()`."""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with replica_reads():
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def _mark_write(session, *args):  # pylint: disable=unused-argument
+    """Pin the reads of the session, and of the clients of the request, to the primary."""
+    session.info[WROTE] = True
+    if has_request_context():
+        g.db_wrote = True
+
+
+def _orm_execute(orm_execute_state):
+    """Mark the session on INSERT / UPDATE / DELETE statements, which do not flush."""
+    if not orm_execute_state.is_select:
+        _mark_write(orm_execute_state.session)
+
+
+def _start_request():
+    """`before_request` hook reading from the primary within the sticky window of a write."""
+    try:
+        sticky_until = float(request.cookies.get(current_app.config['REPLICA_STICKY_COOKIE'], 0))
+    except ValueError:
+        sticky_until = 0
+    if sticky_until > time.time():
+        g.db_primary = True
+
+
+def _finish_request(response):
+    """`after_request` hook opening the sticky window of a request which wrote."""
+    seconds = current_app.config['REPLICA_STICKY_SECONDS']
+    if g.get('db_wrote') and seconds:
+        response.set_cookie(current_app.config['REPLICA_STICKY_COOKIE'],
+                            str(time.time() + seconds), max_age=seconds,
+                            httponly=True, samesite='Lax')
+    return response
+
+
+def _disconnect_listener(pool: ReplicaPool, key: str):
+    """Return a `handle_error` listener which marks the replica down on connection errors."""
+
+    def handle_error(exception_context):
+        if exception_context.is_disconnect or exception_context.connection is None:
+            pool.mark_down(key)
+
+    return handle_error
+
+
+def init_replicas(app, extension):
+    """
+    Sets up the replica pool of `app` from the replica binds and registers the hooks
+    which keep the reads of a writer on the primary.
+
+    :param app: The application, after `extension.init_app`.
+    :param extension: The `SQLAlchemy` extension, whose session class must be `RoutingSession`.
+    """
+    app.config.setdefault('REPLICA_CHECK_INTERVAL', 5)
+    app.config.setdefault('REPLICA_STICKY_SECONDS', 5)
+    app.config.setdefault('REPLICA_STICKY_COOKIE', 'rf_primary')
+
+    with app.app_context():
+        engines = {key: engine for key, engine in extension.engines.items()
+                   if key is not None and key.startswith(BIND_PREFIX)}
+    if not engines:
+        return
+    # The replicas get the schema of the primary through replication, keep `create_all`
+    # and `drop_all` away from them.
+    for key in engines:
+        extension.metadatas.pop(key, None)
+    pool = ReplicaPool(engines, app.config['REPLICA_CHECK_INTERVAL'])
+    for key, engine in engines.items():
+        event.listen(engine, 'handle_error', _disconnect_listener(pool, key))
+    app.extensions['replicas'] = pool
+
+    if not event.contains(RoutingSession, 'after_flush', _mark_write):
+        event.listen(RoutingSession, 'after_flush', _mark_write)
+        event.listen(RoutingSession, 'do_orm_execute', _orm_execute)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
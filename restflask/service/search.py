@@ -0,0 +1,123 @@
+"""In-process full-text search fallback
+
+MySQL answers post searches from its FULLTEXT index. Databases without one
+(SQLite in tests and offline runs) use the inverted index below instead. It is
+built from the posts table on the first search and kept current by the post
+write functions of this process, so it suits single-process deployments.
+"""
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+
+TOKEN_RE = re.compile(r'\w\w+')
+
+# Okapi BM25 parameters; title terms count TITLE_WEIGHT times.
+BM25_K1 = 1.2
+BM25_B = 0.75
+TITLE_WEIGHT = 2
+
+
+def tokenize(text: str) -> list:
+    """Split `text` into lower-cased words of at least two characters."""
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+class InvertedIndex:
+    """
+    Maps every word to the documents containing it and ranks matches with BM25.
+
+    Attributes:
+        built (bool): False until `build` was called, or after `invalidate`.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = {}
+        self._documents = {}
+        self._total_length = 0
+        self.built = False
+
+    def build(self, documents):
+        """
+        Replaces the content of the index.
+
+        :param documents: An iterable of (doc_id, title, description) tuples.
+        """
+        with self._lock:
+            self._postings, self._documents, self._total_length = {}, {}, 0
+            for doc_id, title, description in documents:
+                self._add(doc_id, title, description)
+            self.built = True
+
+    def invalidate(self):
+        """Drop the content, the next search rebuilds the index."""
+        with self._lock:
+            self._postings, self._documents, self._total_length = {}, {}, 0
+            self.built = False
+
+    def add(self, doc_id: int, title: str, description: str):
+        """Index a new document or re-index a changed one. Ignored until the index is built."""
+        with self._lock:
+            if self.built:
+                self._remove(doc_id)
+                self._add(doc_id, title, description)
+
+    def remove(self, doc_id: int):
+        """Remove a document. Ignored until the index is built."""
+        with self._lock:
+            if self.built:
+                self._remove(doc_id)
+
+    def search(self, query: str, limit: int, offset: int = 0) -> list:
+        """
+        Ranks the documents containing any word of `query`.
+
+        :param query: The words to search for.
+        :param limit: The maximum number of results.
+        :param offset: The number of best results to skip.
+
+        :return:
+            list of tuple: (doc_id, score) pairs, best match first.
+        """
+        with self._lock:
+            count = len(self._documents)
+            if not count:
+                return []
+            average_length = self._total_length / count
+            scores = Counter()
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequency in postings.items():
+                    norm = 1 - BM25_B + BM25_B * self._documents[doc_id][1] / average_length
+                    scores[doc_id] += idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * norm)
+        ranked = heapq.nsmallest(offset + limit, scores.items(),
+                                 key=lambda item: (-item[1], item[0]))
+        return ranked[offset:]
+
+    def _add(self, doc_id, title, description):
+        terms = Counter(tokenize(description))
+        for term in tokenize(title):
+            terms[term] += TITLE_WEIGHT
+        for term, frequency in terms.items():
+            self._postings.setdefault(term, {})[doc_id] = frequency
+        length = sum(terms.values())
+        self._documents[doc_id] = (terms, length)
+        self._total_length += length
+
+    def _remove(self, doc_id):
+        terms, length = self._documents.pop(doc_id, (None, 0))
+        if terms is None:
+            return
+        self._total_length -= length
+        for term in terms:
+            del self._postings[term][doc_id]
+            if not self._postings[term]:
+                del self._postings[term]
+
+
+post_index = InvertedIndex()
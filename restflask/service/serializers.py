@@ -0,0 +1,157 @@
+"""Column-tuple serialization of the listings
+
+The listing queries select plain labelled columns instead of ORM entities, and
+every result row is turned into a dict with `dict(zip(names, row))`. This skips
+the identity map, the attribute instrumentation and marshmallow's per-field
+dispatch. The author of a post is selected by the same outer join as the post,
+as its username and its name, '' for orphaned posts. Datetimes are left as they are, the JSON
+provider (rest/json_provider.py) writes them in ISO 8601 as the schemas do.
+
+Keyset columns which were not selected by the client are appended after the
+output columns. `zip` stops at the last name, so they never reach the dicts.
+"""
+from itertools import islice
+
+from sqlalchemy import func
+
+from ..extensions import db
+from ..models.model import User, Post, PostSchema
+
+USER_COLUMNS = {
+    'id': User.id,
+    'username': User.username,
+    'email': User.email,
+    'first_name': User.first_name,
+    'last_name': User.last_name,
+    'location': User.location,
+    'registered_at': User.registered_at,
+    'num_post': User.num_post,
+}
+POST_COLUMNS = {
+    'id': Post.id,
+    'title': Post.title,
+    'description': Post.description,
+    'created_at': Post.created_at,
+    'author_id': Post.author_id,
+    'author_username': func.coalesce(User.username, ''),  # pylint: disable=E1102
+    'author_name': func.coalesce(  # pylint: disable=E1102
+        User.first_name + ' ' + User.last_name, ''),
+}
+AUTHOR_FIELDS = ('author_username', 'author_name')
+POST_NAMES = PostSchema.Meta.fields
+
+
+def field_names(schema_class, fields: tuple, columns: dict) -> tuple:
+    """Return the selected fields of `schema_class` which are read from `columns`."""
+    return tuple(name for name in fields or schema_class.Meta.fields if name in columns)
+
+
+def _select(columns: dict, names: tuple, keyset: tuple) -> list:
+    """Label the output columns by field name and append the keyset columns not among them."""
+    selected = [columns[name].label(name) for name in names]
+    selected += [column for column in keyset if column.key not in names]
+    return selected
+
+
+def filter_users(query, created_from=None, created_to=None):
+    """Restrict a user query to the users registered between `created_from` and `created_to`."""
+    if created_from:
+        query = query.filter(User.registered_at >= created_from)
+    if created_to:
+        query = query.filter(User.registered_at <= created_to)
+    return query
+
+
+def filter_posts(query, author_id=None, created_from=None, created_to=None):
+    """Restrict a post query to the posts of `author_id` created between the two datetimes."""
+    if author_id is not None:
+        query = query.filter(Post.author_id == author_id)
+    if created_from:
+        query = query.filter(Post.created_at >= created_from)
+    if created_to:
+        query = query.filter(Post.created_at <= created_to)
+    return query
+
+
+def user_rows_query(names: tuple, sort_column=User.registered_at,
+                    created_from=None, created_to=None):
+    """
+    Builds the column query behind the user listings.
+
+    :param names: The output field names, keys of USER_COLUMNS.
+    :param sort_column: The column the listing is ordered by. It is always selected.
+    :param created_from: Only users registered at or after this datetime.
+    :param created_to: Only users registered at or before this datetime.
+
+    :return:
+        Query: The unordered query. Its rows start with the `names` columns.
+    """
+    query = db.session.query(*_select(USER_COLUMNS, names, (User.id, sort_column)))
+    return filter_users(query, created_from, created_to)
+
+
+def post_rows_query(names: tuple, sort_column=Post.created_at,  # pylint: disable=R0913
+                    author_id=None, created_from=None, created_to=None):
+    """
+    Builds the column query behind the post listings.
+    The author is outer joined only if one of AUTHOR_FIELDS is selected.
+
+    :param names: The output field names, keys of POST_COLUMNS.
+    :param sort_column: The column the listing is ordered by. It is always selected.
+    :param author_id: Only posts of this user.
+    :param created_from: Only posts created at or after this datetime.
+    :param created_to: Only posts created at or before this datetime.
+
+    :return:
+        Query: The unordered query. Its rows start with the `names` columns.
+    """
+    query = db.session.query(*_select(POST_COLUMNS, names, (Post.id, sort_column)))
+    query = query.select_from(Post)
+    if set(AUTHOR_FIELDS) & set(names):
+        query = query.outerjoin(User, Post.author_id == User.id)
+    return filter_posts(query, author_id, created_from, created_to)
+
+
+def dump_rows(names: tuple, rows) -> list:
+    """Map every row to a dict of its first len(names) columns."""
+    return [dict(zip(names, row)) for row in rows]
+
+
+def attach_posts(users: list, rows) -> list:
+    """
+    Adds the 'posts' list of every user, all of them loaded by one query.
+
+    :param users: The dicts of `rows`, in the same order.
+    :param rows: The user rows, which carry the 'id' column.
+
+    :return:
+        list: `users`
+    """
+    posts = {row.id: [] for row in rows}
+    if posts:
+        query = post_rows_query(POST_NAMES, Post.id).filter(Post.author_id.in_(list(posts)))
+        for row in query.order_by(Post.id):
+            posts[row.author_id].append(dict(zip(POST_NAMES, row)))
+    for user, row in zip(users, rows):
+        user['posts'] = posts[row.id]
+    return users
+
+
+def iter_dicts(rows, names: tuple, batch_size: int, nested_posts: bool = False):
+    """
+    Yields the rows of an iterable as dicts, converting them `batch_size` rows at a time.
+
+    :param rows: An iterable of rows, e.g. a `yield_per` query.
+    :param names: The output field names.
+    :param batch_size: The number of rows converted, and of users whose posts are loaded, at once.
+    :param nested_posts: Add the 'posts' list of every user row.
+    """
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        items = dump_rows(names, batch)
+        if nested_posts:
+            attach_posts(items, batch)
+        yield from items
@@ -1,13 +1,150 @@
 """CRUD functions"""
+import hashlib
+
 import sqlalchemy
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm import joinedload, selectinload, undefer
+
+from ..extensions import db, cache
+
+from ..models.model import User, UserSchema, UserSummarySchema, user_schema, users_schema
+from ..models.model import users_summary_schema
+from ..models.model import Post, PostSchema, post_schema, posts_schema
+
+from .fragments import data_version
+from .pagination import iter_keyset, keyset_page, order_by
+from .purge import purge_queue
+from .replicas import reads_from_replica
+from .search import post_index
+from .serializers import USER_COLUMNS, POST_COLUMNS, POST_NAMES
+from .serializers import attach_posts, dump_rows, field_names, filter_posts, filter_users
+from .serializers import iter_dicts
+from .serializers import post_rows_query, user_rows_query
+from .tracing import span
+from .validate import parse_sort
+
+STREAM_BATCH_SIZE = 500
+
+USER_FIELDS = ('username', 'email', 'first_name', 'last_name', 'location')
+
+USER_SORT_COLUMNS = {'registered_at': User.registered_at, 'id': User.id,
+                     'username': User.username}
+POST_SORT_COLUMNS = {'created_at': Post.created_at, 'id': Post.id, 'title': Post.title}
+
+AUTHOR_NAMES = ('id', 'first_name', 'last_name')
+AUTHOR_COLUMNS = (User.id, User.first_name, User.last_name)
+# The author choices of this process, {(data version, limit): (authors,)},
+# see `get_author_choices`.
+_author_choices = {}
+
+
+# Eager-loading strategies. Collections are fetched with one extra SELECT ... IN per query,
+# the many-to-one author of PostSchema's author fields is joined into the same statement.
+# Post.user of posts loaded through User.posts resolves from the identity map, so no lazy
+# loads happen during serialization.
+USER_LOAD_OPTIONS = (selectinload(User.posts),)
+POST_LOAD_OPTIONS = (joinedload(Post.user),)
+
+
+def user_cache_keys(user_id=None, email=None) -> tuple:
+    """Return the cache keys of a user looked up by id and by email."""
+    return (f'user:id:{user_id}' if user_id is not None else None,
+            f'user:email:{email}' if email else None)
 
-from ..config import db
 
-from ..models.model import User, user_schema, users_schema
-from ..models.model import Post, post_schema, posts_schema
+def post_cache_keys(post_id=None, title=None) -> tuple:
+    """Return the cache keys of a post looked up by id and by title."""
+    return (f'post:id:{post_id}' if post_id is not None else None,
+            f'post:title:{title}' if title else None)
+
+
+def invalidate_authors(author_ids) -> None:
+    """
+    Invalidates the cached users whose nested post lists changed.
+
+    :param author_ids: The ids of the post authors. None values (orphaned posts) are skipped.
+    """
+    author_ids = {int(author_id) for author_id in author_ids if author_id not in (None, '')}
+    if not author_ids:
+        return
+    for user_id, email in db.session.query(User.id, User.email).filter(User.id.in_(author_ids)):
+        cache.delete_many(*user_cache_keys(user_id, email))
+
+
+def authored_post_keys(author_ids) -> list:
+    """
+    Returns the cache keys of the posts of users, which embed their author.
+    The posts are not queried when the cache is disabled.
+
+    :param author_ids: The ids of the users.
+    """
+    if not cache.enabled:
+        return []
+    query = db.session.query(Post.id, Post.title).filter(Post.author_id.in_(list(author_ids)))
+    return [key for post_id, title in query for key in post_cache_keys(post_id, title)]
+
+
+def invalidate_authored_posts(author_ids) -> None:
+    """
+    Invalidates the cached posts of users, since every cached post embeds its author.
+
+    :param author_ids: The ids of the users.
+    """
+    cache.delete_many(*authored_post_keys(author_ids))
+
+
+def users_query():
+    """Return a `User` query with the posts collection eagerly loaded."""
+    return User.query.options(*USER_LOAD_OPTIONS)
+
+
+def posts_query():
+    """Return a `Post` query with the author eagerly loaded."""
+    return Post.query.options(*POST_LOAD_OPTIONS)
+
+
+def build_users_query(summary: bool = False, created_from=None, created_to=None):
+    """
+    Builds the `User` query behind the user listings of the web views.
+
+    Filters are pushed down into the WHERE clause. Summary queries select the post
+    count of each user instead of loading the posts.
+
+    :param summary: Select `num_post` instead of loading the posts.
+    :param created_from: Only users registered at or after this datetime.
+    :param created_to: Only users registered at or before this datetime.
+
+    :return:
+        Query: The unordered query.
+    """
+    if summary:
+        query = User.query.options(undefer(User.num_post))
+    else:
+        query = users_query()
+    return filter_users(query, created_from, created_to)
+
+
+def build_posts_query(author_id=None, created_from=None, created_to=None):
+    """
+    Builds the `Post` query behind the post listings of the web views.
+
+    Filters are pushed down into the WHERE clause, where the (author_id, created_at) index
+    serves them.
+
+    :param author_id: Only posts of this user.
+    :param created_from: Only posts created at or after this datetime.
+    :param created_to: Only posts created at or before this datetime.
+
+    :return:
+        Query: The unordered query.
+    """
+    return filter_posts(posts_query(), author_id, created_from, created_to)
 
 
 # ==================== Users ====================
+@reads_from_replica
 def get_users() -> list:
     """
     Retrieves a list of all users.
@@ -15,17 +152,104 @@ def get_users() -> list:
     :return:
         A list of dictionaries containing user data.
     """
-    users = User.query.all()
+    users = users_query().all()
     users_list = users_schema.dump(users)
     return users_list
 
 
+@reads_from_replica
+def get_users_summary() -> list:
+    """
+    Retrieves a list of all users with their number of posts instead of the posts themselves.
+    The counts are computed by the database, no post rows are loaded.
+
+    :return:
+        A list of dictionaries containing user data and a 'num_post' key.
+    """
+    users = build_users_query(summary=True).order_by(User.registered_at, User.id).all()
+    return users_summary_schema.dump(users)
+
+
+@reads_from_replica
+def get_users_page(limit: int, cursor: str = None, sort: str = None,  # pylint: disable=R0913
+                   fields: tuple = None, summary: bool = False, versioned: bool = False,
+                   **filters) -> tuple:
+    """
+    Retrieves one page of users.
+
+    :param limit: The maximum number of users to return.
+    :param cursor: The cursor returned with the previous page, or None for the first page.
+    :param sort: A field of USER_SORT_COLUMNS, prefixed with '-' for descending order.
+        Registration date by default.
+    :param fields: The field names to return, or None for every field.
+    :param summary: Return the 'num_post' count of each user instead of its posts.
+    :param versioned: Also return the `users_etag` of the listing, selected by the page query.
+    :param filters: `created_from` / `created_to` keyword arguments of `user_rows_query`.
+
+    :raise ValueError: If the cursor or the sort field is invalid.
+
+    :return:
+        tuple: (users_list, next_cursor, etag), where next_cursor is None on the last page
+        and etag is None unless `versioned`.
+    """
+    sort_column, descending = parse_sort(sort, USER_SORT_COLUMNS, 'registered_at')
+    names = field_names(UserSummarySchema if summary else UserSchema, fields, USER_COLUMNS)
+    query = user_rows_query(names, sort_column, **filters)
+    if versioned:
+        query = _with_versions(query, _users_versions(**filters))
+    with span('db'):
+        rows, next_cursor = keyset_page(query, sort_column, User.id, limit, cursor, descending)
+    with span('serialize'):
+        users = dump_rows(names, rows)
+    if not summary and (fields is None or 'posts' in fields):
+        with span('db'):
+            attach_posts(users, rows)
+    etag = None
+    if versioned:
+        # An empty page carries no version columns.
+        etag = version_tag('users', *rows[0][-4:]) if rows else users_etag(**filters)
+    return users, next_cursor, etag
+
+
+def iter_users(sort: str = None, fields: tuple = None, summary: bool = False,
+               batch_size: int = STREAM_BATCH_SIZE, **filters):
+    """
+    Yields every matching user as a dictionary, reading the table in batches so that
+    memory use does not depend on the table size.
+    The arguments are validated when the function is called, the query runs on iteration.
+
+    Flat rows are read through a server-side cursor. When the posts are selected, the
+    users are read by one keyset query per batch instead, since the posts of every batch
+    are loaded on the same connection while the stream is still being consumed.
+
+    :param sort: A field of USER_SORT_COLUMNS, prefixed with '-' for descending order.
+    :param fields: The field names to return, or None for every field.
+    :param summary: Return the 'num_post' count of each user instead of its posts.
+    :param batch_size: The number of rows fetched at a time.
+    :param filters: `created_from` / `created_to` keyword arguments of `user_rows_query`.
+
+    :raise ValueError: If the sort field is invalid.
+
+    :return:
+        generator of dict: The serialized users.
+    """
+    sort_column, descending = parse_sort(sort, USER_SORT_COLUMNS, 'id')
+    names = field_names(UserSummarySchema if summary else UserSchema, fields, USER_COLUMNS)
+    query = user_rows_query(names, sort_column, **filters)
+    if not summary and (fields is None or 'posts' in fields):
+        rows = iter_keyset(query, sort_column, User.id, batch_size, descending)
+        return iter_dicts(rows, names, batch_size, nested_posts=True)
+    rows = query.order_by(*order_by(sort_column, User.id, descending)).yield_per(batch_size)
+    return iter_dicts(rows, names, batch_size)
+
+
 def create_user(data: dict) -> str:
     """
     The create_user function takes a dictionary data containing user information,
     creates a new user and saves it in the database.
-    It checks if the email or username already exist in the database. If either of them exists,
-    it returns an error message. If not, it creates a new user and saves it in the database.
+    Uniqueness of the email and username is enforced by the database: the insert is
+    attempted directly and a violated unique constraint is reported as an error message,
+    which also holds for concurrent registrations of the same username.
     Returns a string message indicating if the user was created successfully or not.
 
     :param data: A dictionary containing user information such as username, email, password.
@@ -34,15 +258,16 @@ def create_user(data: dict) -> str:
     If the user was created successfully, the message will be "Success".
     Otherwise, the message will contain an error message indicating what went wrong.
     """
-    email_exist = User.query.filter_by(email=data.get('email')).first()
-    username_exist = User.query.filter_by(username=data.get('username')).first()
-    if email_exist or username_exist:
-        return 'Error. Username or email is already exist'
+    if not all(data.get(field) for field in USER_FIELDS):
+        return 'Error. Missing required fields'
 
-    with db.session() as session:
-        new_user = User(**data)
-        session.add(new_user)
-        session.commit()
+    try:
+        with db.session() as session:
+            new_user = User(**data)
+            session.add(new_user)
+            session.commit()
+    except sqlalchemy.exc.IntegrityError:
+        return 'Error. Username or email is already exist'
     return 'Success'
 
 
@@ -50,6 +275,8 @@ def get_user(user_id: str) -> dict:  # pylint: disable=E1131
     """
     This function takes an integer user_id as input and returns a dictionary of user data associated
     with the given user id. If the user id is not found in the database, the function returns None.
+    Cache misses read the primary: the cache is shared by every client, a lagging replica
+    would fill it with the previous version of the user.
 
     :param user_id: user_id (str): User id for the user to be retrieved from the database.
     :return:  user_dict (dict): A dictionary of user data associated with the given user id.
@@ -58,12 +285,26 @@ def get_user(user_id: str) -> dict:  # pylint: disable=E1131
     """
     try:
         int_id = int(user_id)
-        user = User.query.filter_by(id=int_id).first()
+        key = user_cache_keys(user_id=int_id)[0]
     except ValueError:
-        user = User.query.filter_by(email=user_id).first()
+        int_id = None
+        key = user_cache_keys(email=user_id)[1]
+
+    with span('cache'):
+        user_dict = cache.get(key)
+    if user_dict is not None:
+        return user_dict
+
+    with span('db'):
+        if int_id is not None:
+            user = users_query().filter_by(id=int_id).first()
+        else:
+            user = users_query().filter_by(email=user_id).first()
 
     if user:
-        user_dict = user_schema.dump(user)
+        with span('serialize'):
+            user_dict = user_schema.dump(user)
+        cache.set_many(dict.fromkeys(user_cache_keys(user.id, user.email), user_dict))
         return user_dict
     return None
 
@@ -87,25 +328,38 @@ def update_user(data: dict) -> str:
         user = User.query.filter_by(email=data.get('email')).first()
     # user = User.query.filter_by(id=data.get('id')).first()
     if user:
+        old_email = user.email
         user.first_name = data.get('first_name') or user.first_name
         user.last_name = data.get('last_name') or user.last_name
         user.username = data.get('username') or user.username
         user.email = data.get('email') or user.email
         user.location = data.get('location') or user.location
-        db.session.commit()
+        try:
+            db.session.commit()
+        except sqlalchemy.exc.IntegrityError:
+            db.session.rollback()
+            return 'Error. Username or email is already exist'
+        cache.delete_many(*user_cache_keys(user.id, old_email),
+                          user_cache_keys(email=user.email)[1])
+        invalidate_authored_posts([user.id])
         return 'Success'
     return 'Error. No such user record in the db'
 
 
 def delete_user(user_id: int) -> str:
     """
-    Delete a user record from the database.
+    Delete a user record from the database, together with its posts.
+    The posts are deleted by the database (ON DELETE CASCADE) within the DELETE of the user.
+    A user with more than USER_PURGE_THRESHOLD posts is deleted by the background purge of
+    `service.purge` instead, see `purge_user`, so the cache keys of the posts are read from
+    at most that many rows.
 
     :param user_id:
         user_id (int): The ID of the user to be deleted.
 
     :return:
-        str: A string indicating whether the operation was successful or not.
+        str: 'Success', 'Scheduled' if the user is deleted in the background, or an error
+        message.
     """
     try:
         int_id = int(user_id)
@@ -114,28 +368,177 @@ def delete_user(user_id: int) -> str:
         user = User.query.filter_by(email=user_id).first()
 
     if user:
+        threshold = current_app.config['USER_PURGE_THRESHOLD']
+        if threshold and db.session.query(Post.id).filter(Post.author_id == user.id) \
+                .offset(threshold).first() is not None:
+            purge_queue.submit(('user', user.id), purge_user, user.id,
+                               current_app.config['USER_PURGE_CHUNK_SIZE'])
+            return 'Scheduled'
+        # The keys of the posts are read before the cascade deletes them, and dropped
+        # once the commit made the deletion visible to the readers which would refill them.
+        keys = (*user_cache_keys(user.id, user.email), *authored_post_keys([user.id]))
         with db.session() as session:
             session.delete(user)
             session.commit()
+        cache.delete_many(*keys)
+        post_index.invalidate()
         return 'Success'
     return 'No such user record in the db'
 
 
+def purge_user(user_id: int, chunk_size: int) -> None:
+    """
+    Deletes the posts of a user `chunk_size` at a time, each chunk in its own transaction,
+    then the user and the posts written meanwhile. Run in the background by `delete_user`.
+
+    :param user_id: The ID of the user to be deleted.
+    :param chunk_size: The number of posts deleted per transaction.
+    """
+    while True:
+        rows = db.session.query(Post.id, Post.title).filter(Post.author_id == user_id) \
+            .order_by(Post.id).limit(chunk_size).all()
+        if not rows:
+            break
+        db.session.execute(sqlalchemy.delete(Post).where(Post.id.in_([row.id for row in rows])))
+        db.session.commit()
+        for post_id, title in rows:
+            cache.delete_many(*post_cache_keys(post_id, title))
+        invalidate_authors([user_id])
+    user = db.session.get(User, user_id)
+    if user:
+        keys = (*user_cache_keys(user.id, user.email), *authored_post_keys([user.id]))
+        db.session.delete(user)
+        db.session.commit()
+        cache.delete_many(*keys)
+    post_index.invalidate()
+
+
 # ==================== Posts ====================
-def get_posts() -> list:
+@reads_from_replica
+def get_posts(**filters) -> list:
     """
-    The get_posts() function retrieves all posts from the database and returns them
-    as a list of dictionaries.
+    The get_posts() function retrieves all matching posts from the database and returns them
+    as a list of dictionaries, ordered by creation date.
+
+    :param filters: `author_id` / `created_from` / `created_to` keyword arguments
+        of `build_posts_query`.
 
     :return:
         A list of dictionaries, where each dictionary represents a post in the database.
         Each post dictionary includes keys for id, title, content, and created_at.
     """
-    posts = Post.query.all()
+    posts = build_posts_query(**filters).order_by(Post.created_at, Post.id).all()
     posts_list = posts_schema.dump(posts)
     return posts_list
 
 
+@reads_from_replica
+def get_posts_page(limit: int, cursor: str = None, sort: str = None,  # pylint: disable=R0913
+                   fields: tuple = None, versioned: bool = False, **filters) -> tuple:
+    """
+    Retrieves one page of posts.
+
+    :param limit: The maximum number of posts to return.
+    :param cursor: The cursor returned with the previous page, or None for the first page.
+    :param sort: A field of POST_SORT_COLUMNS, prefixed with '-' for descending order.
+        Creation date by default.
+    :param fields: The field names to return, or None for every field.
+    :param versioned: Also return the `posts_etag` of the listing, selected by the page query.
+    :param filters: `author_id` / `created_from` / `created_to` keyword arguments
+        of `post_rows_query`.
+
+    :raise ValueError: If the cursor or the sort field is invalid.
+
+    :return:
+        tuple: (posts_list, next_cursor, etag), where next_cursor is None on the last page
+        and etag is None unless `versioned`.
+    """
+    sort_column, descending = parse_sort(sort, POST_SORT_COLUMNS, 'created_at')
+    names = field_names(PostSchema, fields, POST_COLUMNS)
+    query = post_rows_query(names, sort_column, **filters)
+    if versioned:
+        query = _with_versions(query, _posts_versions(**filters))
+    with span('db'):
+        rows, next_cursor = keyset_page(query, sort_column, Post.id, limit, cursor, descending)
+    with span('serialize'):
+        posts = dump_rows(names, rows)
+    etag = None
+    if versioned:
+        etag = version_tag('posts', *rows[0][-4:]) if rows else posts_etag(**filters)
+    return posts, next_cursor, etag
+
+
+def iter_posts(sort: str = None, fields: tuple = None,
+               batch_size: int = STREAM_BATCH_SIZE, **filters):
+    """
+    Yields every matching post as a dictionary, reading the table in batches through a
+    server-side cursor so that memory use does not depend on the table size.
+    The arguments are validated when the function is called, the query runs on iteration.
+
+    :param sort: A field of POST_SORT_COLUMNS, prefixed with '-' for descending order.
+    :param fields: The field names to return, or None for every field.
+    :param batch_size: The number of rows fetched from the cursor at a time.
+    :param filters: `author_id` / `created_from` / `created_to` keyword arguments
+        of `post_rows_query`.
+
+    :raise ValueError: If the sort field is invalid.
+
+    :return:
+        generator of dict: The serialized posts.
+    """
+    sort_column, descending = parse_sort(sort, POST_SORT_COLUMNS, 'id')
+    names = field_names(PostSchema, fields, POST_COLUMNS)
+    query = post_rows_query(names, sort_column, **filters)
+    query = query.order_by(*order_by(sort_column, Post.id, descending)).yield_per(batch_size)
+    return iter_dicts(query, names, batch_size)
+
+
+def search_posts(query: str, limit: int, page: int = 1) -> tuple:
+    """
+    Finds the posts whose title or description contain the words of `query`,
+    best match first.
+
+    MySQL ranks the posts with MATCH ... AGAINST over the FULLTEXT index on
+    (title, description). Other databases use the in-process BM25 index of
+    `service.search`, which is built from the posts table on the first search.
+
+    :param query: The words to search for.
+    :param limit: The maximum number of posts to return.
+    :param page: The 1-based page number.
+
+    :return:
+        tuple: (posts_list, next_page), where next_page is None on the last page.
+        Every post carries its relevance 'score'.
+    """
+    offset = (page - 1) * limit
+    if db.engine.dialect.name == 'mysql':
+        score = mysql.match(Post.title, Post.description, against=query) \
+            .in_natural_language_mode().label('score')
+        with span('db'):
+            rows = (post_rows_query(POST_NAMES, Post.id).add_columns(score).filter(score > 0)
+                    .order_by(score.desc(), Post.id)
+                    .offset(offset).limit(limit + 1).all())
+        rows = [(row, row.score) for row in rows]
+    else:
+        with span('search'):
+            if not post_index.built:
+                post_index.build(db.session.query(Post.id, Post.title, Post.description)
+                                 .yield_per(STREAM_BATCH_SIZE))
+            ranked = post_index.search(query, limit + 1, offset)
+        with span('db'):
+            posts = {row.id: row for row in post_rows_query(POST_NAMES, Post.id)
+                     .filter(Post.id.in_([post_id for post_id, _ in ranked]))}
+        rows = [(posts[post_id], score) for post_id, score in ranked if post_id in posts]
+
+    items = []
+    with span('serialize'):
+        for row, score in rows[:limit]:
+            item = dict(zip(POST_NAMES, row))
+            item['score'] = round(float(score), 4)
+            items.append(item)
+    return items, page + 1 if len(rows) > limit else None
+
+
 def create_post(data: dict) -> str:
     """
     Creates a new post with the provided data and saves it to the database.
@@ -152,6 +555,9 @@ def create_post(data: dict) -> str:
             new_post = Post(**data)
             session.add(new_post)
             session.commit()
+            if post_index.built:
+                post_index.add(new_post.id, new_post.title, new_post.description)
+        invalidate_authors([data.get('author_id')])
         return 'Success'
     except sqlalchemy.exc.OperationalError:
         return 'Error.'
@@ -160,6 +566,7 @@ def create_post(data: dict) -> str:
 def get_post(post_id: int) -> dict:  # pylint: disable=E1131
     """
     Retrieves the post with the specified ID from the database.
+    Cache misses read the primary, like those of `get_user`.
 
     :param post_id:
         post_id (int): The ID of the post to retrieve.
@@ -170,12 +577,26 @@ def get_post(post_id: int) -> dict:  # pylint: disable=E1131
     """
     try:
         int_id = int(post_id)
-        post = Post.query.filter_by(id=int_id).first()
+        key = post_cache_keys(post_id=int_id)[0]
     except ValueError:
-        post = Post.query.filter_by(title=post_id).first()
+        int_id = None
+        key = post_cache_keys(title=post_id)[1]
+
+    with span('cache'):
+        post_dict = cache.get(key)
+    if post_dict is not None:
+        return post_dict
+
+    with span('db'):
+        if int_id is not None:
+            post = posts_query().filter_by(id=int_id).first()
+        else:
+            post = posts_query().filter_by(title=post_id).first()
 
     if post:
-        post_dict = post_schema.dump(post)
+        with span('serialize'):
+            post_dict = post_schema.dump(post)
+        cache.set_many({key: post_dict, post_cache_keys(post_id=post.id)[0]: post_dict})
         return post_dict
     return None
 
@@ -195,13 +616,18 @@ def update_post(data: dict) -> str:
     if int_id:
         post = Post.query.filter_by(id=int(int_id)).first()
     else:
-        print('here')
         post = Post.query.filter_by(title=data.get('title')).first()
 
     if post:
+        old_title = post.title
         post.title = data.get('title') or post.title
         post.description = data.get('description') or post.description
         db.session.commit()
+        cache.delete_many(*post_cache_keys(post.id, old_title),
+                          post_cache_keys(title=post.title)[1])
+        invalidate_authors([post.author_id])
+        if post_index.built:
+            post_index.add(post.id, post.title, post.description)
         return 'Success'
     return 'Error. No such post record in the db'
 
@@ -223,8 +649,196 @@ def delete_post(post_id: int) -> str:
         post = Post.query.filter_by(title=post_id).first()
 
     if post:
+        keys = post_cache_keys(post.id, post.title)
+        author_id, int_id = post.author_id, post.id
         with db.session() as session:
             session.delete(post)
             session.commit()
+        cache.delete_many(*keys)
+        invalidate_authors([author_id])
+        post_index.remove(int_id)
         return 'Success'
     return 'Error. No such post record in the db'
+
+
+# ==================== Authors ====================
+@reads_from_replica
+def get_author_choices(limit: int):
+    """
+    Retrieves the id and the name of every user, for the author field of the post forms.
+    The list is kept by the process until the data version of `service.fragments` changes,
+    that is until the next write.
+
+    :param limit: The largest number of users listed.
+
+    :return:
+        list | None: Dictionaries with the keys of AUTHOR_NAMES ordered by name, or None
+        if there are more than `limit` users, which the forms then look up with
+        `search_authors`.
+    """
+    key = (data_version(), limit)
+    cached = _author_choices.get(key)
+    if cached is not None:
+        return cached[0]
+    # The primary key walk stops at limit + 1 rows, the few rows left are sorted here.
+    with span('db'):
+        rows = db.session.query(*AUTHOR_COLUMNS).order_by(User.id).limit(limit + 1).all()
+    authors = None
+    if len(rows) <= limit:
+        authors = dump_rows(AUTHOR_NAMES, sorted(rows, key=lambda row: (row[1], row[2])))
+    _author_choices.clear()
+    _author_choices[key] = (authors,)
+    return authors
+
+
+@reads_from_replica
+def search_authors(prefix: str, limit: int) -> list:
+    """
+    Finds the users whose first name, last name or username starts with `prefix`,
+    or whose id is `prefix`.
+
+    :param prefix: The beginning of the name typed by the client.
+    :param limit: The maximum number of users to return.
+
+    :return:
+        list: Dictionaries with the keys of AUTHOR_NAMES, in the order of the ids,
+        so the scan of the primary key stops at the `limit`-th match.
+    """
+    condition = sqlalchemy.or_(*(column.startswith(prefix, autoescape=True) for column in
+                                 (User.first_name, User.last_name, User.username)))
+    if prefix.isdigit():
+        condition = sqlalchemy.or_(condition, User.id == int(prefix))
+    with span('db'):
+        rows = db.session.query(*AUTHOR_COLUMNS).filter(condition) \
+            .order_by(User.id).limit(limit).all()
+    return dump_rows(AUTHOR_NAMES, rows)
+
+
+# ==================== Versions ====================
+def version_tag(*values) -> str:
+    """Return an opaque ETag derived from the version `values` of a resource."""
+    return hashlib.blake2b(repr(values).encode(), digest_size=12).hexdigest()
+
+
+def _table_version(model):
+    """Return the (row count, last change) aggregate query of `model`."""
+    # pylint: disable=not-callable
+    return db.session.query(func.count(model.id).label('count'),
+                            func.max(model.updated_at).label('updated_at'))
+
+
+def _with_versions(query, version_queries):
+    """
+    Cross joins single-row aggregate queries to `query`, whose rows then end with their columns.
+    The listing and its version are read by one statement, from one snapshot.
+    """
+    versions = _probe_query(*version_queries).subquery('versions')
+    return query.join(versions, sqlalchemy.true()).add_columns(*versions.c)
+
+
+def _users_versions(created_from=None, created_to=None) -> tuple:
+    """Return the aggregate queries of the version of the user listings."""
+    return filter_users(_table_version(User), created_from, created_to), _table_version(Post)
+
+
+def _posts_versions(author_id=None, created_from=None, created_to=None) -> tuple:
+    """Return the aggregate queries of the version of the post listings."""
+    posts = filter_posts(_table_version(Post), author_id, created_from, created_to)
+    return posts, _table_version(User)
+
+
+def _probe_query(*queries):
+    """Return the query selecting all the columns of single-row aggregate queries at once."""
+    subqueries = [query.subquery(f'version_{i}') for i, query in enumerate(queries)]
+    probe = db.session.query(*(column.label(f'{subquery.name}_{column.key}')
+                               for subquery in subqueries for column in subquery.c))
+    probe = probe.select_from(subqueries[0])
+    for subquery in subqueries[1:]:
+        probe = probe.join(subquery, sqlalchemy.true())
+    return probe
+
+
+def _probe(*queries) -> tuple:
+    """Run single-row aggregate queries as one statement and return all their columns."""
+    return tuple(_probe_query(*queries).one())
+
+
+@reads_from_replica
+def users_etag(created_from=None, created_to=None) -> str:
+    """
+    Returns the version of the user listings: the count and the last change of the matching
+    users, and of all posts, which the listings embed or count.
+    Collections have no Last-Modified date, since deleting a row does not advance the
+    last change.
+
+    :param created_from: Only users registered at or after this datetime.
+    :param created_to: Only users registered at or before this datetime.
+
+    :return:
+        str: The ETag.
+    """
+    return version_tag('users', *_probe(*_users_versions(created_from, created_to)))
+
+
+@reads_from_replica
+def posts_etag(author_id=None, created_from=None, created_to=None) -> str:
+    """
+    Returns the version of the post listings: the count and the last change of the matching
+    posts, and of all users, whose names the listings embed.
+
+    :param author_id: Only posts of this user.
+    :param created_from: Only posts created at or after this datetime.
+    :param created_to: Only posts created at or before this datetime.
+
+    :return:
+        str: The ETag.
+    """
+    return version_tag('posts', *_probe(*_posts_versions(author_id, created_from, created_to)))
+
+
+@reads_from_replica
+def user_version(user_id: str) -> tuple:
+    """
+    Returns the version of the user `get_user` returns, from one indexed query.
+    The user has no Last-Modified date: it embeds its posts, and deleting one does not
+    advance their last change, only the post count of the ETag.
+
+    :param user_id: The user id, or the email of the user.
+
+    :return:
+        tuple | None: (etag, None), or None if there is no such user.
+    """
+    # pylint: disable=not-callable
+    query = db.session.query(User.updated_at, func.count(Post.id), func.max(Post.updated_at)) \
+        .outerjoin(Post, Post.author_id == User.id).group_by(User.id, User.updated_at)
+    try:
+        query = query.filter(User.id == int(user_id))
+    except ValueError:
+        query = query.filter(User.email == user_id)
+    row = query.first()
+    if row is None:
+        return None
+    return version_tag('user', *row), None
+
+
+@reads_from_replica
+def post_version(post_id: str) -> tuple:
+    """
+    Returns the version of the post `get_post` returns, from one indexed query.
+
+    :param post_id: The post id, or the title of the post.
+
+    :return:
+        tuple | None: (etag, last_modified), or None if there is no such post.
+    """
+    query = db.session.query(Post.updated_at, User.updated_at) \
+        .outerjoin(User, Post.author_id == User.id)
+    try:
+        query = query.filter(Post.id == int(post_id))
+    except ValueError:
+        query = query.filter(Post.title == post_id)
+    row = query.first()
+    if row is None:
+        return None
+    updated_at, author_updated_at = row
+    return version_tag('post', *row), max(updated_at, author_updated_at or updated_at)
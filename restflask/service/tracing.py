@@ -0,0 +1,110 @@
+"""Opt-in per-request tracing
+
+A request is traced when the TRACING config is set, or when it carries the
+`X-Trace: 1` header and TRACING_HEADER is set. Code wraps its phases in
+`span(name)`. At the end of a traced request, one JSON record with the span
+timings is logged to the 'restflask.trace' logger, and the trace id is returned
+in the `X-Trace-Id` response header.
+
+Untraced requests and code running outside of a request get a shared no-op
+context manager from `span`, so instrumented code costs one lookup.
+"""
+import json
+import logging
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+
+from flask import current_app, g, has_request_context, request
+
+TRACE_HEADER = 'X-Trace'
+TRACE_ID_HEADER = 'X-Trace-Id'
+
+logger = logging.getLogger('restflask.trace')
+
+_DISABLED = nullcontext()
+
+
+class Trace:
+    """
+    The spans recorded during one request.
+
+    Attributes:
+        trace_id (str): Random id, returned in the X-Trace-Id response header.
+        spans (list of tuple): (name, start, duration) in seconds, start relative
+            to the beginning of the request, in the order the spans ended.
+    """
+
+    def __init__(self):
+        self.trace_id = uuid.uuid4().hex
+        self.start = time.perf_counter()
+        self.spans = []
+
+    @contextmanager
+    def span(self, name: str):
+        """Time the `with` block as span `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append((name, start - self.start, time.perf_counter() - start))
+
+    def to_dict(self) -> dict:
+        """Return the trace as a JSON serializable dict, times in milliseconds."""
+        return {
+            'trace_id': self.trace_id,
+            'duration_ms': round((time.perf_counter() - self.start) * 1000, 3),
+            'spans': [{'name': name, 'start_ms': round(start * 1000, 3),
+                       'duration_ms': round(duration * 1000, 3)}
+                      for name, start, duration in self.spans],
+        }
+
+
+def current_trace():
+    """Return the `Trace` of the current request, or None if it is not traced."""
+    return g.get('trace') if has_request_context() else None
+
+
+def span(name: str):
+    """
+    Times a phase of the current request.
+
+        with span('db'):
+            rows = query.all()
+
+    :param name: The span name, e.g. 'db', 'serialize' or 'json'.
+
+    :return:
+        A context manager, which does nothing if the request is not traced.
+    """
+    trace = current_trace()
+    return _DISABLED if trace is None else trace.span(name)
+
+
+def _start_trace():
+    """`before_request` hook starting the trace of requests which ask for one."""
+    config = current_app.config
+    if config['TRACING'] or (config['TRACING_HEADER']
+                             and request.headers.get(TRACE_HEADER) in ('1', 'true')):
+        g.trace = Trace()
+
+
+def _finish_trace(response):
+    """`after_request` hook logging the trace and returning its id."""
+    trace = current_trace()
+    if trace is not None:
+        if logger.isEnabledFor(logging.INFO):
+            record = trace.to_dict()
+            record.update(method=request.method, path=request.full_path.rstrip('?'),
+                          status=response.status_code)
+            logger.info('%s', json.dumps(record))
+        response.headers[TRACE_ID_HEADER] = trace.trace_id
+    return response
+
+
+def init_tracing(app):
+    """Register the tracing hooks on `app`."""
+    app.config.setdefault('TRACING', False)
+    app.config.setdefault('TRACING_HEADER', False)
+    app.before_request(_start_trace)
+    app.after_request(_finish_trace)
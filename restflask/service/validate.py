@@ -15,3 +15,67 @@ def date_format(date_to_convert):
     format_date = datetime.strptime(date_to_convert, '%Y-%m-%dT%H:%M:%S')
     format_date = format_date.strftime("%Y-%m-%d")
     return format_date
+
+
+def parse_datetime(value):
+    """
+    Converts an ISO 8601 date or datetime query parameter into a datetime.
+
+    :param value:
+        value (str): A string like '2023-03-09' or '2023-03-09T20:30:34', or None.
+
+    :raise ValueError: If the string is not a valid ISO date.
+
+    :return:
+        datetime | None: The parsed value, or None if `value` is empty.
+    """
+    if not value:
+        return None
+    return datetime.fromisoformat(value)
+
+
+def parse_fields(value, allowed: tuple):
+    """
+    Converts a `fields=` query parameter into a tuple of field names.
+
+    :param value:
+        value (str): A comma separated list of field names, or None.
+    :param allowed:
+        allowed (tuple): The field names the client may select.
+
+    :raise ValueError: If an unknown field is requested.
+
+    :return:
+        tuple | None: The selected fields, or None to select every field.
+    """
+    if not value:
+        return None
+    fields = tuple(dict.fromkeys(field.strip() for field in value.split(',') if field.strip()))
+    unknown = set(fields) - set(allowed)
+    if unknown:
+        raise ValueError(f'Unknown fields: {", ".join(sorted(unknown))}')
+    return fields
+
+
+def parse_sort(value, columns: dict, default: str) -> tuple:
+    """
+    Converts a `sort=` query parameter like 'created_at' or '-created_at' into a column.
+
+    :param value:
+        value (str): The field name, prefixed with '-' for descending order, or None.
+    :param columns:
+        columns (dict): The sortable field names mapped to their columns.
+    :param default:
+        default (str): The sort used when `value` is empty.
+
+    :raise ValueError: If the field is not sortable.
+
+    :return:
+        tuple: (column, descending)
+    """
+    value = value or default
+    descending = value.startswith('-')
+    name = value.lstrip('-')
+    if name not in columns:
+        raise ValueError(f'Cannot sort by {name}')
+    return columns[name], descending
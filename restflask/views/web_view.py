@@ -1,38 +1,86 @@
 """WEB controllers"""
-from datetime import datetime
-from flask import render_template, redirect, request, flash
-
-from ..config import app
-
-from ..models.model import User, Post
-
-from ..service.validate import date_format
-from ..service.services import get_user, get_users, get_post, get_posts
+from flask import Blueprint, current_app, render_template, redirect, request, flash, url_for
+from markupsafe import Markup
+
+from ..service.fragments import cached_fragment
+from ..service.pagination import parse_limit
+from ..service.validate import date_format, parse_datetime
+from ..service.services import get_user, get_post, get_author_choices
+from ..service.services import get_users_page, get_posts_page
 from ..service.services import create_user, create_post
 from ..service.services import update_user, update_post
 from ..service.services import delete_user, delete_post
 
+web = Blueprint('web', __name__)
+
+# Columns of the post list.
+POST_LIST_FIELDS = ('id', 'title', 'description', 'created_at', 'author_id', 'author_username')
+POST_FILTER_FIELDS = ('date_from', 'date_to', 'author_id')
+
+
+def author_choices():
+    """
+    Returns the users listed by the author field of the post forms.
+
+    :return:
+        list | None: The users ordered by name, or None above AUTHOR_SELECT_LIMIT users,
+        in which case the field suggests authors from /api/authors/ as the user types.
+    """
+    return get_author_choices(current_app.config['AUTHOR_SELECT_LIMIT'])
+
+
+def page_size() -> int:
+    """
+    Reads the page size of a web list from the `limit` parameter.
+
+    :raise ValueError: If the value is not an integer.
+
+    :return:
+        int: WEB_PAGE_SIZE by default, at most WEB_MAX_PAGE_SIZE.
+    """
+    return parse_limit(request.values.get('limit'), current_app.config['WEB_PAGE_SIZE'],
+                       current_app.config['WEB_MAX_PAGE_SIZE'])
+
 
 # ==================== Users ====================
-@app.route('/')
-@app.route('/users/')
+def render_users_table(limit: int, cursor: str = None) -> str:
+    """
+    Renders one page of the user table with its pagination links.
+
+    :param limit: The number of users of the page.
+    :param cursor: The cursor of the page, or None for the first page.
+
+    :raise ValueError: If the cursor is invalid.
+
+    :return:
+        str: The HTML of the table.
+    """
+    data, next_cursor, _ = get_users_page(limit, cursor, summary=True)
+    return render_template("user_table.html", data=data, limit=limit, cursor=cursor,
+                           next_cursor=next_cursor)
+
+
+@web.route('/')
+@web.route('/users/')
 def view_users():
     """
-    Displays a list of users on the webpage, including the number of posts they have
-    and their registration date.
+    Displays one page of users on the webpage, including the number of posts they have
+    and their registration date. The rendered table is cached until the next write.
 
     :return:
         rendered template: the list of users and their details.
     """
-    data = get_users()
-    for item in data:
-        item['num_post'] = len(item['posts'])
-        item['registered_at'] = date_format(item['registered_at'])
-    app.logger.debug("GET. list of users")
-    return render_template("user_list.html", data=data)
+    try:
+        params = {'limit': page_size(), 'cursor': request.args.get('cursor')}
+        table = cached_fragment('users', params, lambda: render_users_table(**params))
+    except ValueError as exc:
+        flash(f'Error. {exc}', category='error')
+        return redirect(url_for('web.view_users'))
+    current_app.logger.debug("GET. list of users, cursor = %s", params['cursor'])
+    return render_template("user_list.html", table=Markup(table))
 
 
-@app.route('/new_user/', methods=['GET', 'POST'])
+@web.route('/new_user/', methods=['GET', 'POST'])
 def view_new_user():
     """
     Renders a template for creating a new user, and processes the form data if submitted.
@@ -49,17 +97,17 @@ def view_new_user():
             'location': request.form.get('location')
         }
         feedback = create_user(data)
-        app.logger.debug(f'POST. email = {data.get("email")}. {feedback}')
+        current_app.logger.debug('POST. email = %s. %s', data.get('email'), feedback)
         if feedback == 'success':
             flash('New user record created!', category='message')
         else:
             flash(feedback, category='error')
         return redirect("/")
-    app.logger.debug("GET. Rendering new_user.html")
+    current_app.logger.debug("GET. Rendering new_user.html")
     return render_template("new_user.html")
 
 
-@app.route('/users/<int:id>/', methods=['GET'])
+@web.route('/users/<int:id>/', methods=['GET'])
 def view_get_user(id: int):  # pylint: disable=C0103,W0622
     """
     Displays the details of a specific user, including the number of posts they have and
@@ -75,11 +123,11 @@ def view_get_user(id: int):  # pylint: disable=C0103,W0622
     user = get_user(user_id)
     user['num_post'] = len(user['posts'])
     user['registered_at'] = date_format(user['registered_at'])
-    app.logger.debug(f"GET USER. id = {user_id}")
+    current_app.logger.debug('GET USER. id = %s', user_id)
     return render_template("user.html", data=user)
 
 
-@app.route('/edit_user/<int:id>/', methods=['GET', 'POST'])
+@web.route('/edit_user/<int:id>/', methods=['GET', 'POST'])
 def view_edit_user(id: int):  # pylint: disable=C0103,W0622,R1710
     """
     View function for editing a user record.
@@ -102,17 +150,17 @@ def view_edit_user(id: int):  # pylint: disable=C0103,W0622,R1710
             'location': request.form.get('location')
         }
         feedback = update_user(data)
-        app.logger.debug(f"POST. EDIT USER {data.get('email')}: {feedback}")
+        current_app.logger.debug('POST. EDIT USER %s: %s', data.get('email'), feedback)
         if feedback == 'Success':
             flash('User record updated!', category='message')
             return redirect('/')
     else:
         user = get_user(id)
-        app.logger.debug(f"GET. EDIT USER. id = {id}")
+        current_app.logger.debug('GET. EDIT USER. id = %s', id)
         return render_template("edit_user.html", data=user)
 
 
-@app.route('/delete_user/<int:id>/', methods=['GET'])
+@web.route('/delete_user/<int:id>/', methods=['GET'])
 def view_delete_user(id: int):  # pylint: disable=C0103,W0622
     """
     View function for deleting a user record.
@@ -126,59 +174,76 @@ def view_delete_user(id: int):  # pylint: disable=C0103,W0622
     """
     feedback = delete_user(id)
     if feedback == 'Success':
-        app.logger.debug("GET. DELETING USER. flash SUCCESS MESSAGE ")
+        current_app.logger.debug("GET. DELETING USER. flash SUCCESS MESSAGE ")
         flash('User record deleted!',  category='message')
+    elif feedback == 'Scheduled':
+        current_app.logger.debug("GET. DELETING USER. flash SCHEDULED MESSAGE ")
+        flash('User record and posts are being deleted', category='message')
     else:
-        app.logger.debug("GET. DELETING USER. flash ERROR MESSAGE ")
+        current_app.logger.debug("GET. DELETING USER. flash ERROR MESSAGE ")
         flash(feedback, category='error')
     return redirect("/")
 
 
 # ==================== Posts ====================
-@app.route('/posts/', methods=['GET', 'POST'])
+def render_posts_table(limit: int, cursor: str = None, query: dict = None,
+                       **filters) -> str:
+    """
+    Renders one page of the post table with its pagination links.
+
+    :param limit: The number of posts of the page.
+    :param cursor: The cursor of the page, or None for the first page.
+    :param query: The filter parameters of the request, repeated in the pagination links.
+    :param filters: `author_id` / `created_from` / `created_to` keyword arguments
+        of `get_posts_page`.
+
+    :raise ValueError: If the cursor is invalid.
+
+    :return:
+        str: The HTML of the table.
+    """
+    posts, next_cursor, _ = get_posts_page(limit, cursor, fields=POST_LIST_FIELDS, **filters)
+    return render_template("post_table.html", posts=posts, limit=limit, cursor=cursor,
+                           next_cursor=next_cursor, query=query or {})
+
+
+@web.route('/posts/', methods=['GET', 'POST'])
 def view_posts():
     """
-    Renders a list of posts filtered by a date range and author ID, or all posts
-    if no filter is applied. GET requests render the default list of all posts,
-    and POST requests filter by the provided form data.
+    Renders one page of posts filtered by a date range and author ID, or of all posts
+    if no filter is applied. Filters come from the form of POST requests and from the
+    query string of the pagination links. Filtering runs in the same service query
+    builder as the /api/posts/ filters. The rendered table is cached until the next write.
 
     :return:
-        rendered template: "post_list.html" template with a list of post records
+        rendered template: "post_list.html" template with a page of post records
         and associated user details.
     """
-    users = get_users()
-    if request.method == "POST":
-        form = {
-            'date_from': datetime.strptime(request.form.get('date_from'), '%Y-%m-%d')
-                         or "0001-01-01",
-            'date_to': datetime.strptime(request.form.get('date_to'), '%Y-%m-%d')
-                       or "9999-12-31",
-            'author_id': request.form.get('author_id')
+    query = {name: request.values[name] for name in POST_FILTER_FIELDS
+             if request.values.get(name)}
+    try:
+        filters = {
+            'created_from': parse_datetime(query.get('date_from')),
+            'created_to': parse_datetime(query.get('date_to')),
+            'author_id': query.get('author_id')
         }
-        posts = Post.query.filter(Post.created_at >= form['date_from'],
-                                  Post.created_at <= form['date_to'],
-                                  Post.author_id == form['author_id']).all()
-        for post in posts:
-            post.created_at = post.created_at.strftime("%Y-%m-%d")
-        app.logger.debug(
-            f"""Filtered list of Posts:
-                date_from = {form.get('date_from')}, 
-                date_to = {form.get('date_to')},
-                author_id = {form.get('author_id')}""")
-    else:
-        posts = get_posts()
-        for post in posts:
-            post['created_at'] = date_format(post['created_at'])
-            if post['user'] and post['author_id']:
-                post['user'] = post['user'].username
-            else:
-                post['user'] = '0'
-                post['author_id'] = '0'
-        app.logger.debug("GET. List of posts")
-    return render_template("post_list.html", posts=posts, users=users)
-
-
-@app.route('/new_post/', methods=['GET', 'POST'])
+    except ValueError:
+        flash('Error. Invalid date', category='error')
+        query, filters = {}, {}
+    current_app.logger.debug(
+        'List of Posts: date_from = %s, date_to = %s, author_id = %s',
+        query.get('date_from'), query.get('date_to'), query.get('author_id'))
+    try:
+        params = {'limit': page_size(), 'cursor': request.values.get('cursor')}
+        table = cached_fragment('posts', {**params, **query},
+                                lambda: render_posts_table(**params, query=query, **filters))
+    except ValueError as exc:
+        flash(f'Error. {exc}', category='error')
+        return redirect(url_for('web.view_posts'))
+    return render_template("post_list.html", table=Markup(table), authors=author_choices())
+
+
+@web.route('/new_post/', methods=['GET', 'POST'])
 def view_new_post():
     """
     View function that handles requests to create a new post. If the request
@@ -199,19 +264,18 @@ def view_new_post():
             'author_id': request.form.get('author_id')
         }
         feedback = create_post(data)
-        app.logger.debug(f'POST. NEW POST {feedback}')
+        current_app.logger.debug('POST. NEW POST %s', feedback)
         if feedback == 'success':
             flash('New post record created!', category='message')
         else:
             flash(feedback, category='error')
         return redirect("/posts/")
     else:
-        data = User.query.all()
-        app.logger.debug(f'GET NEW POST. USER id ={request.form.get("author_id")}')
-        return render_template("new_post.html", data=data)
+        current_app.logger.debug('GET NEW POST. USER id = %s', request.form.get('author_id'))
+        return render_template("new_post.html", authors=author_choices())
 
 
-@app.route('/posts/<int:id>/', methods=['GET'])
+@web.route('/posts/<int:id>/', methods=['GET'])
 def view_get_posts(id: int):   # pylint: disable=C0103,W0622
     """
     Renders a view to display a single post identified by the given ID.
@@ -229,23 +293,18 @@ def view_get_posts(id: int):   # pylint: disable=C0103,W0622
             'id': post['id'],
             'title': post['title'],
             'description': post['description'],
-            'created_at': date_format(post['created_at'])
+            'created_at': date_format(post['created_at']),
+            'author_id': post['author_id'] or '0',
+            'author_name': post['author_name'],
         }
-        if post['user'] and post['author_id']:
-            data['first_name'] = post['user'].first_name
-            data['last_name'] = post['user'].last_name
-            data['author_id'] = post['author_id']
-        else:
-            post['user'] = '0'
-            post['author_id'] = '0'
-        app.logger.debug(f'GET. POST VIEW. id ={post["id"]}')
+        current_app.logger.debug('GET. POST VIEW. id = %s', post['id'])
         return render_template("post.html", data=data)
     else:
-        app.logger.debug('GET. POST VIEW. UNKNOWN ID')
+        current_app.logger.debug('GET. POST VIEW. UNKNOWN ID')
         return redirect('/')
 
 
-@app.route('/edit_post/<int:id>/', methods=['GET', 'POST'])
+@web.route('/edit_post/<int:id>/', methods=['GET', 'POST'])
 def view_edit_post(id: int):   # pylint: disable=C0103,W0622,R1710
     """
     View function to edit an existing post.
@@ -267,7 +326,7 @@ def view_edit_post(id: int):   # pylint: disable=C0103,W0622,R1710
             'description': request.form.get('description'),
         }
         feedback = update_post(data)
-        app.logger.debug(f"POST. EDIT POST {data.get('id')}: {feedback}")
+        current_app.logger.debug('POST. EDIT POST %s: %s', data.get('id'), feedback)
         if feedback == 'Success':  # pylint: disable=R1705
             flash('Post record updated!', category='message')
             return redirect('/posts/' + str(id))
@@ -275,11 +334,11 @@ def view_edit_post(id: int):   # pylint: disable=C0103,W0622,R1710
             flash(feedback, category='error')
     else:
         post = get_post(id)
-        app.logger.debug(f"GET. EDIT USER. id = {id}")
+        current_app.logger.debug('GET. EDIT USER. id = %s', id)
         return render_template("edit_post.html", data=post)
 
 
-@app.route('/delete_post/<int:id>/', methods=['GET'])
+@web.route('/delete_post/<int:id>/', methods=['GET'])
 def view_delete_post(id: int):   # pylint: disable=C0103,W0622
     """
     This view function deletes a post record with the given ID from the database.
@@ -292,9 +351,9 @@ def view_delete_post(id: int):   # pylint: disable=C0103,W0622
     """
     feedback = delete_post(id)
     if feedback == 'Success':
-        app.logger.debug("GET. DELETING USER. flash SUCCESS MESSAGE ")
+        current_app.logger.debug("GET. DELETING USER. flash SUCCESS MESSAGE ")
         flash('Post record deleted!',  category='message')
     else:
-        app.logger.debug("GET. DELETING USER. flash ERROR MESSAGE ")
+        current_app.logger.debug("GET. DELETING USER. flash ERROR MESSAGE ")
         flash(feedback, category='error')
     return redirect("/posts/")
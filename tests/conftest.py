@@ -0,0 +1,68 @@
+import sys
+import os
+current_dir = os.getcwd()
+sys.path.append(current_dir)
+
+from datetime import datetime
+
+import pytest
+
+from restflask.config import create_app
+from restflask.extensions import db
+from restflask.models.model import User, Post
+
+# In-memory SQLite database, no logging configuration.
+TEST_CONFIG = {'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'LOGGING': None}
+# Explicit dates: SQLite stores the server default now() without microseconds, which
+# compares wrongly with the datetimes of the keyset cursors.
+REGISTERED_AT = datetime(2023, 1, 1)
+CREATED_AT = datetime(2023, 1, 2)
+
+
+@pytest.fixture
+def config():
+    ''' Configuration of the `app` fixture on top of TEST_CONFIG, override it in a module'''
+    return {}
+
+
+@pytest.fixture
+def make_app():
+    ''' Factory of applications whose database schema is created'''
+
+    def factory(**config):
+        app = create_app({**TEST_CONFIG, **config})
+        with app.app_context():
+            db.create_all()
+        return app
+
+    return factory
+
+
+@pytest.fixture
+def app(make_app, config):
+    return make_app(**config)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def add_user(app):
+    ''' Adds a user and `posts` posts of theirs, titled '<username> post <n>'. Returns the id'''
+
+    def add(username, posts=0, **fields):
+        values = {'email': f'{username}@gmail.com', 'first_name': 'Name',
+                  'last_name': 'Surname', 'location': 'Kyiv', 'registered_at': REGISTERED_AT}
+        with app.app_context():
+            user = User(username=username, **{**values, **fields})
+            db.session.add(user)
+            db.session.flush()
+            db.session.add_all([Post(title=f'{username} post {i}', description='Text',
+                                     author_id=user.id, created_at=CREATED_AT)
+                                for i in range(posts)])
+            db.session.commit()
+            return user.id
+
+    return add
@@ -5,6 +5,9 @@ sys.path.append(current_dir)
 
 
 from restflask.app import app
+from restflask.extensions import db
+from restflask.service.instrumentation import assert_max_queries, assert_no_full_scans
+from restflask.service import services
 
 class TestApiHome:
     ''' Testing home routes'''
@@ -41,6 +44,29 @@ class TestApiUsers:
     def test_get_api_users(self):
         response = app.test_client().get('/api/users/')
         assert response.status_code == 200
+        assert 'items' in response.json
+        assert 'next' in response.json
+
+    def test_get_api_users_page(self):
+        response = app.test_client().get('/api/users/?limit=1')
+        assert response.status_code == 200
+        assert len(response.json['items']) <= 1
+
+    def test_get_api_users_summary(self):
+        response = app.test_client().get('/api/users/?summary=1')
+        assert response.status_code == 200
+        for user in response.json['items']:
+            assert 'num_post' in user
+            assert 'posts' not in user
+
+    def test_get_api_users_ndjson(self):
+        response = app.test_client().get('/api/users/?format=ndjson')
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+
+    def test_get_api_users_bad_cursor(self):
+        response = app.test_client().get('/api/users/?cursor=notacursor')
+        assert response.status_code == 400
 
     def test_api_create_user(self):
         response = app.test_client().post('/api/create_user/', json=self.test_data)
@@ -52,6 +78,12 @@ class TestApiUsers:
         assert response.status_code == 409
         assert b'Error. Username or email is already exist' in response.data
 
+    def test_api_create_user_dup_username(self):
+        data = dict(self.test_data, email='another@gmail.com')
+        response = app.test_client().post('/api/create_user/', json=data)
+        assert response.status_code == 409
+        assert b'Error. Username or email is already exist' in response.data
+
     def test_api_get_user(self):
         response = app.test_client().get('/api/get_user/?id=' + self.test_data['email'])
         assert response.status_code == 200
@@ -100,6 +132,46 @@ class TestApiPosts:
         response = app.test_client().get('/api/posts/')
         assert response.status_code == 200
 
+    def test_get_api_posts_page(self):
+        response = app.test_client().get('/api/posts/?limit=1')
+        assert response.status_code == 200
+        assert len(response.json['items']) <= 1
+
+    def test_get_api_posts_stream(self):
+        response = app.test_client().get('/api/posts/?format=stream')
+        assert response.status_code == 200
+        assert isinstance(response.json, list)
+
+    def test_get_api_posts_fields(self):
+        response = app.test_client().get('/api/posts/?fields=id,title&sort=-created_at')
+        assert response.status_code == 200
+        for post in response.json['items']:
+            assert set(post) == {'id', 'title'}
+
+    def test_get_api_posts_filters(self):
+        response = app.test_client().get('/api/posts/?author_id=0&created_from=2000-01-01')
+        assert response.status_code == 200
+        assert response.json['items'] == []
+
+    def test_get_api_posts_bad_sort(self):
+        response = app.test_client().get('/api/posts/?sort=description')
+        assert response.status_code == 400
+
+    def test_get_api_posts_bad_limit(self):
+        response = app.test_client().get('/api/posts/?limit=abc')
+        assert response.status_code == 400
+
+    def test_api_search_posts(self):
+        response = app.test_client().get('/api/posts/search/?q=planet&limit=5')
+        assert response.status_code == 200
+        assert len(response.json['items']) <= 5
+        scores = [post['score'] for post in response.json['items']]
+        assert scores == sorted(scores, reverse=True)
+
+    def test_api_search_posts_no_query(self):
+        response = app.test_client().get('/api/posts/search/')
+        assert response.status_code == 400
+
     def test_api_create_post(self):
         response = app.test_client().post('/api/create_post/', json=self.test_data)
         assert response.status_code == 201
@@ -136,3 +208,82 @@ class TestApiPosts:
         response = app.test_client().delete('/api/delete_post/?id=' + 'JSKFbnkmfnSLFKJknmfksnMFKFSFSFSFS')
         assert response.status_code == 409
         assert b'Error. No such post record in the db' in response.data
+
+
+class TestApiBulk:
+    ''' Testing batch endpoints'''
+    users = [dict(username=f'bulkuser{i}', email=f'bulk{i}@gmail.com', first_name='Bulk',
+                  last_name='User', location='Ukraine') for i in range(3)]
+
+    def test_api_users_bulk_create(self):
+        response = app.test_client().post('/api/users/bulk/', json=self.users + [{'email': 'x'}])
+        assert response.status_code == 200
+        statuses = [result['status'] for result in response.json['results']]
+        assert statuses == ['created', 'created', 'created', 'error']
+
+    def test_api_users_bulk_create_duplicates(self):
+        response = app.test_client().post('/api/users/bulk/', json=self.users[:1])
+        assert response.json['results'][0]['status'] == 'error'
+
+    def test_api_users_bulk_delete(self):
+        client = app.test_client()
+        ids = [client.get('/api/get_user/?id=' + user['email']).json['id'] for user in self.users]
+        response = client.delete('/api/users/bulk/', json=ids + [0])
+        statuses = [result['status'] for result in response.json['results']]
+        assert statuses == ['deleted', 'deleted', 'deleted', 'error']
+
+    def test_api_posts_bulk_not_array(self):
+        response = app.test_client().post('/api/posts/bulk/', json={'title': 'Mars'})
+        assert response.status_code == 400
+
+
+class TestApiInternal:
+    ''' Testing internal endpoints'''
+
+    def test_api_cache_stats(self):
+        response = app.test_client().get('/api/internal/cache/')
+        assert response.status_code == 200
+        assert 'hits' in response.json
+
+    def test_api_pool_stats(self):
+        app.test_client().get('/api/users/')
+        response = app.test_client().get('/api/internal/pool/')
+        assert response.status_code == 200
+        assert response.json['checkouts'] >= 1
+        assert response.json['latency_histogram'][-1]['le'] == '+Inf'
+
+
+class TestApiQueryCount:
+    ''' Listing endpoints must cost a constant number of queries'''
+
+    def test_api_users_query_count(self):
+        with app.app_context(), assert_max_queries(db.engine, 2):
+            assert app.test_client().get('/api/users/').status_code == 200
+
+    def test_api_users_summary_query_count(self):
+        with app.app_context(), assert_max_queries(db.engine, 1):
+            assert app.test_client().get('/api/users/?summary=1').status_code == 200
+
+    def test_api_posts_query_count(self):
+        with app.app_context(), assert_max_queries(db.engine, 1):
+            assert app.test_client().get('/api/posts/').status_code == 200
+
+
+class TestServiceQueryPlans:
+    ''' Lookup paths must be served by indexes'''
+
+    def test_get_user_by_email_plan(self):
+        with app.app_context(), assert_no_full_scans(db.engine):
+            services.get_user('nobody@gmail.com')
+
+    def test_get_post_by_title_plan(self):
+        with app.app_context(), assert_no_full_scans(db.engine):
+            services.get_post('Nothing to see here')
+
+    def test_delete_post_by_title_plan(self):
+        with app.app_context(), assert_no_full_scans(db.engine):
+            services.delete_post('Nothing to see here')
+
+    def test_posts_page_plan(self):
+        with app.app_context(), assert_no_full_scans(db.engine):
+            services.get_posts_page(10)
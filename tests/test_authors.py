@@ -0,0 +1,61 @@
+import sys
+import os
+current_dir = os.getcwd()
+sys.path.append(current_dir)
+
+import pytest
+
+from restflask.extensions import db
+from restflask.models.model import User
+from restflask.service.services import get_author_choices
+
+NAMES = [('Olena', 'Shevchenko'), ('Andrii', 'Melnyk'), ('Oleh', 'Boiko')]
+
+
+@pytest.fixture(autouse=True)
+def authors(add_user):
+    for i, (first, last) in enumerate(NAMES):
+        add_user(f'user_{i}', first_name=first, last_name=last)
+
+
+class TestAuthorChoices:
+    ''' Testing the author list of the post forms'''
+
+    def test_sorted_and_cached_until_write(self, app):
+        with app.app_context():
+            authors = get_author_choices(10)
+            assert [author['first_name'] for author in authors] == ['Andrii', 'Oleh', 'Olena']
+            assert set(authors[0]) == {'id', 'first_name', 'last_name'}
+            assert get_author_choices(10) is authors
+            db.session.get(User, 1).first_name = 'Zoia'
+            db.session.commit()
+            assert get_author_choices(10)[-1]['first_name'] == 'Zoia'
+
+    def test_too_many_users(self, app, client):
+        with app.app_context():
+            assert get_author_choices(2) is None
+        assert b'<select id="author_id"' in client.get('/new_post/').data
+        app.config['AUTHOR_SELECT_LIMIT'] = 2
+        response = client.get('/posts/')
+        assert b'list="author_options"' in response.data
+        assert b'Shevchenko' not in response.data
+
+
+class TestAuthorsApi:
+    ''' Testing the typeahead endpoint of the authors'''
+
+    def test_prefix(self, client):
+        response = client.get('/api/authors/?q=Ol')
+        assert [item['first_name'] for item in response.json['items']] == ['Olena', 'Oleh']
+        response = client.get('/api/authors/?q=melnyk&limit=1')
+        assert response.json['items'] == [{'id': 2, 'first_name': 'Andrii', 'last_name': 'Melnyk'}]
+        assert client.get('/api/authors/?q=3').json['items'][0]['first_name'] == 'Oleh'
+
+    def test_wildcards_are_literal(self, client):
+        assert client.get('/api/authors/?q=user_').json['items'] != []
+        assert client.get('/api/authors/?q=user%25').json['items'] == []
+        assert client.get('/api/authors/?q=%25').json['items'] == []
+
+    def test_missing_query(self, client):
+        assert client.get('/api/authors/').status_code == 400
+        assert client.get('/api/authors/?q=Ol&limit=x').status_code == 400
@@ -0,0 +1,114 @@
+import sys
+import os
+current_dir = os.getcwd()
+sys.path.append(current_dir)
+sys.path.append(os.path.join(current_dir, 'benchmarks'))
+
+import json
+import random
+
+import pytest
+
+import benchlib
+import bench_services
+import datagen
+from restflask.extensions import db
+from restflask.models.model import User
+from restflask.service.instrumentation import assert_max_queries
+
+
+def summary(p50, p95=None, rps=100.0, errors=0):
+    return {'requests': 20, 'errors': errors, 'rps': rps, 'p50_ms': p50,
+            'p95_ms': p95 if p95 is not None else p50, 'p99_ms': p95 or p50}
+
+
+class TestDatagen:
+    ''' Testing the synthetic data of the benchmarks'''
+
+    def test_same_seed_same_rows(self):
+        authors = [(1, datagen.EPOCH), (2, datagen.EPOCH)]
+        first = list(datagen.generate_posts(random.Random(3), authors, 50, 1))
+        assert first == list(datagen.generate_posts(random.Random(3), authors, 50, 1))
+        assert first != list(datagen.generate_posts(random.Random(4), authors, 50, 1))
+
+    def test_load_is_skewed(self, app):
+        with app.app_context():
+            dataset = datagen.load(200, 2000, seed=1)
+            registered = [date for date, in db.session.query(User.registered_at)]
+        assert (dataset['users'], dataset['posts']) == (200, 2000)
+        # A uniform draw would give the top 1% of 200 authors about 1% of the posts.
+        assert dataset['top_1pct_share'] > 0.1
+        assert all(date <= datagen.EPOCH for date in registered)
+
+
+class TestBaseline:
+    ''' Testing the regression check of the benchmarks'''
+
+    def test_percentile(self):
+        values = [i / 1000 for i in range(1, 101)]
+        result = benchlib.summarize(values, 2.0)
+        assert (result['p50_ms'], result['p95_ms'], result['p99_ms']) == (50, 95, 99)
+        assert result['rps'] == 50
+
+    def test_compare(self):
+        baseline = {'fast': summary(10), 'noisy': summary(0.01), 'gone': summary(1)}
+        assert benchlib.compare({'fast': summary(12), 'noisy': summary(0.05)}, baseline, 0.25) == []
+        regressions = benchlib.compare(
+            {'fast': summary(13, 14, rps=70, errors=1), 'noisy': summary(0.01)}, baseline, 0.25)
+        assert regressions == ['fast: p50_ms 10.000 -> 13.000', 'fast: rps 100.0 -> 70.0',
+                               'fast: errors 0 -> 1']
+        # p95 is allowed twice the tolerance.
+        assert benchlib.compare({'fast': summary(10, 14.5)}, baseline, 0.25) == []
+        assert benchlib.compare({'fast': summary(10, rps=1)}, baseline, 0.25,
+                                throughput=False) == []
+
+
+class TestQueryBudgets:
+    ''' Testing the number of statements of the read cases, which does not depend on the machine'''
+
+    # Two statements are a query of the parents and one loading the children of all of them
+    # (or, for the search, the SQLite fallback matching in Python, then loading the hits).
+    # Any more would grow with the rows, as an N+1 query does.
+    BUDGETS = {'get_users': 2, 'get_users_page': 2, 'iter_users': 2, 'get_user': 2,
+               'get_user(email)': 2, 'search_posts': 2}
+
+    @pytest.fixture
+    def config(self):
+        return {'CACHE_BACKEND': 'null'}
+
+    def test_read_cases(self, app):
+        with app.app_context():
+            datagen.load(200, 2000, seed=1)
+        with app.test_request_context():
+            cases = bench_services.read_cases(bench_services.sample_data())
+            for name, call in cases.items():
+                for i in range(3):
+                    db.session.remove()
+                    with assert_max_queries(db.engine, self.BUDGETS.get(name, 1)):
+                        call(i)
+
+
+# Latencies depend on the machine and its load, run with BENCHMARKS=1.
+@pytest.mark.skipif(os.environ.get('BENCHMARKS') != '1', reason='set BENCHMARKS=1 to run')
+class TestReferenceBaseline:
+    ''' Testing the service latencies against the committed reference baseline'''
+
+    # Generous: the reference was measured on another machine. It catches the regressions
+    # which change the cost of a case several times over, such as an N+1 query.
+    TOLERANCE = 3.0
+    BASELINE = os.path.join(current_dir, 'benchmarks', 'baselines', 'services.json')
+
+    def test_within_tolerance(self, tmp_path):
+        with open(self.BASELINE, encoding='utf-8') as file:
+            baseline = json.load(file)
+        meta = baseline['meta']
+        args = bench_services.parse_args([
+            '--database', f'sqlite:///{tmp_path}/bench.db', '--seed', '1',
+            '--users', str(meta['dataset']['users']), '--posts', str(meta['dataset']['posts']),
+            '--runs', str(meta['runs']), '--rounds', str(meta['rounds']),
+            '--only', r'_page|_version|_etag|^get_(user|post)$'])
+        results, run_meta = bench_services.run(args)
+        assert run_meta['dataset'] == meta['dataset']
+        assert len(results) == 9
+        expected = {name: baseline['results'][name] for name in results}
+        assert benchlib.compare(results, expected, self.TOLERANCE, throughput=False) == []
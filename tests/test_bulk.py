@@ -0,0 +1,100 @@
+import sys
+import os
+current_dir = os.getcwd()
+sys.path.append(current_dir)
+
+from sqlalchemy import event
+
+from restflask.extensions import db
+from restflask.models.model import User, Post
+
+
+class TestBulkTypes:
+    ''' Testing the records of the bulk endpoints whose fields are not strings'''
+
+    def test_create_users(self, app, client):
+        user = dict(username='bulk', email='bulk@gmail.com', first_name='Bulk',
+                    last_name='User', location='Kyiv')
+        response = client.post('/api/users/bulk/', json=[{'email': ['x']}, {'username': {}}, user])
+        assert response.status_code == 200
+        assert [result['status'] for result in response.json['results']] == \
+            ['error', 'error', 'created']
+        assert response.json['results'][0]['message'] == 'Error. Fields must be strings'
+        with app.app_context():
+            assert db.session.query(User).count() == 1
+
+    def test_update_users(self, client, add_user):
+        add_user('user')
+        response = client.put('/api/users/bulk/', json=[{'id': 1, 'email': ['x']}])
+        assert response.json['results'][0]['message'] == 'Error. Fields must be strings'
+
+    def test_posts(self, client, add_user):
+        add_user('user', posts=1)
+        response = client.post('/api/posts/bulk/', json=[{'title': 1, 'description': 'Text'}])
+        assert response.json['results'][0]['message'] == 'Error. Fields must be strings'
+        response = client.put('/api/posts/bulk/', json=[{'id': 1, 'title': ['x']}])
+        assert response.json['results'][0]['message'] == 'Error. Fields must be strings'
+
+
+class TestBulk:
+    ''' Testing the bulk endpoints on SQLite'''
+    users = [dict(username=f'bulkuser{i}', email=f'bulk{i}@gmail.com', first_name='Bulk',
+                  last_name='User', location='Kyiv') for i in range(3)]
+
+    @staticmethod
+    def statuses(response):
+        return [result['status'] for result in response.json['results']]
+
+    def test_users(self, app, client):
+        response = client.post('/api/users/bulk/', json=self.users + [{'email': 'x'}])
+        assert self.statuses(response) == ['created', 'created', 'created', 'error']
+        response = client.put('/api/users/bulk/', json=[{'id': 1, 'location': 'Lviv'},
+                                                        {'id': 2, 'email': 'bulk0@gmail.com'}])
+        assert self.statuses(response) == ['updated', 'error']
+        assert client.get('/api/get_user/?id=1').json['location'] == 'Lviv'
+        response = client.delete('/api/users/bulk/', json=[1, {'id': 2}, 2, 0])
+        assert self.statuses(response) == ['deleted', 'deleted', 'error', 'error']
+        with app.app_context():
+            assert [user_id for user_id, in db.session.query(User.id)] == [3]
+
+    def test_posts(self, app, client, add_user):
+        add_user('user')
+        response = client.post('/api/posts/bulk/', json=[
+            {'title': 'Mars', 'description': 'Red', 'author_id': 1},
+            {'title': 'Venus', 'description': 'Hot', 'author_id': '1'},
+            {'title': 'Moon', 'description': 'Grey'},
+            {'title': 'Pluto', 'description': 'Far', 'author_id': 2}])
+        assert self.statuses(response) == ['created', 'created', 'created', 'error']
+        response = client.put('/api/posts/bulk/', json=[{'id': 1, 'title': 'Mars!'}, {'id': 9}])
+        assert self.statuses(response) == ['updated', 'error']
+        assert client.get('/api/get_post/?id=1').json['title'] == 'Mars!'
+        response = client.delete('/api/posts/bulk/', json=[1, 2, 9])
+        assert self.statuses(response) == ['deleted', 'deleted', 'error']
+        with app.app_context():
+            assert [post_id for post_id, in db.session.query(Post.id)] == [3]
+
+    def test_author_id_types(self, app, client, add_user):
+        add_user('user')
+        posts = [{'title': 'Mars', 'description': 'Red', 'author_id': value}
+                 for value in (1.7, True, '1.0', [1])]
+        response = client.post('/api/posts/bulk/', json=posts)
+        assert [result['message'] for result in response.json['results']] == \
+            ['Error. Invalid author_id'] * 4
+        with app.app_context():
+            assert db.session.query(Post).count() == 0
+
+    def test_author_deleted_before_insert(self, app, client, add_user):
+        add_user('user')
+
+        def delete_author(connection, cursor, statement, *args):
+            if statement.startswith('INSERT INTO posts'):
+                cursor.execute('DELETE FROM users')
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', delete_author)
+        response = client.post('/api/posts/bulk/', json=[
+            {'title': 'Mars', 'description': 'Red', 'author_id': 1},
+            {'title': 'Moon', 'description': 'Grey'}])
+        assert response.status_code == 200
+        assert [result['message'] for result in response.json['results']] == \
+            ['Error. No such user record in the db'] * 2
@@ -0,0 +1,62 @@
+import sys
+import os
+current_dir = os.getcwd()
+sys.path.append(current_dir)
+
+from flask import Flask
+
+from restflask.service.cache import Cache
+
+
+def make_cache(**config):
+    app = Flask(__name__)
+    app.config.update(config)
+    return Cache(app)
+
+
+class TestMemoryCache:
+    ''' Testing the in-process cache backend'''
+
+    def test_hit_and_miss(self):
+        cache = make_cache(CACHE_BACKEND='memory')
+        assert cache.get('user:id:1') is None
+        cache.set_many({'user:id:1': {'id': 1}})
+        assert cache.get('user:id:1') == {'id': 1}
+        assert cache.stats()['hits'] == 1
+        assert cache.stats()['misses'] == 1
+
+    def test_returns_copies(self):
+        cache = make_cache(CACHE_BACKEND='memory')
+        cache.set_many({'post:id:1': {'posts': []}})
+        cache.get('post:id:1')['posts'].append('changed')
+        assert cache.get('post:id:1') == {'posts': []}
+
+    def test_lru_eviction(self):
+        cache = make_cache(CACHE_BACKEND='memory', CACHE_MAX_ENTRIES=2)
+        cache.set_many({'a': 1, 'b': 2})
+        cache.get('a')
+        cache.set_many({'c': 3})
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        assert cache.stats()['evictions'] == 1
+
+    def test_ttl_expiry(self):
+        cache = make_cache(CACHE_BACKEND='memory', CACHE_TTL=-1)
+        cache.set_many({'a': 1})
+        assert cache.get('a') is None
+
+    def test_delete_many(self):
+        cache = make_cache(CACHE_BACKEND='memory')
+        cache.set_many({'a': 1, 'b': 2})
+        cache.delete_many('a', None)
+        assert cache.get('a') is None
+        assert cache.get('b') == 2
+
+
+class TestNullCache:
+    ''' Testing disabled caching'''
+
+    def test_never_hits(self):
+        cache = make_cache(CACHE_BACKEND='null')
+        cache.set_many({'a': 1})
+        assert cache.get('a') is None
@@ -0,0 +1,83 @@
+import sys
+import os
+current_dir = os.getcwd()
+sys.path.append(current_dir)
+
+from datetime import datetime, timezone
+
+import pytest
+from werkzeug.http import http_date
+
+from restflask.extensions import db
+from restflask.service.instrumentation import assert_max_queries
+
+
+@pytest.fixture
+def config():
+    return {'CACHE_BACKEND': 'null'}
+
+
+@pytest.fixture(autouse=True)
+def user(add_user):
+    add_user('user', posts=1)
+
+
+class TestConditionalRequests:
+    ''' Testing ETag / Last-Modified validation of the read endpoints'''
+
+    def test_collection_not_modified(self, client):
+        for url in ('/api/users/', '/api/posts/', '/api/users/?format=ndjson'):
+            response = client.get(url)
+            assert response.headers['Cache-Control'] == 'no-cache'
+            etag = response.headers['ETag']
+            response = client.get(url, headers={'If-None-Match': etag})
+            assert response.status_code == 304
+            assert response.data == b''
+
+    def test_collection_single_query(self, app, client):
+        for url, budget in (('/api/users/?summary=1', 1), ('/api/posts/', 1),
+                            ('/api/users/', 2), ('/api/posts/?author_id=2', 2)):
+            with app.app_context(), assert_max_queries(db.engine, budget):
+                etag = client.get(url).headers['ETag']
+            # The version selected with the page matches the one of the probe.
+            assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+    def test_collection_changed(self, client):
+        etag = client.get('/api/users/').headers['ETag']
+        assert client.put('/api/update_post/', json={'id': 1, 'title': 'New'}).status_code == 201
+        response = client.get('/api/users/', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.json['items'][0]['posts'][0]['title'] == 'New'
+
+    def test_post_changed_with_author(self, client):
+        response = client.get('/api/get_post/?id=1')
+        assert 'Last-Modified' in response.headers
+        etag = response.headers['ETag']
+        client.put('/api/update_user/', json={'id': 1, 'username': 'renamed'})
+        response = client.get('/api/get_post/?id=1', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.json['author_username'] == 'renamed'
+
+    def test_post_if_modified_since(self, client):
+        last_modified = client.get('/api/get_post/?id=1').headers['Last-Modified']
+        response = client.get('/api/get_post/?id=1', headers={'If-Modified-Since': last_modified})
+        assert response.status_code == 304
+
+    def test_user_post_deleted(self, client, add_user):
+        user_id = add_user('author', posts=2)
+        url = f'/api/get_user/?id={user_id}'
+        response = client.get(url)
+        # Deleting a post does not advance the last change of the user, only its ETag.
+        assert 'Last-Modified' not in response.headers
+        etag, date = response.headers['ETag'], http_date(datetime.now(timezone.utc))
+        post_id = response.json['posts'][0]['id']
+        assert client.delete(f'/api/delete_post/?id={post_id}').status_code == 200
+        response = client.get(url, headers={'If-Modified-Since': date})
+        assert response.status_code == 200
+        assert len(response.json['posts']) == 1
+        assert client.get(url, headers={'If-None-Match': etag}).status_code == 200
+
+    def test_missing_user(self, client):
+        response = client.get('/api/get_user/?id=2', headers={'If-None-Match': '*'})
+        assert response.status_code == 204
+        assert 'ETag' not in response.headers
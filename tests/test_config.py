@@ -0,0 +1,60 @@
+import sys
+import os
+current_dir = os.getcwd()
+sys.path.append(current_dir)
+
+import importlib
+
+import pytest
+
+
+class TestCreateApp:
+    ''' Testing the application factory'''
+
+    def test_blueprints(self, app):
+        assert set(app.blueprints) == {'web', 'api'}
+        assert app.url_map.bind('localhost').match('/api/users/')[0] == 'api.api_users'
+
+    def test_config_override(self, make_app):
+        app = make_app(CACHE_BACKEND='null', SECRET_KEY='test')
+        assert app.config['SECRET_KEY'] == 'test'
+        assert app.extensions['cache'].stats()['backend'] == 'NullBackend'
+
+    def test_migrate_on_demand(self, make_app):
+        assert 'migrate' not in make_app().extensions
+        assert 'db' in make_app().cli.commands
+        assert 'migrate' in make_app(MIGRATE=True).extensions
+
+
+class TestGunicornConf:
+    ''' Testing the cache backend and the database driver of the gunicorn workers'''
+
+    @staticmethod
+    def load(monkeypatch, **environ):
+        monkeypatch.setattr(os, 'environ', dict(environ))
+        module = importlib.import_module('restflask.gunicorn_conf')
+        importlib.reload(module)
+        return os.environ
+
+    def test_shared_backend(self, monkeypatch):
+        assert self.load(monkeypatch, GUNICORN_WORKERS='4')['CACHE_BACKEND'] == 'null'
+        environ = self.load(monkeypatch, GUNICORN_WORKERS='4', CACHE_REDIS_URL='redis://cache')
+        assert environ['CACHE_BACKEND'] == 'redis'
+        assert 'CACHE_BACKEND' not in self.load(monkeypatch, GUNICORN_WORKERS='1')
+
+    def test_memory_refused(self, monkeypatch):
+        with pytest.raises(ValueError):
+            self.load(monkeypatch, GUNICORN_WORKERS='4', CACHE_BACKEND='memory')
+
+    def test_blocking_driver_refused(self, monkeypatch):
+        for environ in ({'DATABASE_URL': 'mysql://user:pass@db/app'},
+                        {'DATABASE_URL': 'mysql+mysqldb://db/app'},
+                        {'DB_DRIVER': 'mysqldb'},
+                        {'DATABASE_REPLICA_URLS': 'mysql+pymysql://r1/app, mysql://r2/app'}):
+            with pytest.raises(ValueError):
+                self.load(monkeypatch, GUNICORN_WORKERS='1', **environ)
+        for environ in ({'DATABASE_URL': 'mysql+pymysql://db/app'},
+                        {'DATABASE_URL': 'sqlite:////tmp/app.db'}, {}):
+            assert self.load(monkeypatch, GUNICORN_WORKERS='1', **environ)['DB_DRIVER'] == 'pymysql'
+        self.load(monkeypatch, GUNICORN_WORKERS='1', GUNICORN_WORKER_CLASS='sync',
+                  DATABASE_URL='mysql://db/app')
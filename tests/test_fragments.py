@@ -0,0 +1,96 @@
+import sys
+import os
+current_dir = os.getcwd()
+sys.path.append(current_dir)
+
+import re
+
+import pytest
+
+from restflask.extensions import db, cache
+from restflask.models.model import User
+from restflask.service.fragments import data_version
+
+
+@pytest.fixture
+def config():
+    return {'CACHE_BACKEND': 'memory', 'WEB_PAGE_SIZE': 2}
+
+
+@pytest.fixture
+def users(add_user):
+    ''' Adds `count` users named user<n>, one post each'''
+
+    def add(count):
+        for i in range(count):
+            add_user(f'user{i}', posts=1)
+
+    return add
+
+
+def next_link(html: bytes) -> str:
+    match = re.search(r'href="([^"]*cursor=[^"]*)">Next page', html.decode())
+    return match.group(1).replace('&amp;', '&') if match else None
+
+
+class TestWebPagination:
+    ''' Testing the paginated web lists'''
+
+    def test_users_pages(self, client, users):
+        users(3)
+        response = client.get('/users/')
+        assert b'user0' in response.data and b'user1' in response.data
+        assert b'user2' not in response.data
+        response = client.get(next_link(response.data))
+        assert b'user2' in response.data
+        assert next_link(response.data) is None
+
+    def test_posts_pages_keep_filters(self, client, users):
+        users(3)
+        response = client.post('/posts/', data={'date_from': '2000-01-01', 'author_id': ''},
+                               follow_redirects=True)
+        link = next_link(response.data)
+        assert 'date_from=2000-01-01' in link
+        assert b'user2 post 0' in client.get(link).data
+
+    def test_page_size_limit(self, app, client, users):
+        app.config['WEB_MAX_PAGE_SIZE'] = 3
+        users(5)
+        response = client.get('/users/?limit=1000')
+        assert b'user2' in response.data and b'user3' not in response.data
+        assert 'limit=3' in next_link(response.data)
+        assert client.get('/users/?limit=x', follow_redirects=True).status_code == 200
+
+    def test_invalid_cursor(self, client, users):
+        users(3)
+        response = client.get('/posts/?cursor=bad')
+        assert response.status_code == 302
+        assert response.headers['Location'] == '/posts/'
+
+
+class TestFragmentCache:
+    ''' Testing the invalidation of the cached list fragments'''
+
+    def test_cached_until_write(self, app, client, users):
+        users(3)
+        client.get('/users/')
+        with app.app_context():
+            version = data_version()
+        hits = cache.stats()['hits']
+        client.get('/users/')
+        assert cache.stats()['hits'] > hits
+        client.put('/api/update_user/', json={'id': 1, 'username': 'renamed'})
+        with app.app_context():
+            assert data_version() != version
+        assert b'renamed' in client.get('/users/').data
+        assert b'renamed' in client.get('/posts/').data
+
+    def test_rollback_keeps_version(self, app, users):
+        users(3)
+        with app.app_context():
+            version = data_version()
+            db.session.add(User(username='other', email='other@gmail.com', first_name='Name',
+                                last_name='Surname', location='Kyiv'))
+            db.session.flush()
+            db.session.rollback()
+            assert data_version() == version
@@ -0,0 +1,85 @@
+import sys
+import os
+current_dir = os.getcwd()
+sys.path.append(current_dir)
+
+import logging
+import threading
+from logging.handlers import QueueHandler
+
+import pytest
+
+from restflask.service.logs import configure_logging, log_level, stop_logging
+
+
+class Payload:
+    ''' Records how often it was formatted'''
+
+    def __init__(self):
+        self.formatted = 0
+
+    def __str__(self):
+        self.formatted += 1
+        return 'payload'
+
+
+class RecordingHandler(logging.Handler):
+    ''' Keeps the messages and the threads which emitted them'''
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+        self.threads = set()
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+        self.threads.add(threading.get_ident())
+
+
+def logging_config(handler):
+    return {
+        'version': 1,
+        'disable_existing_loggers': False,
+        'handlers': {'recording': {'()': lambda: handler}},
+        'root': {'handlers': ['recording']},
+    }
+
+
+class TestLogging:
+    ''' Testing the queue based logging setup'''
+
+    def teardown_method(self):
+        stop_logging()
+        logging.getLogger().handlers.clear()
+
+    def test_log_level(self):
+        assert log_level('production') == 'INFO'
+        assert log_level('production', 'debug') == 'DEBUG'
+        with pytest.raises(ValueError):
+            log_level('staging')
+
+    def test_queue_mode(self):
+        handler = RecordingHandler()
+        configure_logging(logging_config(handler), 'INFO')
+        root = logging.getLogger()
+        assert [type(item) for item in root.handlers] == [QueueHandler]
+        logging.getLogger('restflask').info('user %s', 42)
+        stop_logging()
+        assert handler.messages == ['user 42']
+        assert threading.get_ident() not in handler.threads
+
+    def test_disabled_level_is_not_formatted(self):
+        handler = RecordingHandler()
+        payload = Payload()
+        configure_logging(logging_config(handler), 'INFO')
+        logging.getLogger('restflask').debug('feedback %s', payload)
+        stop_logging()
+        assert payload.formatted == 0
+        assert handler.messages == []
+
+    def test_direct_mode(self):
+        handler = RecordingHandler()
+        configure_logging(logging_config(handler), 'DEBUG', use_queue=False)
+        logging.getLogger('restflask').debug('direct')
+        assert handler.messages == ['direct']
+        assert handler.threads == {threading.get_ident()}
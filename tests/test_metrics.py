@@ -0,0 +1,38 @@
+import sys
+import os
+current_dir = os.getcwd()
+sys.path.append(current_dir)
+
+from prometheus_client import REGISTRY
+
+
+def requests_total(endpoint, status):
+    labels = {'method': 'GET', 'endpoint': endpoint, 'status': str(status)}
+    return REGISTRY.get_sample_value('restflask_http_requests_total', labels) or 0
+
+
+class TestMetrics:
+    ''' Testing the Prometheus metrics'''
+
+    def test_request_counters(self, client):
+        before = requests_total('api.api_users', 200)
+        not_found = requests_total('unknown', 404)
+        client.get('/api/users/')
+        client.get('/api/users/')
+        client.get('/no/such/page/')
+        assert requests_total('api.api_users', 200) == before + 2
+        assert requests_total('unknown', 404) == not_found + 1
+
+    def test_metrics_endpoint(self, client):
+        client.get('/api/users/')
+        response = client.get('/metrics')
+        assert response.status_code == 200
+        body = response.data.decode()
+        assert 'restflask_http_request_duration_seconds_bucket' in body
+        assert 'restflask_http_requests_in_progress' in body
+        assert 'restflask_db_pool_checked_out' in body
+        assert 'endpoint="metrics"' not in body
+
+    def test_disabled(self, make_app):
+        app = make_app(METRICS=False)
+        assert app.test_client().get('/metrics').status_code == 404
@@ -0,0 +1,73 @@
+import sys
+import os
+current_dir = os.getcwd()
+sys.path.append(current_dir)
+
+from datetime import datetime
+
+import pytest
+
+from restflask.extensions import db
+from restflask.models.model import User, Post
+from restflask.service import services
+from restflask.service.pagination import cursor_value, decode_cursor, encode_cursor
+
+
+@pytest.fixture(autouse=True)
+def users(add_user):
+    for i in range(3):
+        add_user(f'user{i}', posts=1)
+
+
+class TestCursor:
+    ''' Testing the keyset cursors of the listings'''
+
+    def test_round_trip(self):
+        cursor = encode_cursor('-created_at', datetime(2023, 1, 2), 7)
+        assert decode_cursor(cursor) == ('-created_at', '2023-01-02T00:00:00', 7)
+        assert cursor_value(Post.created_at, '2023-01-02T00:00:00') == datetime(2023, 1, 2)
+
+    def test_value_of_column_type(self):
+        for column, value in ((Post.created_at, {'a': 1}), (Post.created_at, 'yesterday'),
+                              (Post.title, 3), (Post.id, '3'), (Post.id, True)):
+            with pytest.raises(ValueError):
+                cursor_value(column, value)
+
+    def test_pages(self, client):
+        response = client.get('/api/posts/?limit=2&sort=-id')
+        assert [post['id'] for post in response.json['items']] == [3, 2]
+        response = client.get(f"/api/posts/?limit=2&sort=-id&cursor={response.json['next']}")
+        assert [post['id'] for post in response.json['items']] == [1]
+
+    def test_other_sort_order(self, client):
+        cursor = client.get('/api/posts/?limit=2&sort=-id').json['next']
+        for sort in ('id', 'title', 'created_at'):
+            assert client.get(f'/api/posts/?sort={sort}&cursor={cursor}').status_code == 400
+
+    def test_forged_value(self, client):
+        for sort, value in (('created_at', {'a': 1}), ('title', [1]), ('id', 'x')):
+            cursor = encode_cursor(sort, value, 1)
+            assert client.get(f'/api/posts/?sort={sort}&cursor={cursor}').status_code == 400
+        cursor = encode_cursor('id', None, 1)
+        assert client.get(f'/api/posts/?sort=id&cursor={cursor}').status_code == 400
+
+    def test_null_sort_values(self, app, client, add_user):
+        add_user('undated', posts=2)
+        with app.app_context():
+            db.session.query(User).filter(User.id == 4).update({'registered_at': None})
+            db.session.query(Post).filter(Post.id > 2).update({'created_at': None})
+            db.session.commit()
+        for url, expected in (('/api/posts/?sort=created_at', [3, 4, 5, 1, 2]),
+                              ('/api/posts/?sort=-created_at', [2, 1, 5, 4, 3]),
+                              ('/api/users/?sort=registered_at', [4, 1, 2, 3]),
+                              ('/api/users/?sort=-registered_at', [3, 2, 1, 4])):
+            ids, next_url = [], f'{url}&limit=1'
+            while next_url:
+                response = client.get(next_url)
+                assert response.status_code == 200
+                ids += [item['id'] for item in response.json['items']]
+                next_url = response.json['next'] and f"{url}&limit=1&cursor={response.json['next']}"
+            assert ids == expected
+        with app.test_request_context():
+            rows = services.iter_users(sort='-registered_at', batch_size=1)
+            assert [user['id'] for user in rows] == [3, 2, 1, 4]
@@ -0,0 +1,54 @@
+import sys
+import os
+current_dir = os.getcwd()
+sys.path.append(current_dir)
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from restflask.service.pool import InstrumentedQueuePool, engine_options, pool_stats
+
+MYSQL_URI = 'mysql://root:@127.0.0.1/epamproj'
+
+
+class TestEngineOptions:
+    ''' Testing the environment driven pool configuration'''
+
+    def test_production_preset(self):
+        options = engine_options(MYSQL_URI, {})
+        assert options['pool_pre_ping'] is True
+        assert options['poolclass'] is InstrumentedQueuePool
+
+    def test_env_overrides(self):
+        options = engine_options(MYSQL_URI, {'DB_POOL_PRESET': 'development',
+                                             'DB_POOL_SIZE': '20', 'DB_POOL_PRE_PING': 'true'})
+        assert options['pool_size'] == 20
+        assert options['pool_pre_ping'] is True
+        assert options['max_overflow'] == 2
+
+    def test_unknown_preset(self):
+        with pytest.raises(ValueError):
+            engine_options(MYSQL_URI, {'DB_POOL_PRESET': 'huge'})
+
+    def test_sqlite(self):
+        assert engine_options('sqlite://', {}) == {}
+
+
+class TestInstrumentedPool:
+    ''' Testing the checkout statistics'''
+
+    def test_checkouts_and_timeouts(self, tmp_path):
+        engine = create_engine(f'sqlite:///{tmp_path / "pool.db"}', poolclass=InstrumentedQueuePool,
+                               pool_size=1, max_overflow=0, pool_timeout=0.05)
+        connection = engine.connect()
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+        stats = pool_stats(engine)
+        assert stats['checked_out'] == 1
+        assert stats['checkouts'] == 1
+        assert stats['timeouts'] == 1
+        assert stats['max_wait'] >= 0.05
+        assert stats['latency_histogram'][-1] == {'le': '+Inf', 'count': 2}
+        connection.close()
+        assert pool_stats(engine)['checked_out'] == 0
@@ -0,0 +1,61 @@
+import sys
+import os
+current_dir = os.getcwd()
+sys.path.append(current_dir)
+
+import logging
+
+import pytest
+
+
+@pytest.fixture
+def config():
+    return {'SERVER_TIMING': True, 'TRACING_HEADER': True}
+
+
+class TestProfiling:
+    ''' Testing the query statistics, slow-query log and profiler'''
+
+    def test_server_timing(self, client):
+        response = client.get('/api/users/')
+        assert response.status_code == 200
+        timing = response.headers['Server-Timing']
+        assert timing.startswith('db;dur=')
+        assert 'queries"' in timing
+        assert 'app;dur=' in timing
+
+    def test_server_timing_spans(self, client):
+        response = client.get('/api/posts/', headers={'X-Trace': '1'})
+        assert 'serialize;dur=' in response.headers['Server-Timing']
+
+    def test_server_timing_disabled_by_default(self, make_app):
+        app = make_app()
+        response = app.test_client().get('/api/users/')
+        assert 'Server-Timing' not in response.headers
+
+    def test_slow_query_log(self, caplog, make_app):
+        app = make_app(SLOW_QUERY_THRESHOLD=0.0)
+        with caplog.at_level(logging.WARNING, logger='restflask.sql'):
+            app.test_client().get('/api/users/')
+        assert any(record.getMessage().startswith('Slow query') for record in caplog.records)
+
+    def test_profile(self, tmp_path, make_app):
+        app = make_app(PROFILING=True, PROFILE_DIR=str(tmp_path))
+        response = app.test_client().get('/api/users/', headers={'X-Profile': '1'})
+        assert (tmp_path / response.headers['X-Profile-File']).exists()
+
+    def test_profiles_of_the_same_second(self, tmp_path, make_app):
+        app = make_app(PROFILING=True, PROFILE_DIR=str(tmp_path), TRACING_HEADER=True)
+        client = app.test_client()
+        names = {client.get('/api/users/', headers={'X-Profile': '1'}).headers['X-Profile-File']
+                 for _ in range(3)}
+        assert len(names) == 3
+        assert len(list(tmp_path.iterdir())) == 3
+        response = client.get('/api/users/', headers={'X-Profile': '1', 'X-Trace': '1'})
+        assert response.headers['X-Trace-Id'] in response.headers['X-Profile-File']
+
+    def test_profile_disabled(self, tmp_path, make_app):
+        app = make_app(PROFILE_DIR=str(tmp_path))
+        response = app.test_client().get('/api/users/', headers={'X-Profile': '1'})
+        assert 'X-Profile-File' not in response.headers
+        assert not list(tmp_path.iterdir())
@@ -0,0 +1,103 @@
+import sys
+import os
+current_dir = os.getcwd()
+sys.path.append(current_dir)
+
+import pytest
+from sqlalchemy import event
+
+from restflask.extensions import db
+from restflask.models.model import User, Post
+from restflask.service.purge import purge_queue
+from restflask.service.services import delete_user
+
+
+@pytest.fixture
+def config(tmp_path):
+    # A file database: the purge thread has its own connection.
+    return {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path}/test.db', 'CACHE_BACKEND': 'memory'}
+
+
+@pytest.fixture
+def users(add_user):
+    ''' Adds the users 'prolific' and 'other' with `posts` posts each'''
+
+    def add(posts=5):
+        for username in ('prolific', 'other'):
+            add_user(username, posts=posts)
+
+    return add
+
+
+def counts():
+    return db.session.query(User).count(), db.session.query(Post).count()
+
+
+class TestCascadeDelete:
+    ''' Testing the deletion of users with their posts'''
+
+    def test_posts_deleted_by_the_database(self, app, users):
+        users()
+        statements = []
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute',
+                         lambda conn, cursor, statement, *args: statements.append(statement))
+            assert delete_user(1) == 'Success'
+            assert [sql for sql in statements if sql.startswith('DELETE')] == \
+                ['DELETE FROM users WHERE users.id = ?']
+            assert counts() == (1, 5)
+
+    def test_cached_posts_invalidated(self, client, users):
+        users()
+        assert client.get('/api/get_post/?id=1').status_code == 200
+        assert client.delete('/api/delete_user/?id=1').status_code == 200
+        assert client.get('/api/get_post/?id=1').status_code == 204
+
+    def test_no_post_keys_without_cache(self, make_app, config, users):
+        users()
+        app = make_app(**{**config, 'CACHE_BACKEND': 'null', 'USER_PURGE_THRESHOLD': 0})
+        statements = []
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute',
+                         lambda conn, cursor, statement, *args: statements.append(statement))
+            assert delete_user(1) == 'Success'
+        assert not [sql for sql in statements if 'FROM posts' in sql]
+
+
+class TestPurge:
+    ''' Testing the background purge of prolific users'''
+
+    def test_prolific_user_purged_in_background(self, app, client, users):
+        app.config.update(USER_PURGE_THRESHOLD=3, USER_PURGE_CHUNK_SIZE=2)
+        users()
+        assert client.get('/api/get_user/?id=1').json['posts']
+        response = client.delete('/api/delete_user/?id=1')
+        assert response.status_code == 202
+        purge_queue.join()
+        assert not purge_queue.pending
+        with app.app_context():
+            assert counts() == (1, 5)
+        assert client.get('/api/get_user/?id=1').status_code == 204
+        assert client.get('/api/get_post/?id=1').status_code == 204
+
+    def test_below_threshold(self, app, users):
+        app.config['USER_PURGE_THRESHOLD'] = 3
+        users(posts=3)
+        with app.test_request_context():
+            assert delete_user(1) == 'Success'
+            assert counts() == (1, 3)
+
+    def test_bulk_delete_schedules_prolific_users(self, app, client, users):
+        app.config.update(USER_PURGE_THRESHOLD=3, USER_PURGE_CHUNK_SIZE=2)
+        users()
+        add = client.post('/api/users/bulk/', json=[dict(
+            username='quiet', email='quiet@gmail.com', first_name='Name', last_name='Surname',
+            location='Kyiv')])
+        assert add.json['results'][0]['status'] == 'created'
+        response = client.delete('/api/users/bulk/', json=[1, 3, 1])
+        assert [(result['status'], result['message']) for result in response.json['results']] == \
+            [('scheduled', 'Scheduled'), ('deleted', 'Success'),
+             ('error', 'No such user record in the db')]
+        purge_queue.join()
+        with app.app_context():
+            assert counts() == (1, 5)
@@ -0,0 +1,87 @@
+import sys
+import os
+current_dir = os.getcwd()
+sys.path.append(current_dir)
+
+import pytest
+
+from restflask.extensions import db
+from restflask.models.model import User
+from restflask.service import services
+
+
+@pytest.fixture
+def config(tmp_path):
+    uris = [f'sqlite:///{tmp_path / name}.db' for name in ('replica_a', 'replica_b')]
+    return {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path}/primary.db',
+            'SQLALCHEMY_REPLICA_URIS': uris, 'CACHE_BACKEND': 'null'}
+
+
+@pytest.fixture(autouse=True)
+def databases(app):
+    """Primary and replica SQLite files holding one user each, named after the database."""
+    with app.app_context():
+        for key, engine in db.engines.items():
+            db.metadata.create_all(engine)
+            with engine.begin() as connection:
+                connection.execute(User.__table__.insert().values(
+                    username=key or 'primary', email='user@gmail.com', first_name='Name',
+                    last_name='Surname', location='Kyiv'))
+
+
+def read_username(app, cookies=None):
+    client = app.test_client()
+    for name, value in (cookies or {}).items():
+        client.set_cookie('localhost', name, value)
+    return client.get('/api/users/?summary=1').json['items'][0]['username']
+
+
+class TestReplicas:
+    ''' Testing the routing of the reads to the read replicas'''
+
+    def test_round_robin(self, app):
+        assert [read_username(app) for _ in range(4)] == ['replica_0', 'replica_1'] * 2
+        assert read_username(app, {'rf_primary': 'garbage'}) == 'replica_0'
+
+    def test_writes_go_to_primary(self, app):
+        with app.test_request_context():
+            assert services.get_users()[0]['username'] == 'replica_0'
+            assert services.update_user({'id': 1, 'location': 'Lviv'}) == 'Success'
+            # The session wrote, its reads now see the primary.
+            user = services.get_users()[0]
+            assert (user['username'], user['location']) == ('primary', 'Lviv')
+        with app.app_context():
+            assert db.session.get(User, 1).location == 'Lviv'
+            assert services.get_users()[0]['location'] == 'Kyiv'
+
+    def test_sticky_cookie(self, app):
+        client = app.test_client()
+        response = client.put('/api/update_user/', json={'id': 1, 'location': 'Lviv'})
+        assert 'rf_primary=' in response.headers['Set-Cookie']
+        response = client.get('/api/get_user/?id=1')
+        assert response.json['username'] == 'primary'
+        assert response.json['location'] == 'Lviv'
+        assert read_username(app) == 'replica_0'
+        assert read_username(app, {'rf_primary': '1'}) == 'replica_1'
+
+    def test_cached_records_read_primary(self, make_app, config):
+        app = make_app(**{**config, 'CACHE_BACKEND': 'memory'})
+        with app.app_context():
+            assert services.get_users()[0]['username'] == 'replica_0'
+            assert services.get_user(1)['username'] == 'primary'
+            assert services.get_user('user@gmail.com')['username'] == 'primary'
+
+    def test_unhealthy_replica_is_skipped(self, app):
+        pool = app.extensions['replicas']
+        pool.mark_down('replica_0')
+        assert [read_username(app) for _ in range(3)] == ['replica_1'] * 3
+        pool.mark_down('replica_1')
+        assert read_username(app) == 'primary'
+        pool.check_interval = 0
+        assert read_username(app) == 'replica_0'
+        assert app.test_client().get('/api/internal/pool/').json['replicas']['replica_0']['healthy']
+
+    def test_unreachable_replica(self, make_app, config):
+        app = make_app(**{**config, 'SQLALCHEMY_REPLICA_URIS': ['sqlite:////missing/dir/replica.db']})
+        assert read_username(app) == 'primary'
+        assert app.extensions['replicas'].stats() == {'replica_0': False}
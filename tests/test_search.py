@@ -0,0 +1,55 @@
+import sys
+import os
+current_dir = os.getcwd()
+sys.path.append(current_dir)
+
+from restflask.service.search import InvertedIndex, tokenize
+
+
+def make_index():
+    index = InvertedIndex()
+    index.build([
+        (1, 'Earth', 'Earth is the 3rd planet from the Sun.'),
+        (2, 'Mars', 'Mars is the 4th planet from the Sun.'),
+        (3, 'Moon', 'The Moon orbits the Earth.'),
+    ])
+    return index
+
+
+class TestInvertedIndex:
+    ''' Testing the in-process search index'''
+
+    def test_tokenize(self):
+        assert tokenize('The 3rd Planet, a moon!') == ['the', '3rd', 'planet', 'moon']
+        assert tokenize(None) == []
+
+    def test_title_ranks_first(self):
+        ranked = make_index().search('earth', 10)
+        assert [doc_id for doc_id, _ in ranked] == [1, 3]
+
+    def test_limit_and_offset(self):
+        index = make_index()
+        assert len(index.search('planet sun', 1)) == 1
+        assert index.search('planet sun', 10, 1) == index.search('planet sun', 10)[1:]
+
+    def test_no_match(self):
+        assert make_index().search('jupiter', 10) == []
+
+    def test_add_and_remove(self):
+        index = make_index()
+        index.add(4, 'Jupiter', 'The largest planet.')
+        assert [doc_id for doc_id, _ in index.search('jupiter', 10)] == [4]
+        index.add(1, 'Terra', 'Our home.')
+        assert [doc_id for doc_id, _ in index.search('earth', 10)] == [3]
+        index.remove(3)
+        assert index.search('earth moon', 10) == []
+
+    def test_not_built(self):
+        index = InvertedIndex()
+        index.add(1, 'Earth', 'Planet')
+        assert not index.built
+        assert index.search('earth', 10) == []
+        index = make_index()
+        index.invalidate()
+        assert not index.built
+        assert index.search('earth', 10) == []
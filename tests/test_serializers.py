@@ -0,0 +1,87 @@
+import sys
+import os
+current_dir = os.getcwd()
+sys.path.append(current_dir)
+
+import json
+from datetime import datetime
+
+import pytest
+
+from restflask.extensions import db
+from restflask.models.model import User, Post, users_schema
+from restflask.service import services
+
+
+@pytest.fixture
+def users(app, add_user):
+    for i in range(3):
+        add_user(f'user{i}', posts=2)
+    with app.app_context():
+        db.session.add(Post(title='Orphan', description='Text', author_id=None))
+        db.session.commit()
+
+
+class TestSerializers:
+    ''' Testing the column-tuple serialization of the listings'''
+
+    def test_users_page_matches_schema(self, app, users):
+        with app.app_context():
+            users, _, _ = services.get_users_page(10)
+            expected = users_schema.dump(User.query.order_by(User.registered_at, User.id).all())
+        assert json.loads(app.json.dumps(users)) == expected
+
+    def test_posts_page_authors(self, app, users):
+        with app.app_context():
+            posts, _, _ = services.get_posts_page(10, sort='id')
+        assert posts[0]['author_username'] == 'user0'
+        assert posts[0]['author_name'] == 'Name Surname'
+        assert posts[-1]['author_username'] == posts[-1]['author_name'] == ''
+        assert posts[-1]['author_id'] is None
+
+    def test_cached_post_is_plain_data(self, app, users):
+        with app.app_context():
+            post = services.get_post(1)
+            assert services.get_post(1) == post
+        assert post['author_username'] == 'user0'
+        assert post['author_name'] == 'Name Surname'
+        assert json.loads(app.json.dumps(post))['author_name'] == 'Name Surname'
+
+    def test_projection_drops_keyset_columns(self, app, users):
+        with app.app_context():
+            posts, next_cursor, _ = services.get_posts_page(2, sort='-created_at', fields=('title',))
+        assert [set(post) for post in posts] == [{'title'}, {'title'}]
+        assert next_cursor is not None
+
+    def test_iter_users_batches(self, app, users):
+        with app.app_context():
+            users = list(services.iter_users(batch_size=2))
+            summary = list(services.iter_users(summary=True, batch_size=2))
+        assert [user['username'] for user in users] == ['user0', 'user1', 'user2']
+        assert [len(user['posts']) for user in users] == [2, 2, 2]
+        assert [user['num_post'] for user in summary] == [2, 2, 2]
+
+
+class TestJsonProvider:
+    ''' Testing the orjson JSON provider'''
+
+    def test_dumps(self, app):
+        value = {'b': datetime(2023, 3, 9, 20, 30, 34), 'a': 'Київ'}
+        assert app.json.dumps(value) == '{"a":"Київ","b":"2023-03-09T20:30:34"}'
+        assert app.json.loads(b'{"a": [1]}') == {'a': [1]}
+
+    def test_jsonify(self, client):
+        response = client.post('/api/users/bulk/', json={'id': 1})
+        assert response.status_code == 400
+        assert response.mimetype == 'application/json'
+        assert response.json['message'].startswith('Error.')
+
+
+class TestCollectionArgs:
+    ''' Testing the query parameters of the listing endpoints'''
+
+    def test_invalid_author_id(self, client):
+        for url in ('/api/posts/?author_id=abc', '/api/posts/?author_id=1.5&format=ndjson'):
+            response = client.get(url)
+            assert response.status_code == 400
+            assert response.json['message'] == 'Error. Invalid author_id'
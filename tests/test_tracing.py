@@ -0,0 +1,63 @@
+import sys
+import os
+current_dir = os.getcwd()
+sys.path.append(current_dir)
+
+from flask import Flask, jsonify
+
+from restflask.service.tracing import TRACE_ID_HEADER, current_trace, init_tracing, span
+
+
+def make_app(**config):
+    app = Flask(__name__)
+    app.config.update(config)
+    init_tracing(app)
+
+    @app.route('/')
+    def index():
+        with span('db'):
+            rows = [1, 2, 3]
+        with span('json'):
+            return jsonify(rows=rows, traced=current_trace() is not None)
+
+    return app
+
+
+class TestTracing:
+    ''' Testing the opt-in request tracing'''
+
+    def test_untraced(self):
+        app = make_app()
+        response = app.test_client().get('/')
+        assert response.json['traced'] is False
+        assert TRACE_ID_HEADER not in response.headers
+
+    def test_header(self):
+        app = make_app(TRACING_HEADER=True)
+        response = app.test_client().get('/', headers={'X-Trace': '1'})
+        assert response.json['traced'] is True
+        assert len(response.headers[TRACE_ID_HEADER]) == 32
+
+    def test_header_disabled_by_default(self):
+        app = make_app()
+        response = app.test_client().get('/', headers={'X-Trace': '1'})
+        assert response.json['traced'] is False
+
+    def test_config(self):
+        app = make_app(TRACING=True)
+        response = app.test_client().get('/')
+        assert response.json['traced'] is True
+
+    def test_spans(self):
+        app = make_app(TRACING_HEADER=True)
+        with app.test_request_context('/', headers={'X-Trace': '1'}):
+            app.preprocess_request()
+            with span('db'):
+                with span('fetch'):
+                    pass
+            names = [item['name'] for item in current_trace().to_dict()['spans']]
+        assert names == ['fetch', 'db']
+
+    def test_outside_request(self):
+        with span('db'):
+            assert current_trace() is None
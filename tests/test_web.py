@@ -71,6 +71,12 @@ class TestWebPost:
         assert b'Title' in response.data
         assert b'SEARCH' in response.data
 
+    def test_web_filter_posts(self):
+        data = dict(date_from='2000-01-01', date_to='2999-12-31', author_id='1')
+        response = app.test_client().post('/posts/', data=data)
+        assert response.status_code == 200
+        assert b'SEARCH' in response.data
+
     def test_web_new_post_get(self):
         response = app.test_client().get('/new_post/')
         assert response.status_code == 200